@@ -0,0 +1,343 @@
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+# Cumulative import-time budget in milliseconds for each utils module. Heavy dependencies
+# (geemap, leafmap, geopandas, dask.distributed, boto3, ...) are imported inside the functions
+# that use them, so importing a module, e.g. on a Dask worker, stays cheap. Budgets cover the
+# dependencies each module still imports eagerly (numpy/pandas, ee) with headroom for slower
+# machines (evi_utlis imports mtbs_utils, so it shares its budget); an eager import of a heavy
+# dependency exceeds them. tests/test_benchmark_utils.py enforces them.
+IMPORT_TIME_BUDGETS_MS = {
+    "utils.openmeteo_utils": 800,
+    "utils.weather_cache_utils": 850,
+    "utils.source_coop_utils": 100,
+    "utils.mtbs_utils": 1500,
+    "utils.evi_utlis": 1500,
+    "utils.map_render_utils": 850,
+    "utils.pipeline_metrics_utils": 850,
+    "utils.dataset_utils": 850,
+    "utils.mtbs_local_utils": 850,
+    "utils.benchmark_utils": 850,
+}
+
+# Bounding box for California as [min_lon, min_lat, max_lon, max_lat]
+CALIFORNIA_BBOX = [-124.4, 32.5, -114.1, 42.0]
+
+#-------------------------------------------------------------------------------------------------------------------
+def _time_call(func, repeat=3):
+    """
+    Return the best wall time in seconds of `repeat` calls of func.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+#-------------------------------------------------------------------------------------------------------------------
+class _SyntheticVariable:
+    def __init__(self, values):
+        self._values = values
+
+    def ValuesAsNumpy(self):
+        return self._values
+
+
+class _SyntheticDaily:
+    def __init__(self, start, n_days, variables):
+        self._start = start
+        self._n_days = n_days
+        self._variables = variables
+
+    def Time(self):
+        return self._start
+
+    def TimeEnd(self):
+        return self._start + self._n_days * 86400
+
+    def Interval(self):
+        return 86400
+
+    def Variables(self, i):
+        return self._variables[i]
+
+
+class _SyntheticResponse:
+    """
+    Minimal stand-in for an Open-Meteo WeatherApiResponse exposing only the daily block.
+    """
+    def __init__(self, start, n_days, n_variables, rng):
+        self._daily = _SyntheticDaily(
+            start, n_days,
+            [_SyntheticVariable(rng.random(n_days, dtype=np.float32)) for _ in range(n_variables)]
+        )
+
+    def Daily(self):
+        return self._daily
+#-------------------------------------------------------------------------------------------------------------------
+def benchmark_daily_assembly(n_locations=(1000, 10000), n_days=21, n_variables=6, repeat=3, seed=0):
+    """
+    Compare per-response DataFrame + pd.concat assembly with assemble_daily_responses.
+
+    Synthetic responses are used so the benchmark measures assembly only, not the network.
+
+    Parameters:
+    - n_locations (tuple): Location counts to benchmark (default: 1k and 10k).
+    - n_days (int): Days per location (default: 21, the get_event_start_end window).
+    - n_variables (int): Daily variables per location (default: 6).
+    - repeat (int): Runs per measurement; the best time is reported (default: 3).
+    - seed (int): Random seed for the synthetic values.
+
+    Returns:
+    - pd.DataFrame: One row per location count with timings in seconds and speed-ups.
+    """
+    from .openmeteo_utils import _daily_response_to_dataframe, assemble_daily_responses
+
+    rng = np.random.default_rng(seed)
+    daily_variables = [f"var_{i}" for i in range(n_variables)]
+    rows = []
+    for n in n_locations:
+        responses = [_SyntheticResponse(1_600_000_000, n_days, n_variables, rng) for _ in range(n)]
+
+        def current_path():
+            frames = []
+            for location_id, response in enumerate(responses):
+                daily_dataframe = _daily_response_to_dataframe(response, daily_variables)
+                daily_dataframe.insert(0, "location_id", location_id)
+                frames.append(daily_dataframe)
+            return pd.concat(frames, ignore_index=True)
+
+        concat_s = _time_call(current_path, repeat)
+        pandas_s = _time_call(lambda: assemble_daily_responses(responses, daily_variables), repeat)
+        arrow_s = _time_call(lambda: assemble_daily_responses(responses, daily_variables, as_arrow=True), repeat)
+        rows.append({
+            "locations": n,
+            "rows": n * n_days,
+            "concat_s": concat_s,
+            "columnar_pandas_s": pandas_s,
+            "columnar_arrow_s": arrow_s,
+            "pandas_speedup": concat_s / pandas_s,
+            "arrow_speedup": concat_s / arrow_s,
+        })
+
+    return pd.DataFrame(rows)
+#-------------------------------------------------------------------------------------------------------------------
+def _cumulative_import_us(module, src_dir):
+    """
+    Import module in a fresh interpreter with `python -X importtime` and return its cumulative time in microseconds.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=src_dir, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise ImportError(f"Importing {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+
+    # Lines look like: "import time:       self [us] |  cumulative | imported package"
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name.strip() == module:
+            return int(cumulative)
+    raise ImportError(f"{module} not found in the -X importtime output.")
+#-------------------------------------------------------------------------------------------------------------------
+def benchmark_import_time(budgets=None, repeat=3, strict=False):
+    """
+    Measure the cold import time of each utils module against its regression budget.
+
+    Each module is imported in a fresh interpreter with `python -X importtime`, so the
+    numbers reflect what a notebook kernel or Dask worker pays when it first imports it.
+
+    Parameters:
+    - budgets (dict): Module name -> budget in milliseconds (default: IMPORT_TIME_BUDGETS_MS).
+    - repeat (int): Fresh imports per module; the best time is reported (default: 3).
+    - strict (bool): Raise an AssertionError if any module exceeds its budget (default: False).
+
+    Returns:
+    - pd.DataFrame: One row per module with 'import_ms', 'budget_ms' and 'within_budget'.
+    """
+    if budgets is None:
+        budgets = IMPORT_TIME_BUDGETS_MS
+    src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    rows = []
+    for module, budget_ms in budgets.items():
+        import_ms = min(_cumulative_import_us(module, src_dir) for _ in range(repeat)) / 1000
+        rows.append({
+            "module": module,
+            "import_ms": import_ms,
+            "budget_ms": budget_ms,
+            "within_budget": import_ms <= budget_ms,
+        })
+    report = pd.DataFrame(rows)
+
+    if strict and not report["within_budget"].all():
+        over = report.loc[~report["within_budget"]]
+        details = [f"{row.module} ({row.import_ms:.0f} ms > {row.budget_ms} ms)" for row in over.itertuples()]
+        raise AssertionError(f"Import time budget exceeded for: {', '.join(details)}")
+    return report
+#-------------------------------------------------------------------------------------------------------------------
+def benchmark_mtbs_formats(local_path, file_name="mtbs_perims_DD", bbox=None, npartitions=16, repeat=3):
+    """
+    Compare shapefile and GeoParquet for cold-load time and a bounding-box query.
+
+    The shapefile must already be downloaded to local_path (e.g. by get_mtbs_shp). The
+    GeoParquet dataset is created next to it if missing. Cold load materializes every
+    partition; the bbox query uses query_bbox, which can prune GeoParquet partitions.
+
+    Parameters:
+    - local_path (str): Directory holding '<file_name>.shp'.
+    - file_name (str): Shapefile name without extension (default: 'mtbs_perims_DD').
+    - bbox (list): Query box as [min_lon, min_lat, max_lon, max_lat] (default: California).
+    - npartitions (int): Partitions for both formats (default: 16).
+    - repeat (int): Runs per measurement; the best time is reported (default: 3).
+
+    Returns:
+    - pd.DataFrame: One row per format with 'load_s', 'bbox_query_s', 'bbox_rows' and
+      'partitions_scanned' out of 'npartitions'.
+    """
+    import dask_geopandas as dg
+    from .source_coop_utils import convert_shp_to_geoparquet, query_bbox
+
+    if bbox is None:
+        bbox = CALIFORNIA_BBOX
+    shp_path = os.path.join(local_path, f"{file_name}.shp")
+    parquet_path = os.path.join(local_path, f"{file_name}.parquet")
+    if not os.path.exists(parquet_path):
+        convert_shp_to_geoparquet(shp_path, parquet_path, npartitions=npartitions)
+
+    readers = {
+        "shapefile": lambda: dg.read_file(shp_path, npartitions=npartitions),
+        "geoparquet": lambda: dg.read_parquet(parquet_path),
+    }
+    rows = []
+    for file_format, read in readers.items():
+        load_s = _time_call(lambda: read().compute(), repeat)
+        selection = query_bbox(read(), bbox)
+        bbox_query_s = _time_call(lambda: query_bbox(read(), bbox).compute(), repeat)
+        rows.append({
+            "format": file_format,
+            "load_s": load_s,
+            "bbox_query_s": bbox_query_s,
+            "bbox_rows": len(selection.compute()),
+            "partitions_scanned": selection.npartitions,
+            "npartitions": read().npartitions,
+        })
+
+    return pd.DataFrame(rows)
+#-------------------------------------------------------------------------------------------------------------------
+def benchmark_mtbs_dtypes(mtbs_shp_ddf, repeat=3):
+    """
+    Measure the memory and groupby effect of the compact MTBS schema (optimize_mtbs_dtypes).
+
+    Both versions are persisted first, so the groupby timing of compute_wildfire_statistics
+    (the per-state aggregation behind create_wildfire_severity_map) excludes file reads.
+
+    Parameters:
+    - mtbs_shp_ddf (dask_geopandas.GeoDataFrame): Perimeters with the original dtypes,
+      e.g. get_mtbs_shp(..., optimize_dtypes=False).
+    - repeat (int): Runs per measurement; the best time is reported (default: 3).
+
+    Returns:
+    - tuple: (per-partition memory report from dtype_memory_report, pd.DataFrame with one row
+      per schema giving 'bytes' and 'by_state_groupby_s').
+    """
+    from .source_coop_utils import compute_wildfire_statistics, dtype_memory_report, optimize_mtbs_dtypes
+
+    original = mtbs_shp_ddf.persist()
+    optimized = optimize_mtbs_dtypes(original).persist()
+    memory = dtype_memory_report(original, optimized)
+
+    rows = []
+    for schema, ddf in (("original", original), ("optimized", optimized)):
+        groupby_s = _time_call(lambda: compute_wildfire_statistics(ddf, metrics=["by_state"]), repeat)
+        rows.append({
+            "schema": schema,
+            "bytes": int(memory[f"{schema}_bytes"].sum()),
+            "by_state_groupby_s": groupby_s,
+        })
+
+    return memory, pd.DataFrame(rows)
+#-------------------------------------------------------------------------------------------------------------------
+def _legacy_landsat_evi(geometry, start_date, end_date, cloud_cover):
+    """
+    The three-pass Landsat 8 EVI chain used before SensorPipeline (scaling, masking and indices as separate maps).
+    """
+    import ee
+
+    landsat = ee.ImageCollection('LANDSAT/LC08/C02/T1_L2') \
+        .filterBounds(geometry) \
+        .filterDate(start_date, end_date) \
+        .filterMetadata('CLOUD_COVER', 'less_than', cloud_cover)
+
+    def scaling_ls(img):
+        optical = img.select('SR_B.').multiply(0.0000275).add(-0.2)
+        thermal = img.select('ST_B.*').multiply(0.00341802).add(149.0)
+        return img.addBands(optical, None, True).addBands(thermal, None, True)
+
+    def mask_clouds(img):
+        qa = img.select('QA_PIXEL')
+        mask = qa.bitwiseAnd(1 << 4).eq(0) \
+            .And(qa.bitwiseAnd(1 << 3).eq(0)) \
+            .And(qa.bitwiseAnd(1 << 2).eq(0)) \
+            .And(qa.bitwiseAnd(1 << 1).eq(0))
+        return img.updateMask(mask)
+
+    def calc_vis_ls(img):
+        ndvi = img.normalizedDifference(['SR_B5', 'SR_B4']).rename('ndvi')
+        evi = img.expression(
+            '2.5 * ((NIR - RED) / (NIR + 6 * RED - 7.5 * BLUE + 1))', {
+                'NIR': img.select('SR_B5'),
+                'RED': img.select('SR_B4'),
+                'BLUE': img.select('SR_B2')
+            }).rename('evi')
+        return img.addBands([ndvi, evi])
+
+    return landsat.map(scaling_ls).map(mask_clouds).map(calc_vis_ls)
+#-------------------------------------------------------------------------------------------------------------------
+def benchmark_ee_graph_size(geometry=None, start_date='2021-07-01', end_date='2021-07-31', cloud_cover=80):
+    """
+    Compare the Earth Engine request graph of the legacy three-map Landsat EVI chain with the fused SensorPipeline.
+
+    Both build the median EVI composite behind the EVI maps. The graphs are serialized
+    locally (no computation is requested); Earth Engine must be initialized.
+
+    Parameters:
+    - geometry (ee.Geometry): Area of interest (default: CALIFORNIA_BBOX as a rectangle).
+    - start_date, end_date (str): Date range in 'YYYY-MM-DD' format (default: July 2021).
+    - cloud_cover (int): Maximum scene cloud cover percentage (default: 80).
+
+    Returns:
+    - pd.DataFrame: One row per variant with 'mapped_functions', 'function_calls' (invocation
+      nodes in the serialized graph), 'graph_bytes' and 'bands_read' per image (Landsat 8 C2 L2
+      images have 19 bands).
+    """
+    import ee
+    from .evi_utlis import LANDSAT8
+
+    if geometry is None:
+        geometry = ee.Geometry.Rectangle(CALIFORNIA_BBOX)
+
+    variants = {
+        "legacy (3 maps)": (_legacy_landsat_evi(geometry, start_date, end_date, cloud_cover), 3, 19),
+        "SensorPipeline (1 map)": (
+            LANDSAT8.collection(geometry, start_date, end_date, cloud_cover), 1, len(LANDSAT8.input_bands()) + 1
+        ),
+    }
+    rows = []
+    for name, (collection, maps, bands) in variants.items():
+        graph = collection.select('evi').median().serialize()
+        rows.append({
+            "variant": name,
+            "mapped_functions": maps,
+            "function_calls": graph.count('functionInvocationValue'),
+            "graph_bytes": len(graph),
+            "bands_read": bands,
+        })
+    return pd.DataFrame(rows)
+#-------------------------------------------------------------------------------------------------------------------
@@ -0,0 +1,213 @@
+from collections import OrderedDict
+import pandas as pd
+
+# Dataset handle over the Dask frames returned by source_coop_utils.
+
+#-------------------------------------------------------------------------------------------------------------------
+def _partition_stats(df):
+    """
+    Return a one-row DataFrame with the row count, memory size and (for GeoDataFrames) bounds of a partition.
+    """
+    import numpy as np
+
+    stats = {"rows": len(df), "bytes": int(df.memory_usage(deep=True).sum())}
+    if hasattr(df, "geometry") and len(df):
+        minx, miny, maxx, maxy = df.geometry.total_bounds
+    else:
+        minx = miny = maxx = maxy = np.nan
+    stats.update(minx=minx, miny=miny, maxx=maxx, maxy=maxy)
+    return pd.DataFrame([stats])
+#-------------------------------------------------------------------------------------------------------------------
+def _normalize(value):
+    """
+    Turn a filter argument into a hashable cache key component.
+    """
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _normalize(v)) for k, v in value.items()))
+    return value
+#-------------------------------------------------------------------------------------------------------------------
+class DaskDataset:
+    """
+    Handle around a get_mtbs_shp / get_usgs_data Dask frame that persists filtered intermediates.
+
+    Filters built with query() are persisted (in cluster memory when a distributed client is
+    active, otherwise in this process) and kept in an LRU cache bounded by memory_budget, so
+    repeating a filter in a later notebook cell is served from memory instead of re-reading
+    the files. Per-partition row counts, bytes and bounds are computed once in a single pass;
+    the bounds become the spatial_partitions of the dataset's own copy of the frame (the
+    frame passed in is left unchanged), so bbox filters prune partitions.
+
+    Parameters:
+    - ddf (dask.dataframe.DataFrame or dask_geopandas.GeoDataFrame): Frame from get_mtbs_shp or get_usgs_data.
+    - memory_budget (int or str): Bytes of persisted intermediates to keep, e.g. '2GB' (default: '2GB').
+    - verbose (bool): Print evictions and results too large to cache; they are always counted
+      in cache_info() (default: False).
+
+    Example:
+        mtbs = DaskDataset(get_mtbs_shp(file_name, s3_client, local_path), memory_budget='4GB')
+        wildfire_ddf = mtbs.query(incid_type='Wildfire')
+        wildfire_ddf = mtbs.query(incid_type='Wildfire')  # served from memory
+        mtbs.cache_info()
+    """
+    def __init__(self, ddf, memory_budget="2GB", verbose=False):
+        from dask.utils import parse_bytes
+
+        # Shallow copy of the graph, so setting spatial_partitions does not change the caller's frame
+        self.ddf = ddf.copy()
+        self.memory_budget = parse_bytes(memory_budget) if isinstance(memory_budget, str) else int(memory_budget)
+        self.verbose = verbose
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.oversized = 0
+        self._cache = OrderedDict()
+        self._stats = None
+
+    def __repr__(self):
+        info = self.cache_info()
+        return (
+            f"DaskDataset(npartitions={self.ddf.npartitions}, entries={info['entries']}, "
+            f"cached={info['bytes'] / 2**20:.1f} MB of {info['budget'] / 2**20:.1f} MB, "
+            f"hits={info['hits']}, misses={info['misses']})"
+        )
+
+    @property
+    def divisions(self):
+        """
+        Index divisions of the frame, or None when they are unknown.
+        """
+        return self.ddf.divisions if self.ddf.known_divisions else None
+
+    def partition_stats(self):
+        """
+        Return per-partition 'rows', 'bytes' and bounds ('minx', 'miny', 'maxx', 'maxy'), computed once.
+
+        For GeoDataFrames without spatial_partitions, the partition bounds are also set as
+        the spatial_partitions of the dataset's copy of the frame.
+        """
+        if self._stats is None:
+            meta = pd.DataFrame({
+                "rows": pd.Series([], dtype="int64"), "bytes": pd.Series([], dtype="int64"),
+                **{c: pd.Series([], dtype="float64") for c in ("minx", "miny", "maxx", "maxy")},
+            })
+            stats = self.ddf.map_partitions(_partition_stats, meta=meta).compute()
+            stats.index = pd.RangeIndex(len(stats), name="partition")
+            self._stats = stats
+
+            if hasattr(self.ddf, "spatial_partitions") and self.ddf.spatial_partitions is None:
+                import geopandas as gpd
+                import shapely
+
+                boxes = shapely.box(stats["minx"], stats["miny"], stats["maxx"], stats["maxy"])
+                self.ddf.spatial_partitions = gpd.GeoSeries(boxes, crs=self.ddf.crs)
+        return self._stats
+
+    def __len__(self):
+        return int(self.partition_stats()["rows"].sum())
+
+    def _evict(self):
+        """
+        Drop least recently used entries until the cache fits the memory budget.
+        """
+        while len(self._cache) > 1 and sum(size for _, size in self._cache.values()) > self.memory_budget:
+            key, _ = self._cache.popitem(last=False)
+            self.evictions += 1
+            if self.verbose:
+                print(f"Evicted {key} from the dataset cache.")
+
+    def cached(self, key, build):
+        """
+        Return the persisted result of build(ddf) for key, building and persisting it on a miss.
+
+        Parameters:
+        - key (hashable): Cache key of the intermediate.
+        - build (callable): Function taking the base frame and returning a lazy Dask frame.
+
+        Returns:
+        - Dask frame: Persisted intermediate.
+        """
+        if key in self._cache:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return self._cache[key][0]
+
+        self.misses += 1
+        persisted = build(self.ddf).persist()
+        size = int(persisted.memory_usage_per_partition(deep=True).sum().compute())
+        if size > self.memory_budget:
+            self.oversized += 1
+            if self.verbose:
+                print(f"{key} needs {size / 2**20:.1f} MB, more than the cache budget; returning it uncached.")
+            return persisted
+        self._cache[key] = (persisted, size)
+        self._evict()
+        return persisted
+
+    def query(self, incid_type=None, bbox=None, ig_date_range=None, columns=None):
+        """
+        Filter the dataset, serving repeated filters from the persisted cache.
+
+        query() without arguments persists the whole dataset.
+
+        Parameters:
+        - incid_type (str): Keep one Incid_Type, e.g. 'Wildfire' (default: None).
+        - bbox (list): Keep rows intersecting [min_lon, min_lat, max_lon, max_lat] (default: None).
+        - ig_date_range (tuple): (start, end) Ig_Date bounds, either may be None (default: None).
+        - columns (list): Columns to keep; the geometry column is always kept (default: all).
+
+        Returns:
+        - Dask frame: Persisted filtered frame.
+        """
+        key = ("query", _normalize(incid_type), _normalize(bbox), _normalize(ig_date_range), _normalize(columns))
+
+        def build(ddf):
+            from .source_coop_utils import query_bbox
+
+            if bbox is not None:
+                self.partition_stats()
+                ddf = query_bbox(ddf, bbox)
+            if incid_type is not None:
+                ddf = ddf[ddf["Incid_Type"] == incid_type]
+            if ig_date_range is not None:
+                import dask.dataframe as dd
+
+                start, end = ig_date_range
+                ig_date = dd.to_datetime(ddf["Ig_Date"])
+                mask = ig_date.notnull()
+                if start is not None:
+                    mask &= ig_date >= pd.Timestamp(start)
+                if end is not None:
+                    mask &= ig_date <= pd.Timestamp(end)
+                ddf = ddf[mask]
+            if columns is not None:
+                keep = list(columns)
+                if hasattr(ddf, "geometry") and ddf.geometry.name not in keep:
+                    keep.append(ddf.geometry.name)
+                ddf = ddf[keep]
+            return ddf
+
+        return self.cached(key, build)
+
+    def clear(self):
+        """
+        Release every persisted intermediate (the counters are kept).
+        """
+        self._cache.clear()
+
+    def cache_info(self):
+        """
+        Return the cache counters: 'hits', 'misses', 'evictions', 'oversized' (results returned
+        uncached because they exceed the budget), 'entries', 'bytes' and 'budget'.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "oversized": self.oversized,
+            "entries": len(self._cache),
+            "bytes": sum(size for _, size in self._cache.values()),
+            "budget": self.memory_budget,
+        }
+#-------------------------------------------------------------------------------------------------------------------
@@ -1,6 +1,177 @@
 import ee
-import geemap
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
+from .mtbs_utils import center_map_on_event, event_date_window, get_event_resolver
+
+# Days before and after Ig_Date covered by the event EVI maps
+EVENT_WINDOW_DAYS = 10
+
+# Spectral indices on surface reflectance; NDVI and NBR are computed with normalizedDifference
+INDEX_EXPRESSIONS = {
+    'evi': '2.5 * ((NIR - RED) / (NIR + 6 * RED - 7.5 * BLUE + 1))',
+    'ndvi': '(NIR - RED) / (NIR + RED)',
+    'nbr': '(NIR - SWIR2) / (NIR + SWIR2)',
+}
+# Band roles each index reads
+INDEX_ROLES = {'evi': ('nir', 'red', 'blue'), 'ndvi': ('nir', 'red'), 'nbr': ('nir', 'swir2')}
+DEFAULT_INDICES = ('ndvi', 'evi')
+#-------------------------------------------------------------------------------------------------------------------
+class SensorPipeline:
+    """
+    Fused Earth Engine preprocessing of one optical sensor: band selection, scaling, cloud masking and indices.
+
+    images() reads only the bands the requested indices need plus the QA band, and process()
+    applies the reflectance scaling, the cloud mask (one bitwiseAnd against all cloud bits
+    combined) and the index computation in one function, so a collection is mapped once
+    instead of three times and the server-side graph holds a single function body.
+
+    Parameters:
+        name (str): Pipeline name.
+        collection_ids (list): Image collections merged into one (e.g. Landsat 8 and Landsat 9).
+        bands (dict): Sensor band of each role: 'blue', 'red', 'nir' and 'swir2'.
+        scale, offset (float): Surface reflectance = DN * scale + offset.
+        qa_band (str): Quality band.
+        qa_mask (int): Bits of qa_band that mark a pixel as cloud, cirrus or shadow.
+        cloud_property (str): Scene cloud cover property used by cloud_cover filters.
+        resolution (int): Native resolution in meters.
+        reflectance_bands (str): Regex of every surface reflectance band, scaled when keep_bands is set
+            (default: None, the index input bands).
+        band_scaling (dict): Regex of other bands to (scale, offset), applied when keep_bands is set,
+            e.g. Landsat surface temperature (default: None).
+
+    Example:
+        evi_collection = LANDSAT8.collection(bbox, '2021-07-01', '2021-07-31', cloud_cover=80)
+    """
+    def __init__(self, name, collection_ids, bands, scale, offset, qa_band, qa_mask, cloud_property, resolution,
+                 reflectance_bands=None, band_scaling=None):
+        self.name = name
+        self.collection_ids = list(collection_ids)
+        self.bands = dict(bands)
+        self.scale = scale
+        self.offset = offset
+        self.qa_band = qa_band
+        self.qa_mask = qa_mask
+        self.cloud_property = cloud_property
+        self.resolution = resolution
+        self.reflectance_bands = reflectance_bands
+        self.band_scaling = dict(band_scaling or {})
+
+    def __repr__(self):
+        return f"SensorPipeline({self.name!r}, collections={self.collection_ids})"
+
+    def input_bands(self, indices=DEFAULT_INDICES):
+        """
+        Return the sensor bands needed to compute indices, in a fixed order.
+        """
+        roles = [role for role in ('blue', 'red', 'nir', 'swir2') if any(role in INDEX_ROLES[i] for i in indices)]
+        return [self.bands[role] for role in roles]
+
+    def images(self, geometry=None, start_date=None, end_date=None, cloud_cover=None, indices=DEFAULT_INDICES,
+               keep_bands=False):
+        """
+        Return the raw images, filtered and reduced to the input bands and the QA band (not yet processed).
+
+        With keep_bands, every source band is kept.
+        """
+        collection = ee.ImageCollection(self.collection_ids[0])
+        for collection_id in self.collection_ids[1:]:
+            collection = collection.merge(ee.ImageCollection(collection_id))
+        if geometry is not None:
+            collection = collection.filterBounds(geometry)
+        if start_date is not None:
+            collection = collection.filterDate(start_date, end_date)
+        if cloud_cover is not None:
+            collection = collection.filter(ee.Filter.lt(self.cloud_property, cloud_cover))
+        if keep_bands:
+            return collection
+        return collection.select(self.input_bands(indices) + [self.qa_band])
+
+    def process(self, img, indices=DEFAULT_INDICES, keep_bands=False):
+        """
+        Scale, cloud-mask and compute indices for one image; returns an image with one band per index.
+
+        With keep_bands, the index bands are added to the source bands instead, with the
+        reflectance bands (and band_scaling bands) scaled in place. The image properties,
+        including system:time_start and system:index, are copied from img in both cases.
+        """
+        reflectance = img.select(self.input_bands(indices)).multiply(self.scale).add(self.offset)
+        clear = img.select(self.qa_band).bitwiseAnd(self.qa_mask).eq(0)
+        band = {role: reflectance.select(name) for role, name in self.bands.items()
+                if name in self.input_bands(indices)}
+
+        layers = []
+        for index in indices:
+            if index == 'evi':
+                layer = reflectance.expression(INDEX_EXPRESSIONS['evi'], {
+                    'NIR': band['nir'], 'RED': band['red'], 'BLUE': band['blue']
+                })
+            elif index == 'ndvi':
+                layer = reflectance.normalizedDifference([self.bands['nir'], self.bands['red']])
+            elif index == 'nbr':
+                layer = reflectance.normalizedDifference([self.bands['nir'], self.bands['swir2']])
+            else:
+                raise ValueError(f"Unknown index {index!r}; expected one of {sorted(INDEX_EXPRESSIONS)}.")
+            layers.append(layer.rename(index))
+        result = ee.Image.cat(layers)
+        if keep_bands:
+            source = img.addBands(
+                img.select(self.reflectance_bands or self.input_bands(indices)).multiply(self.scale).add(self.offset),
+                None, True,
+            )
+            for pattern, (scale, offset) in self.band_scaling.items():
+                source = source.addBands(img.select(pattern).multiply(scale).add(offset), None, True)
+            result = source.addBands(result)
+        return ee.Image(result.updateMask(clear).copyProperties(img, img.propertyNames()))
+
+    def collection(self, geometry=None, start_date=None, end_date=None, cloud_cover=None, indices=DEFAULT_INDICES,
+                   keep_bands=False):
+        """
+        Return the filtered collection with one mapped pass of process(): one band per index.
+
+        Parameters:
+            geometry (ee.Geometry): Area of interest (default: None, no spatial filter).
+            start_date, end_date (str or ee.Date): Date range, end excluded (default: None, no date filter).
+            cloud_cover (int): Maximum scene cloud cover percentage (default: None, no filter).
+            indices (tuple): Indices to compute among 'evi', 'ndvi' and 'nbr' (default: ('ndvi', 'evi')).
+            keep_bands (bool): Keep the scaled source bands next to the indices (default: False).
+
+        Returns:
+            ee.ImageCollection: Cloud-masked index images.
+        """
+        return self.images(geometry, start_date, end_date, cloud_cover, indices, keep_bands).map(
+            lambda img: self.process(img, indices, keep_bands)
+        )
+#-------------------------------------------------------------------------------------------------------------------
+# Landsat 8 (and 9) Collection 2 Level 2: QA_PIXEL bits 1-4 are dilated cloud, cirrus, cloud and cloud shadow
+LANDSAT8 = SensorPipeline(
+    'landsat8', ['LANDSAT/LC08/C02/T1_L2'], {'blue': 'SR_B2', 'red': 'SR_B4', 'nir': 'SR_B5', 'swir2': 'SR_B7'},
+    scale=0.0000275, offset=-0.2, qa_band='QA_PIXEL', qa_mask=0b11110, cloud_property='CLOUD_COVER', resolution=30,
+    reflectance_bands='SR_B.', band_scaling={'ST_B.*': (0.00341802, 149.0)},
+)
+LANDSAT89 = SensorPipeline(
+    'landsat89', ['LANDSAT/LC08/C02/T1_L2', 'LANDSAT/LC09/C02/T1_L2'],
+    LANDSAT8.bands, LANDSAT8.scale, LANDSAT8.offset, LANDSAT8.qa_band, LANDSAT8.qa_mask, LANDSAT8.cloud_property, 30,
+    LANDSAT8.reflectance_bands, LANDSAT8.band_scaling,
+)
+# Sentinel-2 SR: DN * 0.0001 is surface reflectance; QA60 bits 10 and 11 are opaque clouds and cirrus
+SENTINEL2 = SensorPipeline(
+    'sentinel2', ['COPERNICUS/S2_SR_HARMONIZED'], {'blue': 'B2', 'red': 'B4', 'nir': 'B8', 'swir2': 'B12'},
+    scale=0.0001, offset=0.0, qa_band='QA60', qa_mask=(1 << 10) | (1 << 11),
+    cloud_property='CLOUDY_PIXEL_PERCENTAGE', resolution=10, reflectance_bands='B.*',
+)
+SENSOR_PIPELINES = {'landsat': LANDSAT8, 'landsat8': LANDSAT8, 'landsat89': LANDSAT89, 'sentinel2': SENTINEL2}
+#-------------------------------------------------------------------------------------------------------------------
+def _sentinel2_count(cloud_cover, days):
+    """
+    Return an MTBSEventResolver extra counting the Sentinel-2 images of the event's Ig_Date +/- days window.
+
+    The window is computed server-side the same way as event_date_window: from the UTC day
+    of Ig_Date, with the end date excluded by filterDate.
+    """
+    def count(feature):
+        ig_day = ee.Date(ee.Date(feature.get('Ig_Date')).format('YYYY-MM-dd'))
+        start_date, end_date = ig_day.advance(-days, 'day'), ig_day.advance(days, 'day')
+        return SENTINEL2.images(feature.geometry(), start_date, end_date, cloud_cover).size()
+    return count
 #-------------------------------------------------------------------------------------------------------------------
 def generate_evi(bbox, start_date, end_date, cloud_cover=80):
     """
@@ -13,47 +184,10 @@ def generate_evi(bbox, start_date, end_date, cloud_cover=80):
         cloud_cover (int): Maximum cloud cover percentage (default: 80).
 
     Returns:
-        ee.ImageCollection: Image collection with EVI and NDVI bands.
+        ee.ImageCollection: Image collection with the scaled source bands plus NDVI and EVI bands.
     """
-    # Load Landsat 8 SR dataset
-    landsat = ee.ImageCollection('LANDSAT/LC08/C02/T1_L2') \
-        .filterBounds(bbox) \
-        .filterDate(start_date, end_date) \
-        .filterMetadata('CLOUD_COVER', 'less_than', cloud_cover)
-    
-    # Function to scale Landsat bands
-    def scaling_ls(img):
-        optical = img.select('SR_B.').multiply(0.0000275).add(-0.2)
-        thermal = img.select('ST_B.*').multiply(0.00341802).add(149.0)
-        return img.addBands(optical, None, True).addBands(thermal, None, True)
-    
-    # Function to mask clouds
-    def mask_clouds(img):
-        cloud_shadow_bit_mask = (1 << 4)
-        clouds_bit_mask = (1 << 3)
-        clouds_cirrus_bit_mask = (1 << 2)
-        clouds_dilated_bit_mask = (1 << 1)
-        qa = img.select('QA_PIXEL')
-        mask = qa.bitwiseAnd(cloud_shadow_bit_mask).eq(0) \
-                .And(qa.bitwiseAnd(clouds_bit_mask).eq(0)) \
-                .And(qa.bitwiseAnd(clouds_cirrus_bit_mask).eq(0)) \
-                .And(qa.bitwiseAnd(clouds_dilated_bit_mask).eq(0))
-        return img.updateMask(mask)
-    
-    # Function to calculate NDVI and EVI
-    def calc_vis_ls(img):
-        ndvi = img.normalizedDifference(['SR_B5', 'SR_B4']).rename('ndvi')
-        evi = img.expression(
-            '2.5 * ((NIR - RED) / (NIR + 6 * RED - 7.5 * BLUE + 1))', {
-                'NIR': img.select('SR_B5'),
-                'RED': img.select('SR_B4'),
-                'BLUE': img.select('SR_B2')
-            }).rename('evi')
-        return img.addBands([ndvi, evi])
-    
-    # Apply the scaling, cloud masking, and VI calculation
-    processed = landsat.map(scaling_ls).map(mask_clouds).map(calc_vis_ls)
-    return processed
+    # Landsat 8 SR images with scaling, cloud masking and NDVI/EVI fused into one mapped pass
+    return LANDSAT8.collection(bbox, start_date, end_date, cloud_cover, keep_bands=True)
 
 #-------------------------------------------------------------------------------------------------------------------
 
@@ -70,73 +204,34 @@ def landsat8_evi_event_id_custom_date(event_id, start_date, end_date, cloud_cove
     Returns:
         ee.ImageCollection: Image collection with EVI and NDVI bands.
     """
-
-    # Load the MTBS burned area boundaries dataset
-    dataset = ee.FeatureCollection('USFS/GTAC/MTBS/burned_area_boundaries/v1')
+    import geemap
 
     # Define the field and value to filter by
     field_name = 'Event_ID'
 
-    # Filter the dataset by the specified Event ID
-    filtered_feature = dataset.filter(ee.Filter.eq(field_name, event_id))
-
-    # Check if the filtered dataset is empty
-    count = filtered_feature.size().getInfo()
-    if count == 0:
+    # Resolve the event with the shared resolver (one round trip at most, none when cached)
+    resolver = get_event_resolver()
+    event = resolver.resolve(event_id)
+    if event is None:
         print(f"No feature found with {field_name}: {event_id}")
         return None
     else:
         print(f"Generating EVI for feature with {field_name}: {event_id}")
+    filtered_feature = resolver.collection(event_id)
 
     # Get the bounding box of the filtered feature
     bbox = filtered_feature.geometry()
 
-    # Load Landsat 8 SR dataset
-    landsat = ee.ImageCollection('LANDSAT/LC08/C02/T1_L2') \
-        .filterBounds(bbox) \
-        .filterDate(start_date, end_date) \
-        .filterMetadata('CLOUD_COVER', 'less_than', cloud_cover)
-
-    # Function to scale Landsat bands
-    def scaling_ls(img):
-        optical = img.select('SR_B.').multiply(0.0000275).add(-0.2)
-        thermal = img.select('ST_B.*').multiply(0.00341802).add(149.0)
-        return img.addBands(optical, None, True).addBands(thermal, None, True)
-
-    # Function to mask clouds
-    def mask_clouds(img):
-        cloud_shadow_bit_mask = (1 << 4)
-        clouds_bit_mask = (1 << 3)
-        clouds_cirrus_bit_mask = (1 << 2)
-        clouds_dilated_bit_mask = (1 << 1)
-        qa = img.select('QA_PIXEL')
-        mask = qa.bitwiseAnd(cloud_shadow_bit_mask).eq(0) \
-                .And(qa.bitwiseAnd(clouds_bit_mask).eq(0)) \
-                .And(qa.bitwiseAnd(clouds_cirrus_bit_mask).eq(0)) \
-                .And(qa.bitwiseAnd(clouds_dilated_bit_mask).eq(0))
-        return img.updateMask(mask)
-
-    # Function to calculate NDVI and EVI
-    def calc_vis_ls(img):
-        ndvi = img.normalizedDifference(['SR_B5', 'SR_B4']).rename('ndvi')
-        evi = img.expression(
-            '2.5 * ((NIR - RED) / (NIR + 6 * RED - 7.5 * BLUE + 1))', {
-                'NIR': img.select('SR_B5'),
-                'RED': img.select('SR_B4'),
-                'BLUE': img.select('SR_B2')
-            }).rename('evi')
-        return img.addBands([ndvi, evi])
-
-    # Apply the scaling, cloud masking, and VI calculation
-    processed = landsat.map(scaling_ls).map(mask_clouds).map(calc_vis_ls)
+    # Landsat 8 SR images with scaling, cloud masking and NDVI/EVI fused into one mapped pass
+    processed = LANDSAT8.collection(bbox, start_date, end_date, cloud_cover)
 
     # Create a map object to visualize the result
     map_ = geemap.Map()
     map_.addLayer(filtered_feature, {'color': 'red'}, f"MTBS Boundary: {event_id}")
     map_.addLayer(processed.median().clip(bbox), {'bands': ['evi'], 'min': 0, 'max': 1, 'palette': ['white', 'blue', 'green']}, 'EVI')
 
-    # Center the map on the feature
-    map_.centerObject(filtered_feature, zoom=10)
+    # Center the map on the feature from its cached bounds
+    center_map_on_event(map_, event, zoom=10)
 
     return map_
 
@@ -154,36 +249,32 @@ def landsat_evi_by_event_id(event_id, cloud_cover):
     Returns:
         geemap.Map: Map displaying the MTBS boundary and the EVI layer.
     """
-
-    # Load the MTBS burned area boundaries dataset
-    dataset = ee.FeatureCollection('USFS/GTAC/MTBS/burned_area_boundaries/v1')
+    import geemap
 
     # Define the field and value to filter by
     field_name = 'Event_ID'
 
-    # Filter the dataset by the specified Event ID
-    filtered_feature = dataset.filter(ee.Filter.eq(field_name, event_id))
-
-    # Check if the filtered dataset is empty
-    count = filtered_feature.size().getInfo()
-    if count == 0:
+    # Resolve the event with the shared resolver (one round trip at most, none when cached)
+    resolver = get_event_resolver()
+    event = resolver.resolve(event_id)
+    if event is None:
         print(f"No feature found with {field_name}: {event_id}")
         return None
     else:
         print(f"Generating EVI for feature with {field_name}: {event_id}")
+    filtered_feature = resolver.collection(event_id)
 
-    # Get the Ig_Date of the filtered feature (Unix timestamp in milliseconds)
-    ig_date_ms = filtered_feature.first().get('Ig_Date').getInfo()
+    # Get the Ig_Date of the event (Unix timestamp in milliseconds)
+    ig_date_ms = event['ig_date_ms']
     if not ig_date_ms:
         print(f"No Ig_Date found for {field_name}: {event_id}")
         return None
 
     # Convert the Ig_Date from Unix timestamp (milliseconds) to datetime object
-    ig_date_dt = datetime.utcfromtimestamp(ig_date_ms / 1000)
+    ig_date_dt = datetime.fromtimestamp(ig_date_ms / 1000, tz=timezone.utc)
 
     # Calculate the start and end dates (10 days before and after)
-    start_date = (ig_date_dt - timedelta(days=10)).strftime('%Y-%m-%d')
-    end_date = (ig_date_dt + timedelta(days=10)).strftime('%Y-%m-%d')
+    start_date, end_date = event_date_window(ig_date_ms, EVENT_WINDOW_DAYS, EVENT_WINDOW_DAYS)
 
     print(f"Ig_Date: {ig_date_dt.strftime('%Y-%m-%d')}")
     print(f"Start Date: {start_date}")
@@ -192,52 +283,16 @@ def landsat_evi_by_event_id(event_id, cloud_cover):
     # Get the bounding box of the filtered feature
     bbox = filtered_feature.geometry()
 
-    # Load Landsat 8 SR dataset
-    landsat = ee.ImageCollection('LANDSAT/LC08/C02/T1_L2') \
-        .filterBounds(bbox) \
-        .filterDate(start_date, end_date) \
-        .filterMetadata('CLOUD_COVER', 'less_than', cloud_cover)
-
-    # Function to scale Landsat bands
-    def scaling_ls(img):
-        optical = img.select('SR_B.').multiply(0.0000275).add(-0.2)
-        thermal = img.select('ST_B.*').multiply(0.00341802).add(149.0)
-        return img.addBands(optical, None, True).addBands(thermal, None, True)
-
-    # Function to mask clouds
-    def mask_clouds(img):
-        cloud_shadow_bit_mask = (1 << 4)
-        clouds_bit_mask = (1 << 3)
-        clouds_cirrus_bit_mask = (1 << 2)
-        clouds_dilated_bit_mask = (1 << 1)
-        qa = img.select('QA_PIXEL')
-        mask = qa.bitwiseAnd(cloud_shadow_bit_mask).eq(0) \
-                .And(qa.bitwiseAnd(clouds_bit_mask).eq(0)) \
-                .And(qa.bitwiseAnd(clouds_cirrus_bit_mask).eq(0)) \
-                .And(qa.bitwiseAnd(clouds_dilated_bit_mask).eq(0))
-        return img.updateMask(mask)
-
-    # Function to calculate NDVI and EVI
-    def calc_vis_ls(img):
-        ndvi = img.normalizedDifference(['SR_B5', 'SR_B4']).rename('ndvi')
-        evi = img.expression(
-            '2.5 * ((NIR - RED) / (NIR + 6 * RED - 7.5 * BLUE + 1))', {
-                'NIR': img.select('SR_B5'),
-                'RED': img.select('SR_B4'),
-                'BLUE': img.select('SR_B2')
-            }).rename('evi')
-        return img.addBands([ndvi, evi])
-
-    # Apply the scaling, cloud masking, and VI calculation
-    processed = landsat.map(scaling_ls).map(mask_clouds).map(calc_vis_ls)
+    # Landsat 8 SR images with scaling, cloud masking and NDVI/EVI fused into one mapped pass
+    processed = LANDSAT8.collection(bbox, start_date, end_date, cloud_cover)
 
     # Create a map object to visualize the result
     map_ = geemap.Map()
     map_.addLayer(filtered_feature, {'color': 'red'}, f"MTBS Boundary: {event_id}")
     map_.addLayer(processed.median().clip(bbox), {'bands': ['evi'], 'min': 0, 'max': 1, 'palette': ['white', 'blue', 'green']}, 'EVI')
 
-    # Center the map on the feature
-    map_.centerObject(filtered_feature, zoom=10)
+    # Center the map on the feature from its cached bounds
+    center_map_on_event(map_, event, zoom=10)
 
     return map_
 
@@ -248,6 +303,11 @@ def sentinel2_evi_by_event_id(event_id, cloud_cover):
     Generate an Enhanced Vegetation Index (EVI) using Sentinel-2 data for a given Event ID 
     and a time period 10 days before and 10 days after the event's Ig_Date.
 
+    EVI is computed on surface reflectance (DN * 0.0001) with QA60 cloud and cirrus pixels
+    masked. Earlier versions computed it on raw DN values without masking, where the constant
+    1 in the EVI denominator is negligible and the result is not a valid EVI; the layer values
+    therefore differ from those versions.
+
     Parameters:
         event_id (str): The Event ID to filter the MTBS dataset.
         cloud_cover (int): Maximum cloud cover percentage (default: 20).
@@ -255,36 +315,34 @@ def sentinel2_evi_by_event_id(event_id, cloud_cover):
     Returns:
         geemap.Map or None: Map displaying the MTBS boundary and the EVI layer, or None if no images are found.
     """
+    import geemap
 
-    # Load the MTBS burned area boundaries dataset
-    dataset = ee.FeatureCollection('USFS/GTAC/MTBS/burned_area_boundaries/v1')
+    count_name = f"sentinel2_images_cc{cloud_cover}_{EVENT_WINDOW_DAYS}d"
 
     # Define the field and value to filter by
     field_name = 'Event_ID'
 
-    # Filter the dataset by the specified Event ID
-    filtered_feature = dataset.filter(ee.Filter.eq(field_name, event_id))
-
-    # Check if the filtered dataset is empty
-    count = filtered_feature.size().getInfo()
-    if count == 0:
+    # Resolve the event with the shared resolver (one round trip at most, none when cached)
+    resolver = get_event_resolver()
+    event = resolver.resolve(event_id, extras={count_name: _sentinel2_count(cloud_cover, EVENT_WINDOW_DAYS)})
+    if event is None:
         print(f"No feature found with {field_name}: {event_id}")
         return None
     else:
         print(f"Generating EVI for feature with {field_name}: {event_id}")
+    filtered_feature = resolver.collection(event_id)
 
-    # Get the Ig_Date of the filtered feature (Unix timestamp in milliseconds)
-    ig_date_ms = filtered_feature.first().get('Ig_Date').getInfo()
+    # Get the Ig_Date of the event (Unix timestamp in milliseconds)
+    ig_date_ms = event['ig_date_ms']
     if not ig_date_ms:
         print(f"No Ig_Date found for {field_name}: {event_id}")
         return None
 
     # Convert the Ig_Date from Unix timestamp (milliseconds) to datetime object
-    ig_date_dt = datetime.utcfromtimestamp(ig_date_ms / 1000)
+    ig_date_dt = datetime.fromtimestamp(ig_date_ms / 1000, tz=timezone.utc)
 
     # Calculate the start and end dates (10 days before and after)
-    start_date = (ig_date_dt - timedelta(days=10)).strftime('%Y-%m-%d')
-    end_date = (ig_date_dt + timedelta(days=10)).strftime('%Y-%m-%d')
+    start_date, end_date = event_date_window(ig_date_ms, EVENT_WINDOW_DAYS, EVENT_WINDOW_DAYS)
 
     print(f"Ig_Date: {ig_date_dt.strftime('%Y-%m-%d')}")
     print(f"Start Date: {start_date}")
@@ -293,42 +351,458 @@ def sentinel2_evi_by_event_id(event_id, cloud_cover):
     # Get the bounding box of the filtered feature
     bbox = filtered_feature.geometry()
 
-    # Load Sentinel-2 surface reflectance dataset    
-    sentinel2 = ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED') \
-        .filterBounds(bbox) \
-        .filterDate(start_date, end_date) \
-        .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', cloud_cover))
-
-    # Check if the collection is empty
-    if sentinel2.size().getInfo() == 0:
+    # Check if the collection is empty (counted server-side in the same request as the event)
+    if event['extras'][count_name] == 0:
         print(f"No Sentinel-2 images found for Event ID: {event_id} in the specified date range.")
         return None
 
-    # Function to calculate EVI for Sentinel-2
-    def calc_evi(img):
-        evi = img.expression(
-            '2.5 * ((NIR - RED) / (NIR + 6 * RED - 7.5 * BLUE + 1))', {
-                'NIR': img.select('B8'),     # Near-Infrared (NIR) band
-                'RED': img.select('B4'),     # Red band
-                'BLUE': img.select('B2')     # Blue band
-            }).rename('evi')
-        return img.addBands(evi)
-
-    # Apply the EVI calculation
-    processed = sentinel2.map(calc_evi)
-    # Define visualization parameters
-   
-
-
+    # Sentinel-2 SR images scaled to reflectance, cloud-masked (QA60) and reduced to EVI/NDVI in one mapped pass
+    processed = SENTINEL2.collection(bbox, start_date, end_date, cloud_cover)
 
     # Create a map object to visualize the result
     map_ = geemap.Map()
     map_.addLayer(filtered_feature, {'color': 'red'}, f"MTBS Boundary: {event_id}")
     map_.addLayer(processed.median().clip(bbox), {'bands': ['evi'], 'min': 0, 'max': 1, 'palette': ['white', 'blue', 'green']}, 'EVI')
 
-    # Center the map on the feature
-    map_.centerObject(filtered_feature, zoom=10)
+    # Center the map on the feature from its cached bounds
+    center_map_on_event(map_, event, zoom=10)
 
     return map_
 
 #-------------------------------------------------------------------------------------------------------------------
+# Index bands reduced by batch_vegetation_indices
+BATCH_INDICES = ('evi', 'ndvi')
+#-------------------------------------------------------------------------------------------------------------------
+def build_vegetation_index_job(event_ids, days_before=30, days_after=30, sensor='landsat', cloud_cover=80,
+                               scale=None):
+    """
+    Build (without running) the server-side job of batch_vegetation_indices.
+
+    Every event's window is computed server-side from its Ig_Date: the pre-fire window is
+    [Ig_Date - days_before, Ig_Date) and the post-fire window is [Ig_Date, Ig_Date + days_after),
+    both on whole UTC days. Each window's cloud-masked images are reduced to a per-pixel median
+    composite, which is then reduced to its median over the perimeter. The windows differ per
+    event, so the perimeters are reduced with reduceRegion inside one mapped function rather
+    than with a single reduceRegions call over one image.
+
+    Parameters:
+        event_ids (list): Event IDs to process.
+        days_before, days_after (int): Days before and after Ig_Date (default: 30).
+        sensor (str): A SENSOR_PIPELINES key: 'landsat' / 'landsat8' (Landsat 8 C2 L2), 'landsat89'
+            or 'sentinel2' (default: 'landsat').
+        cloud_cover (int): Maximum scene cloud cover percentage (default: 80).
+        scale (float): Reduction scale in meters (default: the sensor's resolution).
+
+    Returns:
+        ee.FeatureCollection: One geometry-free feature per found event with 'Event_ID', 'Incid_Name',
+        'Ig_Date', 'pre_images', 'post_images' and the 'pre_<index>' / 'post_<index>' medians.
+    """
+    from .mtbs_utils import mtbs_boundaries
+
+    if sensor not in SENSOR_PIPELINES:
+        raise ValueError(f"sensor must be one of {sorted(SENSOR_PIPELINES)}, not {sensor!r}.")
+    pipeline = SENSOR_PIPELINES[sensor]
+    scale = pipeline.resolution if scale is None else scale
+    images = pipeline.images(cloud_cover=cloud_cover, indices=BATCH_INDICES)
+
+    def window_stats(geometry, start, end, prefix):
+        window = images.filterBounds(geometry).filterDate(start, end)
+        stats = ee.Algorithms.If(
+            window.size().gt(0),
+            window.map(lambda img: pipeline.process(img, BATCH_INDICES)).median().reduceRegion(
+                reducer=ee.Reducer.median(), geometry=geometry, scale=scale, maxPixels=1e10, bestEffort=True
+            ).rename(list(BATCH_INDICES), [f"{prefix}_{index}" for index in BATCH_INDICES], True),
+            ee.Dictionary({})
+        )
+        return ee.Dictionary(stats).set(f"{prefix}_images", window.size())
+
+    def event_stats(feature):
+        geometry = feature.geometry()
+        ig_day = ee.Date(ee.Date(feature.get('Ig_Date')).format('YYYY-MM-dd'))
+        pre = window_stats(geometry, ig_day.advance(-days_before, 'day'), ig_day, 'pre')
+        post = window_stats(geometry, ig_day, ig_day.advance(days_after, 'day'), 'post')
+        return ee.Feature(None, pre.combine(post)).set(feature.toDictionary(['Event_ID', 'Incid_Name', 'Ig_Date']))
+
+    events = mtbs_boundaries().filter(ee.Filter.inList('Event_ID', list(event_ids)))
+    return events.map(event_stats)
+#-------------------------------------------------------------------------------------------------------------------
+def vegetation_index_table(info, event_ids=None):
+    """
+    Turn the getInfo result (or exported rows) of build_vegetation_index_job into a DataFrame.
+
+    Parameters:
+        info (dict, list or pd.DataFrame): A FeatureCollection getInfo dict, a list of property
+            dicts, or the exported CSV read with pd.read_csv.
+        event_ids (list): Requested Event IDs, in the order of the output rows; IDs that were not
+            found are reported and left out (default: None, keep the server order).
+
+    Returns:
+        pd.DataFrame: One row per event with the pre/post medians, image counts and
+        'delta_<index>' = post - pre.
+    """
+    import pandas as pd
+
+    if isinstance(info, pd.DataFrame):
+        rows = info.to_dict('records')
+    elif isinstance(info, dict):
+        rows = [feature['properties'] for feature in info['features']]
+    else:
+        rows = list(info)
+    columns = ['Event_ID', 'Incid_Name', 'Ig_Date', 'pre_images', 'post_images',
+               *[f"{period}_{index}" for period in ('pre', 'post') for index in BATCH_INDICES]]
+    df = pd.DataFrame(rows).reindex(columns=columns)
+    for index in BATCH_INDICES:
+        df[f"delta_{index}"] = df[f"post_{index}"] - df[f"pre_{index}"]
+
+    if event_ids is not None:
+        found = set(df['Event_ID'])
+        missing = [event_id for event_id in event_ids if event_id not in found]
+        if missing:
+            print(f"No feature found for {len(missing)} Event_IDs: {missing[:5]}{'...' if len(missing) > 5 else ''}")
+        order = {event_id: i for i, event_id in enumerate(event_ids)}
+        df = df.sort_values('Event_ID', key=lambda ids: ids.map(order), ignore_index=True)
+    return df
+#-------------------------------------------------------------------------------------------------------------------
+def batch_vegetation_indices(event_ids, days_before=30, days_after=30, sensor='landsat', cloud_cover=80,
+                             scale=None, export_description=None):
+    """
+    Compute pre- and post-fire median EVI and NDVI for many MTBS events in one Earth Engine job.
+
+    All events are processed server-side by one mapped function (see build_vegetation_index_job)
+    and fetched with a single getInfo, instead of one map per event. For very large batches
+    that exceed the interactive limits, pass export_description to run the same job as a
+    Drive table export; the exported CSV can be read with pd.read_csv and vegetation_index_table.
+
+    Parameters:
+        event_ids (list): Event IDs to process.
+        days_before, days_after (int): Days before and after Ig_Date (default: 30).
+        sensor (str): A SENSOR_PIPELINES key, e.g. 'landsat' or 'sentinel2' (default: 'landsat').
+        cloud_cover (int): Maximum scene cloud cover percentage (default: 80).
+        scale (float): Reduction scale in meters (default: the sensor's resolution).
+        export_description (str): Start a Drive export with this description instead of getInfo (default: None).
+
+    Returns:
+        pd.DataFrame or ee.batch.Task: One row per event (see vegetation_index_table), or the
+        started export task.
+    """
+    event_ids = list(dict.fromkeys(event_ids))
+    job = build_vegetation_index_job(event_ids, days_before, days_after, sensor, cloud_cover, scale)
+
+    if export_description is not None:
+        task = ee.batch.Export.table.toDrive(collection=job, description=export_description, fileFormat='CSV')
+        task.start()
+        print(f"Started export '{export_description}' for {len(event_ids)} events.")
+        return task
+
+    print(f"Computing {sensor} EVI/NDVI for {len(event_ids)} events in one request...")
+    return vegetation_index_table(job.getInfo(), event_ids)
+#-------------------------------------------------------------------------------------------------------------------
+def compute_indices_array(bands, qa=None, pipeline=LANDSAT8, indices=DEFAULT_INDICES, nodata=0, out=None):
+    """
+    Compute spectral indices on in-memory rasters with the scaling, cloud mask and formulas of a SensorPipeline.
+
+    This is the local counterpart of SensorPipeline.process. Everything runs in float32 with
+    preallocated buffers: each needed band is scaled once into its own buffer and every index
+    is computed with out= through two scratch buffers, so no temporary array is allocated per
+    operation. Pixels that Earth Engine would mask are NaN: cloudy pixels (any qa_mask bit set
+    in qa), nodata pixels and pixels with a zero denominator.
+
+    Parameters:
+        bands (dict): Raw digital numbers keyed by sensor band name (e.g. 'SR_B5') or by role
+            ('blue', 'red', 'nir', 'swir2'); arrays of the same shape.
+        qa (np.ndarray): Integer QA band, or None to skip cloud masking (default: None).
+        pipeline (SensorPipeline): Scaling, QA bits and band names (default: LANDSAT8).
+        indices (tuple): Indices among 'evi', 'ndvi' and 'nbr' (default: ('ndvi', 'evi')).
+        nodata (int): Digital number of missing pixels, or None (default: 0, the Landsat and Sentinel-2 fill value).
+        out (dict): Optional preallocated float32 arrays keyed by index, filled in place (default: None).
+
+    Returns:
+        dict: float32 array per index.
+    """
+    import numpy as np
+
+    unknown = [index for index in indices if index not in INDEX_ROLES]
+    if unknown:
+        raise ValueError(f"Unknown indices {unknown}; expected some of {sorted(INDEX_ROLES)}.")
+
+    roles = [role for role in ('blue', 'red', 'nir', 'swir2') if any(role in INDEX_ROLES[i] for i in indices)]
+    raw = {role: bands[pipeline.bands[role]] if pipeline.bands[role] in bands else bands[role] for role in roles}
+    shape = np.shape(raw[roles[0]])
+
+    # Pixels to mask: nodata in any input band, or any cloud bit set
+    masked = np.zeros(shape, dtype=bool)
+    if nodata is not None:
+        for dn in raw.values():
+            masked |= dn == nodata
+    if qa is not None:
+        masked |= np.bitwise_and(qa, pipeline.qa_mask) != 0
+
+    # Surface reflectance, one float32 buffer per band
+    reflectance = {}
+    for role, dn in raw.items():
+        buffer = np.empty(shape, dtype=np.float32)
+        np.multiply(dn, np.float32(pipeline.scale), out=buffer, dtype=np.float32)
+        np.add(buffer, np.float32(pipeline.offset), out=buffer)
+        reflectance[role] = buffer
+
+    num = np.empty(shape, dtype=np.float32)
+    den = np.empty(shape, dtype=np.float32)
+    out = dict(out or {})
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for index in indices:
+            result = out.get(index)
+            if result is None:
+                result = out[index] = np.empty(shape, dtype=np.float32)
+            if index == 'evi':
+                # 2.5 * ((NIR - RED) / (NIR + 6 * RED - 7.5 * BLUE + 1))
+                nir, red, blue = reflectance['nir'], reflectance['red'], reflectance['blue']
+                np.multiply(red, np.float32(6), out=den)
+                np.add(den, nir, out=den)
+                np.multiply(blue, np.float32(7.5), out=num)
+                np.subtract(den, num, out=den)
+                np.add(den, np.float32(1), out=den)
+                np.subtract(nir, red, out=num)
+                np.divide(num, den, out=result)
+                np.multiply(result, np.float32(2.5), out=result)
+            else:
+                # Normalized difference: (NIR - RED) / (NIR + RED) or (NIR - SWIR2) / (NIR + SWIR2)
+                first, second = reflectance['nir'], reflectance['red' if index == 'ndvi' else 'swir2']
+                np.subtract(first, second, out=num)
+                np.add(first, second, out=den)
+                np.divide(num, den, out=result)
+            np.copyto(result, np.float32(np.nan), where=masked | (den == 0))
+    return out
+#-------------------------------------------------------------------------------------------------------------------
+def compute_indices(scene, pipeline=LANDSAT8, indices=DEFAULT_INDICES, nodata=0):
+    """
+    Compute spectral indices over an xarray Dataset of raw bands, chunk by chunk.
+
+    Each chunk is processed independently by compute_indices_array, so with a dask-backed
+    scene (e.g. opened with chunks={'x': 2048, 'y': 2048}) the result is lazy, chunks run in
+    parallel on the Dask workers, and peak memory per chunk is a few float32 copies of it.
+
+    Parameters:
+        scene (xr.Dataset): Raw digital numbers named as in the pipeline (e.g. 'SR_B2', 'SR_B4',
+            'SR_B5', 'SR_B7' and 'QA_PIXEL'); without the QA band no cloud mask is applied.
+        pipeline (SensorPipeline): Scaling, QA bits and band names (default: LANDSAT8).
+        indices (tuple): Indices among 'evi', 'ndvi' and 'nbr' (default: ('ndvi', 'evi')).
+        nodata (int): Digital number of missing pixels, or None (default: 0).
+
+    Returns:
+        xr.Dataset: One float32 variable per index, with the scene's dimensions and chunks.
+    """
+    import numpy as np
+    import xarray as xr
+
+    names = pipeline.input_bands(indices)
+    has_qa = pipeline.qa_band in scene
+
+    def kernel(*arrays):
+        qa = arrays[len(names)] if has_qa else None
+        result = compute_indices_array(dict(zip(names, arrays)), qa, pipeline, indices, nodata)
+        return tuple(result[index] for index in indices)
+
+    inputs = [scene[name] for name in names] + ([scene[pipeline.qa_band]] if has_qa else [])
+    outputs = xr.apply_ufunc(
+        kernel, *inputs,
+        output_core_dims=[[] for _ in indices],
+        dask='parallelized',
+        output_dtypes=[np.float32] * len(indices),
+    )
+    if len(indices) == 1:
+        outputs = (outputs,)
+    return xr.Dataset({index: output for index, output in zip(indices, outputs)})
+#-------------------------------------------------------------------------------------------------------------------
+def compute_dnbr(pre_nbr, post_nbr, scale=1000.0, offset=0.0, out=None):
+    """
+    Compute the differenced NBR: (pre-fire NBR - post-fire NBR) * scale - offset.
+
+    With the default scale of 1000 the result is in the units of the MTBS thresholds
+    (Low_T, Mod_T, High_T), and the event's dNBR_offst can be passed as offset.
+
+    Parameters:
+        pre_nbr, post_nbr (np.ndarray or xr.DataArray): NBR before and after the fire, e.g. from compute_indices.
+        scale (float): Multiplier (default: 1000.0).
+        offset (float): Value subtracted after scaling, e.g. the MTBS dNBR_offst (default: 0.0).
+        out (np.ndarray): Optional float32 output buffer for NumPy inputs (default: None).
+
+    Returns:
+        np.ndarray or xr.DataArray: float32 dNBR.
+    """
+    import numpy as np
+
+    if not isinstance(pre_nbr, np.ndarray):
+        return ((pre_nbr - post_nbr) * scale - offset).astype(np.float32)
+    if out is None:
+        out = np.empty(np.shape(pre_nbr), dtype=np.float32)
+    np.subtract(pre_nbr, post_nbr, out=out)
+    np.multiply(out, np.float32(scale), out=out)
+    np.subtract(out, np.float32(offset), out=out)
+    return out
+#-------------------------------------------------------------------------------------------------------------------
+def _composite_tiles(stack, dim, tile_size, chunk_memory, copies):
+    """
+    Rechunk a time stack so each chunk holds the whole time axis over a square spatial tile.
+
+    Without tile_size, the tile is sized so that copies float32 arrays of a chunk fit in chunk_memory.
+    """
+    import numpy as np
+    from dask.utils import parse_bytes
+
+    spatial = [d for d in stack.dims if d != dim]
+    if tile_size is None:
+        budget = parse_bytes(chunk_memory) if isinstance(chunk_memory, str) else int(chunk_memory)
+        tile_size = max(64, int(np.sqrt(budget / (copies * 4 * stack.sizes[dim]))))
+    return stack.chunk({dim: -1, **{d: tile_size for d in spatial}})
+#-------------------------------------------------------------------------------------------------------------------
+def _nanmedian_block(block):
+    """
+    Median over the last axis ignoring NaN (all-NaN pixels stay NaN), in float32.
+    """
+    import warnings
+    import numpy as np
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanmedian(block, axis=-1).astype(np.float32, copy=False)
+#-------------------------------------------------------------------------------------------------------------------
+def _nanpercentile_block(block, percentiles, method):
+    """
+    Percentiles over the last axis ignoring NaN, returned with the percentile axis last, in float32.
+    """
+    import warnings
+    import numpy as np
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        values = np.nanpercentile(block, percentiles, axis=-1, method=method)
+    return np.moveaxis(values, 0, -1).astype(np.float32, copy=False)
+#-------------------------------------------------------------------------------------------------------------------
+def composite_median(stack, dim='time', tile_size=None, chunk_memory='128MB'):
+    """
+    Cloud-masked median composite of a local time stack, the counterpart of ImageCollection.median().
+
+    Masked pixels are NaN (as produced by compute_indices) and are ignored; a pixel masked in
+    every image stays NaN. The median of an even number of values is the mean of the two
+    middle ones. The stack is processed tile by tile, each tile holding the full time axis, so
+    peak memory per task is bounded by chunk_memory (or tile_size) rather than by the scene,
+    and the tiles run in parallel on the workers of an active Dask client (e.g. from
+    source_coop_utils.initialize_dask_cluster).
+
+    Parameters:
+        stack (xr.Dataset or xr.DataArray): Float bands with a time dimension, numpy- or dask-backed.
+        dim (str): Name of the time dimension (default: 'time').
+        tile_size (int): Pixels per tile side; overrides chunk_memory (default: None).
+        chunk_memory (str or int): Target memory per tile, e.g. '128MB' (default: '128MB').
+
+    Returns:
+        xr.Dataset or xr.DataArray: Lazy float32 composite without the time dimension.
+
+    Example:
+        indices = compute_indices(scenes.chunk({'time': 1, 'y': 2048, 'x': 2048}))
+        evi_median = composite_median(indices['evi']).compute()
+    """
+    import numpy as np
+    import xarray as xr
+
+    # np.nanmedian partitions a copy of each tile; budget the input plus two copies
+    stack = _composite_tiles(stack, dim, tile_size, chunk_memory, copies=3)
+    return xr.apply_ufunc(
+        _nanmedian_block, stack,
+        input_core_dims=[[dim]],
+        dask='parallelized',
+        output_dtypes=[np.float32],
+    )
+#-------------------------------------------------------------------------------------------------------------------
+def composite_percentiles(stack, percentiles=(10, 50, 90), dim='time', tile_size=None, chunk_memory='128MB',
+                          method='linear'):
+    """
+    Cloud-masked per-pixel percentiles of a local time stack, the counterpart of reducing with ee.Reducer.percentile.
+
+    NaN pixels are ignored as in composite_median, and the stack is processed tile by tile in the same way.
+
+    Parameters:
+        stack (xr.Dataset or xr.DataArray): Float bands with a time dimension, numpy- or dask-backed.
+        percentiles (tuple): Percentiles in [0, 100] (default: (10, 50, 90)).
+        dim (str): Name of the time dimension (default: 'time').
+        tile_size (int): Pixels per tile side; overrides chunk_memory (default: None).
+        chunk_memory (str or int): Target memory per tile (default: '128MB').
+        method (str): np.nanpercentile interpolation method (default: 'linear').
+
+    Returns:
+        xr.Dataset or xr.DataArray: Lazy float32 composite with a 'percentile' dimension instead of time.
+    """
+    import numpy as np
+    import xarray as xr
+
+    percentiles = [float(p) for p in percentiles]
+    stack = _composite_tiles(stack, dim, tile_size, chunk_memory, copies=2 + len(percentiles))
+    composite = xr.apply_ufunc(
+        _nanpercentile_block, stack,
+        kwargs={'percentiles': percentiles, 'method': method},
+        input_core_dims=[[dim]],
+        output_core_dims=[['percentile']],
+        dask='parallelized',
+        output_dtypes=[np.float32],
+        dask_gufunc_kwargs={'output_sizes': {'percentile': len(percentiles)}},
+    )
+    return composite.assign_coords(percentile=percentiles)
+#-------------------------------------------------------------------------------------------------------------------
+def _best_index_block(quality):
+    """
+    Index along the last axis of the highest non-NaN quality value, or -1 where every value is NaN.
+    """
+    import numpy as np
+
+    filled = np.where(np.isnan(quality), -np.inf, quality)
+    best = np.argmax(filled, axis=-1)
+    best[np.isneginf(np.max(filled, axis=-1))] = -1
+    return best.astype(np.int32)
+#-------------------------------------------------------------------------------------------------------------------
+def _take_block(block, best):
+    """
+    Values of block at the time index best (NaN where best is -1), in float32.
+    """
+    import numpy as np
+
+    values = np.take_along_axis(block, np.maximum(best, 0)[..., None], axis=-1)[..., 0].astype(np.float32)
+    values[best < 0] = np.nan
+    return values
+#-------------------------------------------------------------------------------------------------------------------
+def quality_mosaic(stack, quality_band, dim='time', tile_size=None, chunk_memory='128MB'):
+    """
+    Quality mosaic of a local time stack, the counterpart of ImageCollection.qualityMosaic(quality_band).
+
+    Each pixel takes every band from the image with the highest unmasked quality_band value
+    (e.g. 'ndvi' for the greenest pixel). Pixels whose quality band is masked in every image
+    are NaN. The stack is processed tile by tile like composite_median.
+
+    Parameters:
+        stack (xr.Dataset): Float bands with a time dimension, including quality_band.
+        quality_band (str): Band whose maximum selects the image of each pixel.
+        dim (str): Name of the time dimension (default: 'time').
+        tile_size (int): Pixels per tile side; overrides chunk_memory (default: None).
+        chunk_memory (str or int): Target memory per tile (default: '128MB').
+
+    Returns:
+        xr.Dataset: Lazy float32 mosaic without the time dimension, plus the int32 'source_index'
+        of the selected image (-1 where none).
+    """
+    import numpy as np
+    import xarray as xr
+
+    stack = _composite_tiles(stack, dim, tile_size, chunk_memory, copies=len(stack.data_vars) + 2)
+    best = xr.apply_ufunc(
+        _best_index_block, stack[quality_band],
+        input_core_dims=[[dim]],
+        dask='parallelized',
+        output_dtypes=[np.int32],
+    )
+    mosaic = xr.apply_ufunc(
+        _take_block, stack, best,
+        input_core_dims=[[dim], []],
+        dask='parallelized',
+        output_dtypes=[np.float32],
+    )
+    return mosaic.assign(source_index=best)
+#-------------------------------------------------------------------------------------------------------------------
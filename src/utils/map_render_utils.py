@@ -0,0 +1,411 @@
+import json
+import os
+import shutil
+import threading
+import numpy as np
+import pandas as pd
+
+# Rendering helpers for large perimeter layers in leafmap.
+
+# Half the width of the Web Mercator (EPSG:3857) world in meters
+WEB_MERCATOR_HALF_WORLD = 20037508.342789244
+
+# Leaflet path style shared by every feature
+BASE_STYLE = {"color": "black", "weight": 1, "fillOpacity": 0.7}
+
+# GeoJSON size above which create_mtbs_perimeter_map suggests vector tiles
+MAX_GEOJSON_PAYLOAD_MB = 5
+
+# Tile servers started by serve_tiles: port -> (directory, server, thread)
+_TILE_SERVERS = {}
+_TILE_SERVERS_LOCK = threading.Lock()
+
+# Fill colors of the MTBS incident types
+INCID_TYPE_COLORS = {
+    "Wildfire": "#bd0026",
+    "Prescribed Fire": "#31a354",
+    "Wildland Fire Use": "#fd8d3c",
+    "Unknown": "#969696",
+}
+
+# Leaflet.VectorGrid style function: reads the precomputed 'fill_color' property of each
+# feature, so no per-feature Python callback is involved
+_VECTOR_TILE_STYLE_JS = """{{
+    "{layer_name}": function(properties, zoom) {{
+        return {{
+            fill: true,
+            fillColor: properties.fill_color,
+            fillOpacity: {fill_opacity},
+            color: properties.fill_color,
+            weight: {weight},
+            opacity: 1
+        }};
+    }}
+}}"""
+
+#-------------------------------------------------------------------------------------------------------------------
+def add_style_columns(gdf, column, colors, default_color="#cccccc", base_style=None):
+    """
+    Precompute the style of every feature into 'fill_color' and 'style' columns.
+
+    leafmap/ipyleaflet apply the JSON 'style' property of each GeoJSON feature directly, and
+    the vector tile style function reads 'fill_color', so no style_callback is needed.
+
+    Parameters:
+    - gdf (geopandas.GeoDataFrame): Layer to style.
+    - column (str): Column whose values select the color (e.g. 'Severity' or 'Incid_Type').
+    - colors (dict): Value -> fill color.
+    - default_color (str): Fill color of values missing from colors (default: '#cccccc').
+    - base_style (dict): Style shared by every feature (default: BASE_STYLE).
+
+    Returns:
+    - geopandas.GeoDataFrame: Copy of gdf with 'fill_color' and 'style' columns.
+    """
+    if base_style is None:
+        base_style = BASE_STYLE
+
+    gdf = gdf.copy()
+    fill_colors = gdf[column].astype("object").map(colors).fillna(default_color)
+
+    # One JSON string per distinct color, shared by all features with that color
+    styles = {color: json.dumps({**base_style, "fillColor": color}, separators=(",", ":")) for color in fill_colors.unique()}
+    gdf["fill_color"] = fill_colors
+    gdf["style"] = fill_colors.map(styles)
+    return gdf
+#-------------------------------------------------------------------------------------------------------------------
+def pixel_size_degrees(zoom):
+    """
+    Return the width of one screen pixel in degrees of longitude at a web map zoom level.
+    """
+    return 360 / (256 * 2 ** zoom)
+#-------------------------------------------------------------------------------------------------------------------
+def simplify_for_zoom(gdf, zoom, columns=None):
+    """
+    Simplify a layer for display at a given zoom level.
+
+    Geometries are simplified to one screen pixel and their coordinates are snapped to the
+    decimal grid just below a tenth of a pixel, which removes vertices and digits that cannot
+    be seen at that zoom.
+
+    Parameters:
+    - gdf (geopandas.GeoDataFrame): Layer in EPSG:4326.
+    - zoom (int): Web map zoom level the layer is displayed at.
+    - columns (list): Attribute columns to keep (default: all).
+
+    Returns:
+    - geopandas.GeoDataFrame: Simplified copy without empty geometries.
+    """
+    import shapely
+
+    if columns is not None:
+        gdf = gdf[[*columns, gdf.geometry.name]]
+    gdf = gdf.copy()
+
+    tolerance = pixel_size_degrees(zoom)
+    decimals = int(np.ceil(-np.log10(tolerance / 10)))
+    geometries = shapely.simplify(gdf.geometry.values, tolerance, preserve_topology=True)
+    geometries = shapely.set_precision(geometries, 10.0 ** -decimals)
+    # Round away the float noise of the grid so the GeoJSON prints short coordinates
+    geometries = shapely.transform(geometries, lambda coords: np.round(coords, decimals))
+    gdf[gdf.geometry.name] = geometries
+    return gdf[~gdf.geometry.is_empty & gdf.geometry.notna()]
+#-------------------------------------------------------------------------------------------------------------------
+def geojson_payload_mb(gdf):
+    """
+    Return the size in MB of the GeoJSON that leafmap sends to the notebook for gdf.
+    """
+    return len(gdf.to_json().encode("utf-8")) / (1024 * 1024)
+#-------------------------------------------------------------------------------------------------------------------
+def _tile_bounds(zoom, x, y):
+    """
+    Return the EPSG:3857 bounds (minx, miny, maxx, maxy) of XYZ tile (zoom, x, y).
+    """
+    size = 2 * WEB_MERCATOR_HALF_WORLD / 2 ** zoom
+    minx = -WEB_MERCATOR_HALF_WORLD + x * size
+    maxy = WEB_MERCATOR_HALF_WORLD - y * size
+    return minx, maxy - size, minx + size, maxy
+#-------------------------------------------------------------------------------------------------------------------
+def _tile_ranges(bounds, zoom):
+    """
+    Return the inclusive XYZ tile index ranges (x0, y0, x1, y1) covered by each EPSG:3857 bounding box.
+    """
+    n_tiles = 2 ** zoom
+    size = 2 * WEB_MERCATOR_HALF_WORLD / n_tiles
+    x0 = np.floor((bounds[:, 0] + WEB_MERCATOR_HALF_WORLD) / size)
+    x1 = np.floor((bounds[:, 2] + WEB_MERCATOR_HALF_WORLD) / size)
+    y0 = np.floor((WEB_MERCATOR_HALF_WORLD - bounds[:, 3]) / size)
+    y1 = np.floor((WEB_MERCATOR_HALF_WORLD - bounds[:, 1]) / size)
+    return np.clip(np.stack([x0, y0, x1, y1], axis=1), 0, n_tiles - 1).astype(np.int64)
+#-------------------------------------------------------------------------------------------------------------------
+def _tile_properties(df):
+    """
+    Return one MVT-encodable property dict per row: dates become 'YYYY-MM-DD' strings and missing values are dropped.
+    """
+    df = df.copy()
+    for column in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = df[column].dt.strftime("%Y-%m-%d")
+    records = df.astype("object").where(df.notna(), None).to_dict("records")
+    return [{key: value for key, value in record.items() if value is not None} for record in records]
+#-------------------------------------------------------------------------------------------------------------------
+def write_vector_tiles(gdf, tile_dir, min_zoom=0, max_zoom=8, layer_name="mtbs", columns=None,
+                       extent=4096, buffer=64, overwrite=False):
+    """
+    Write a layer as a static {z}/{x}/{y}.pbf Mapbox Vector Tile pyramid.
+
+    Each zoom level is simplified to one screen pixel, features are clipped to the tiles
+    they overlap (plus a small buffer to hide seams), and only non-empty tiles are written.
+    The browser then requests just the tiles in view, so the notebook never receives the
+    geometries. Tiles are written to a temporary directory that replaces tile_dir at the end,
+    and an existing pyramid is reused unless overwrite=True.
+
+    Parameters:
+    - gdf (geopandas.GeoDataFrame): Layer to tile; reprojected to EPSG:3857.
+    - tile_dir (str): Output directory of the pyramid.
+    - min_zoom, max_zoom (int): Zoom levels to generate (default: 0 to 8). Leaflet overzooms past max_zoom.
+    - layer_name (str): Name of the MVT layer (default: 'mtbs').
+    - columns (list): Attribute columns stored in the tiles (default: all). Keep this short;
+      it sets the tile size. Include 'fill_color' for styled rendering.
+    - extent (int): Tile coordinate extent (default: 4096).
+    - buffer (int): Clip buffer in tile units (default: 64).
+    - overwrite (bool): Regenerate an existing pyramid (default: False).
+
+    Returns:
+    - dict: Pyramid metadata with the tile count and size of every zoom level.
+    """
+    import shapely
+    import mapbox_vector_tile
+
+    metadata_path = os.path.join(tile_dir, "metadata.json")
+    if os.path.exists(metadata_path) and not overwrite:
+        print(f"Vector tiles already exist in {tile_dir}. Skipping generation.")
+        with open(metadata_path) as f:
+            return json.load(f)
+
+    if columns is None:
+        columns = [c for c in gdf.columns if c != gdf.geometry.name]
+    gdf = gdf[[*columns, gdf.geometry.name]].to_crs(3857)
+    properties = _tile_properties(gdf[list(columns)])
+
+    tmp_dir = f"{tile_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    levels = []
+    for zoom in range(min_zoom, max_zoom + 1):
+        tile_size = 2 * WEB_MERCATOR_HALF_WORLD / 2 ** zoom
+        geometries = shapely.simplify(gdf.geometry.values, tile_size / 256, preserve_topology=True)
+        keep = np.flatnonzero(~shapely.is_empty(geometries) & ~shapely.is_missing(geometries))
+        geometries = geometries[keep]
+
+        # Explode every feature to the tiles its bounding box covers
+        ranges = _tile_ranges(shapely.bounds(geometries), zoom)
+        widths = ranges[:, 2] - ranges[:, 0] + 1
+        heights = ranges[:, 3] - ranges[:, 1] + 1
+        counts = widths * heights
+        feature = np.repeat(np.arange(len(geometries)), counts)
+        offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        tile_x = ranges[feature, 0] + offset % widths[feature]
+        tile_y = ranges[feature, 1] + offset // widths[feature]
+
+        tiles = pd.DataFrame({"x": tile_x, "y": tile_y, "feature": feature})
+        n_tiles, n_bytes = 0, 0
+        for (x, y), members in tiles.groupby(["x", "y"], sort=False):
+            minx, miny, maxx, maxy = _tile_bounds(zoom, x, y)
+            pad = buffer * tile_size / extent
+            clipped = shapely.clip_by_rect(geometries[members["feature"].to_numpy()],
+                                           minx - pad, miny - pad, maxx + pad, maxy + pad)
+            features = [
+                {"geometry": geometry, "properties": properties[keep[i]]}
+                for geometry, i in zip(clipped, members["feature"].to_numpy())
+                if not geometry.is_empty
+            ]
+            if not features:
+                continue
+
+            data = mapbox_vector_tile.encode(
+                [{"name": layer_name, "features": features}],
+                default_options={"quantize_bounds": (minx, miny, maxx, maxy), "extents": extent},
+            )
+            path = os.path.join(tmp_dir, str(zoom), str(x), f"{y}.pbf")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(data)
+            n_tiles += 1
+            n_bytes += len(data)
+
+        levels.append({"zoom": zoom, "tiles": n_tiles, "mb": n_bytes / (1024 * 1024)})
+        print(f"Zoom {zoom}: {n_tiles} tiles, {n_bytes / (1024 * 1024):.2f} MB")
+
+    metadata = {
+        "layer_name": layer_name,
+        "min_zoom": min_zoom,
+        "max_zoom": max_zoom,
+        "columns": list(columns),
+        "features": len(gdf),
+        "levels": levels,
+    }
+    with open(os.path.join(tmp_dir, "metadata.json"), "w") as f:
+        json.dump(metadata, f, indent=2)
+
+    shutil.rmtree(tile_dir, ignore_errors=True)
+    os.replace(tmp_dir, tile_dir)
+    return metadata
+#-------------------------------------------------------------------------------------------------------------------
+def serve_tiles(tile_dir, port=8765):
+    """
+    Serve a static tile directory over HTTP from a background thread.
+
+    The server sends CORS headers so the notebook page can fetch tiles from it. Servers are
+    tracked by port: a repeat call for the same directory returns the running server's URL,
+    and a call for another directory on the same port stops the old server first. Use
+    stop_tile_server to shut servers down.
+
+    Parameters:
+    - tile_dir (str): Directory written by write_vector_tiles.
+    - port (int): Local port (default: 8765).
+
+    Returns:
+    - str: Tile URL template, e.g. 'http://localhost:8765/{z}/{x}/{y}.pbf'.
+    """
+    from functools import partial
+    from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+    class TileRequestHandler(SimpleHTTPRequestHandler):
+        def end_headers(self):
+            self.send_header("Access-Control-Allow-Origin", "*")
+            super().end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    directory = os.path.abspath(tile_dir)
+    url = f"http://localhost:{port}/{{z}}/{{x}}/{{y}}.pbf"
+    with _TILE_SERVERS_LOCK:
+        running = _TILE_SERVERS.get(port)
+        if running is not None and running[0] == directory:
+            return url
+        if running is not None:
+            _shutdown_tile_server(_TILE_SERVERS.pop(port))
+
+        server = ThreadingHTTPServer(("localhost", port), partial(TileRequestHandler, directory=directory))
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        _TILE_SERVERS[port] = (directory, server, thread)
+    print(f"Serving {tile_dir} at http://localhost:{port}")
+    return url
+#-------------------------------------------------------------------------------------------------------------------
+def _shutdown_tile_server(entry):
+    """
+    Stop a (directory, server, thread) entry of _TILE_SERVERS and release its port.
+    """
+    _, server, thread = entry
+    server.shutdown()
+    server.server_close()
+    thread.join()
+#-------------------------------------------------------------------------------------------------------------------
+def stop_tile_server(port=None):
+    """
+    Stop the tile server started by serve_tiles on port, or every tile server when port is None.
+
+    Parameters:
+    - port (int): Port of the server to stop (default: None, all servers).
+
+    Returns:
+    - list: Ports of the stopped servers.
+    """
+    with _TILE_SERVERS_LOCK:
+        ports = list(_TILE_SERVERS) if port is None else [port] if port in _TILE_SERVERS else []
+        for stopped in ports:
+            _shutdown_tile_server(_TILE_SERVERS.pop(stopped))
+    return ports
+#-------------------------------------------------------------------------------------------------------------------
+def add_vector_tile_layer(m, tile_url, layer_name="mtbs", min_zoom=0, max_native_zoom=8, fill_opacity=0.6, weight=0.5,
+                          name="MTBS Perimeters"):
+    """
+    Add a vector tile pyramid to a leafmap map, styled from its precomputed 'fill_color' property.
+
+    Parameters:
+    - m (leafmap.Map): Map to add the layer to.
+    - tile_url (str): Tile URL template, e.g. from serve_tiles.
+    - layer_name (str): MVT layer name used when writing the tiles (default: 'mtbs').
+    - min_zoom (int): Shallowest zoom level in the pyramid; the layer is hidden below it (default: 0).
+    - max_native_zoom (int): Deepest zoom level in the pyramid (default: 8).
+    - fill_opacity (float), weight (float): Polygon fill opacity and outline width.
+    - name (str): Layer name shown in the layer control.
+
+    Returns:
+    - ipyleaflet.VectorTileLayer: The added layer.
+    """
+    import ipyleaflet
+
+    layer = ipyleaflet.VectorTileLayer(
+        url=tile_url,
+        name=name,
+        layer_styles=_VECTOR_TILE_STYLE_JS.format(layer_name=layer_name, fill_opacity=fill_opacity, weight=weight),
+        min_zoom=min_zoom,
+        max_native_zoom=max_native_zoom,
+    )
+    m.add_layer(layer)
+    return layer
+#-------------------------------------------------------------------------------------------------------------------
+def create_mtbs_perimeter_map(mtbs_ddf, mode="vector_tiles", color_column="Incid_Type", colors=None,
+                              tile_dir="mtbs_tiles", min_zoom=2, max_zoom=8, zoom=4, columns=("Event_ID", "Incid_Name"),
+                              tile_url=None, port=8765, overwrite=False):
+    """
+    Map every MTBS perimeter without pushing the full-resolution GeoJSON through the notebook.
+
+    mode='vector_tiles' writes (once) a static MVT pyramid and serves it to a
+    VectorTileLayer, so the notebook payload stays a few KB whatever the layer size.
+    mode='simplified' sends a single GeoJSON layer simplified for the initial zoom, which
+    needs no tile server but grows with the number of perimeters; use it for subsets. In both modes the fill color is precomputed from color_column.
+
+    Parameters:
+    - mtbs_ddf (dask_geopandas.GeoDataFrame or geopandas.GeoDataFrame): MTBS perimeters.
+    - mode (str): 'vector_tiles' or 'simplified' (default: 'vector_tiles').
+    - color_column (str): Column mapped to the fill color (default: 'Incid_Type').
+    - colors (dict): Value -> fill color (default: INCID_TYPE_COLORS).
+    - tile_dir (str): Tile pyramid directory (default: 'mtbs_tiles').
+    - min_zoom, max_zoom (int): Tile zoom levels to generate (default: 2 to 8).
+    - zoom (int): Initial map zoom, also the simplification level in 'simplified' mode (default: 4).
+    - columns (tuple): Attribute columns kept for display (default: ('Event_ID', 'Incid_Name')).
+    - tile_url (str): Tile URL template if the tiles are served elsewhere, e.g. by Jupyter's
+      '/files/' route; by default a local server is started with serve_tiles.
+    - port (int): Port of the local tile server (default: 8765).
+    - overwrite (bool): Regenerate an existing tile pyramid (default: False).
+
+    Returns:
+    - leafmap.Map: Interactive map of the perimeters.
+    """
+    import leafmap
+
+    if colors is None:
+        colors = INCID_TYPE_COLORS
+    if mode not in ("vector_tiles", "simplified"):
+        raise ValueError(f"Unknown mode {mode!r}. Use 'vector_tiles' or 'simplified'.")
+
+    m = leafmap.Map(center=[39.8283, -98.5795], zoom=zoom)
+
+    metadata_path = os.path.join(tile_dir, "metadata.json")
+    if mode == "simplified" or overwrite or not os.path.exists(metadata_path):
+        gdf = mtbs_ddf.compute() if hasattr(mtbs_ddf, "compute") else mtbs_ddf
+        keep = [c for c in dict.fromkeys([*columns, color_column]) if c in gdf.columns]
+        gdf = add_style_columns(gdf[[*keep, gdf.geometry.name]], color_column, colors)
+
+    if mode == "simplified":
+        gdf = simplify_for_zoom(gdf, zoom, columns=[*keep, "style"])
+        payload_mb = geojson_payload_mb(gdf)
+        print(f"GeoJSON payload: {payload_mb:.2f} MB for {len(gdf)} perimeters")
+        if payload_mb > MAX_GEOJSON_PAYLOAD_MB:
+            print("The payload is large; use mode='vector_tiles' or a subset for a lighter notebook.")
+        m.add_gdf(gdf, layer_name="MTBS Perimeters", info_mode="on_click")
+    else:
+        if overwrite or not os.path.exists(metadata_path):
+            write_vector_tiles(gdf, tile_dir, min_zoom=min_zoom, max_zoom=max_zoom,
+                               columns=[*keep, "fill_color"], overwrite=overwrite)
+        if tile_url is None:
+            tile_url = serve_tiles(tile_dir, port)
+        add_vector_tile_layer(m, tile_url, min_zoom=min_zoom, max_native_zoom=max_zoom)
+
+    m.add_legend(title=color_column, labels=list(colors), colors=list(colors.values()))
+    return m
+#-------------------------------------------------------------------------------------------------------------------
@@ -0,0 +1,330 @@
+import time
+import numpy as np
+import pandas as pd
+
+# Local (Earth Engine free) helpers for the MTBS perimeter data loaded by source_coop_utils.
+
+# Default file of the MTBSAttributeStore
+MTBS_ATTRIBUTE_STORE_PATH = 'mtbs_attributes.parquet'
+
+#-------------------------------------------------------------------------------------------------------------------
+class MTBSQueryEngine:
+    """
+    In-memory bbox + Ig_Date query engine over the MTBS perimeters from get_mtbs_shp.
+
+    The Dask GeoDataFrame is materialized once. Each partition keeps its bounding box and a
+    shapely STRtree over its geometries, and a sorted Ig_Date index covers all rows. A
+    query prunes partitions by bounding box, probes the STRtrees of the remaining
+    partitions, and intersects the hits with the Ig_Date range found by binary search, so
+    no network round trip is needed.
+
+    Parameters:
+    - mtbs_ddf (dask_geopandas.GeoDataFrame or geopandas.GeoDataFrame): MTBS perimeters.
+    - date_column (str): Ignition date column (default: 'Ig_Date').
+
+    Example:
+        engine = MTBSQueryEngine(mtbs_shp_ddf)
+        df = engine.query([-124.4, 32.5, -114.1, 42.0], '2016-01-01', '2021-12-31')
+    """
+    def __init__(self, mtbs_ddf, date_column='Ig_Date'):
+        import dask
+        import shapely
+
+        started = time.perf_counter()
+        if hasattr(mtbs_ddf, 'to_delayed'):
+            partitions = list(dask.compute(*mtbs_ddf.to_delayed()))
+        else:
+            partitions = [mtbs_ddf]
+        self.date_column = date_column
+        # Zero-row frame with the input schema, returned when nothing matches
+        self.empty = (partitions[0] if partitions else mtbs_ddf._meta).iloc[:0].reset_index(drop=True)
+        self.partitions = [gdf.reset_index(drop=True) for gdf in partitions if len(gdf)]
+        self.trees = [shapely.STRtree(gdf.geometry.values) for gdf in self.partitions]
+        self.bounds = np.array([gdf.total_bounds for gdf in self.partitions]).reshape(-1, 4)
+
+        # Sorted Ig_Date index over every row: (date, partition, row) ordered by date
+        dates = [pd.to_datetime(gdf[date_column]).to_numpy('datetime64[ns]') for gdf in self.partitions]
+        self.partition_dates = dates
+        all_dates = np.concatenate(dates) if dates else np.array([], dtype='datetime64[ns]')
+        part_ids = np.repeat(np.arange(len(dates)), [len(d) for d in dates])
+        row_ids = np.concatenate([np.arange(len(d)) for d in dates]) if dates else np.array([], dtype=int)
+        order = np.argsort(all_dates, kind='stable')
+        self.sorted_dates = all_dates[order]
+        self.sorted_partitions = part_ids[order]
+        self.sorted_rows = row_ids[order]
+        self.build_s = time.perf_counter() - started
+
+    def __len__(self):
+        return len(self.sorted_dates)
+
+    def _matching_rows(self, bbox, start_date, end_date):
+        """
+        Return {partition index: row positions} of perimeters intersecting bbox with start <= Ig_Date <= end.
+        """
+        import shapely
+
+        # Ig_Date range from the sorted index (inclusive on both ends, like ee.Filter.rangeContains)
+        start = np.datetime64(pd.Timestamp(start_date), 'ns')
+        end = np.datetime64(pd.Timestamp(end_date), 'ns')
+        lo = np.searchsorted(self.sorted_dates, start, side='left')
+        hi = np.searchsorted(self.sorted_dates, end, side='right')
+        if lo >= hi:
+            return {}
+
+        # Partition-level bbox pruning
+        min_lon, min_lat, max_lon, max_lat = bbox
+        candidates = np.flatnonzero(
+            (self.bounds[:, 0] <= max_lon) & (self.bounds[:, 2] >= min_lon)
+            & (self.bounds[:, 1] <= max_lat) & (self.bounds[:, 3] >= min_lat)
+        )
+        in_range_partitions = self.sorted_partitions[lo:hi]
+        in_range_rows = self.sorted_rows[lo:hi]
+        box = shapely.box(*bbox)
+
+        matches = {}
+        for p in candidates:
+            date_rows = in_range_rows[in_range_partitions == p]
+            if len(date_rows) == 0:
+                continue
+            spatial_rows = self.trees[p].query(box, predicate='intersects')
+            rows = np.intersect1d(spatial_rows, date_rows, assume_unique=True)
+            if len(rows):
+                matches[p] = rows
+        return matches
+
+    def query_gdf(self, bbox, start_date, end_date):
+        """
+        Return the full perimeter rows intersecting bbox with an Ig_Date in [start_date, end_date].
+
+        Parameters:
+        - bbox (list): Bounding box as [min_lon, min_lat, max_lon, max_lat].
+        - start_date, end_date (str): Dates in 'YYYY-MM-DD' format (inclusive).
+
+        Returns:
+        - geopandas.GeoDataFrame: Matching perimeters (empty, with the same columns, when nothing matches).
+        """
+        matches = self._matching_rows(bbox, start_date, end_date)
+        if not matches:
+            return self.empty.copy()
+        return pd.concat([self.partitions[p].iloc[rows] for p, rows in matches.items()], ignore_index=True)
+
+    def query(self, bbox, start_date, end_date, columns=('BurnBndAc',)):
+        """
+        Local equivalent of mtbs_utils.get_mtbs_time_series_by_Ig_date.
+
+        Parameters:
+        - bbox (list): Bounding box as [min_lon, min_lat, max_lon, max_lat].
+        - start_date, end_date (str): Dates in 'YYYY-MM-DD' format (inclusive).
+        - columns (tuple): Attribute columns returned next to 'Date' (default: ('BurnBndAc',)).
+
+        Returns:
+        - pd.DataFrame: DataFrame containing the date and burned area size, sorted by 'Date' (empty, with
+          the same columns, when nothing matches).
+        """
+        matches = self._matching_rows(bbox, start_date, end_date)
+        # Without matches, the empty frame keeps the columns and dtypes of a match
+        frames = [self.partitions[p].iloc[rows] for p, rows in matches.items()] or [self.empty]
+
+        df = pd.concat([frame[[self.date_column, *columns]] for frame in frames], ignore_index=True)
+        df = df.rename(columns={self.date_column: 'Date'})
+        df['Date'] = pd.to_datetime(df['Date']).dt.normalize()
+        df = pd.DataFrame(df[['Date', *columns]]).sort_values('Date')
+
+        return df
+#-------------------------------------------------------------------------------------------------------------------
+def _attribute_table(df, date_column='Ig_Date'):
+    """
+    Return the MTBS attribute columns of df in the form Earth Engine returns them.
+
+    The geometry is dropped, categoricals become plain values, float32 columns (from
+    optimize_mtbs_dtypes) become float64 and the ignition date becomes Unix milliseconds, as
+    in the properties of USFS/GTAC/MTBS/burned_area_boundaries/v1.
+    """
+    df = pd.DataFrame(df.drop(columns=[c for c in ('geometry',) if c in df.columns]))
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(df[column].cat.categories.dtype)
+        elif df[column].dtype == np.float32:
+            # Widen through the shortest decimal repr so 39.957 stays 39.957 rather than 39.957000732
+            df[column] = df[column].astype(str).astype('float64')
+    if date_column in df.columns and not pd.api.types.is_integer_dtype(df[date_column]):
+        dates = pd.to_datetime(df[date_column])
+        df[date_column] = dates.astype('datetime64[ms]').astype('int64').where(dates.notna())
+    return df.reset_index(drop=True)
+#-------------------------------------------------------------------------------------------------------------------
+class MTBSAttributeStore:
+    """
+    Local store of the MTBS burned area boundary attributes, keyed by Event_ID and indexed by Incid_Name.
+
+    The attributes (every column except the geometry, with Ig_Date in Unix milliseconds like
+    Earth Engine) are kept in a Parquet file and loaded into memory with hash indexes on
+    Event_ID and on the upper-cased Incid_Name, so a lookup is a dictionary access instead of
+    an Earth Engine round trip. The store is built once from get_mtbs_shp data
+    (from_mtbs) or from an Earth Engine export (from_earth_engine).
+
+    Parameters:
+    - attributes (pd.DataFrame): One row per event with an 'Event_ID' and an 'Incid_Name' column.
+
+    Example:
+        store = MTBSAttributeStore.from_mtbs(mtbs_shp_ddf, path='mtbs_attributes.parquet')
+        store = MTBSAttributeStore.load('mtbs_attributes.parquet')  # later sessions
+        df = store.get_properties('CA3983912034520210702')
+        df = store.lookup_many(event_ids)
+    """
+    def __init__(self, attributes):
+        self.attributes = attributes.reset_index(drop=True)
+        self._records = self.attributes.to_dict('records')
+        self._by_id = {}
+        self._by_name = {}
+        for i, (event_id, name) in enumerate(zip(self.attributes['Event_ID'], self.attributes['Incid_Name'])):
+            self._by_id.setdefault(event_id, i)
+            if isinstance(name, str):
+                self._by_name.setdefault(name, []).append(i)
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, event_id):
+        return event_id in self._by_id
+
+    def __repr__(self):
+        return f"MTBSAttributeStore(events={len(self)}, names={len(self._by_name)})"
+
+    @classmethod
+    def from_mtbs(cls, mtbs_ddf, path=MTBS_ATTRIBUTE_STORE_PATH):
+        """
+        Build the store from the perimeters of get_mtbs_shp (Dask or in-memory) and save it to path.
+
+        Parameters:
+        - mtbs_ddf (dask_geopandas.GeoDataFrame or geopandas.GeoDataFrame): MTBS perimeters.
+        - path (str): Parquet file to write, or None to keep the store in memory only
+          (default: MTBS_ATTRIBUTE_STORE_PATH).
+
+        Returns:
+        - MTBSAttributeStore: The store.
+        """
+        columns = [c for c in mtbs_ddf.columns if c != 'geometry']
+        df = mtbs_ddf[columns]
+        if hasattr(df, 'compute'):
+            df = df.compute()
+        store = cls(_attribute_table(df))
+        if path is not None:
+            store.save(path)
+        return store
+
+    @classmethod
+    def from_earth_engine(cls, path=MTBS_ATTRIBUTE_STORE_PATH, page_size=5000):
+        """
+        Build the store with a one-time export of USFS/GTAC/MTBS/burned_area_boundaries/v1 and save it to path.
+
+        The geometries are dropped on the server and the properties are fetched in pages of
+        page_size features, so the whole dataset takes a handful of getInfo calls. Earth
+        Engine must be initialized (see mtbs_utils.initialize_gee).
+
+        Parameters:
+        - path (str): Parquet file to write, or None to keep the store in memory only
+          (default: MTBS_ATTRIBUTE_STORE_PATH).
+        - page_size (int): Features per getInfo call, at most 5000 (default: 5000).
+
+        Returns:
+        - MTBSAttributeStore: The store.
+        """
+        import ee
+
+        dataset = ee.FeatureCollection('USFS/GTAC/MTBS/burned_area_boundaries/v1')
+        properties = dataset.map(lambda feature: ee.Feature(None, feature.toDictionary()))
+        total = dataset.size().getInfo()
+
+        rows = []
+        for offset in range(0, total, page_size):
+            page = properties.toList(page_size, offset).getInfo()
+            rows.extend(feature['properties'] for feature in page)
+            print(f"Exported {len(rows)}/{total} MTBS events...")
+
+        store = cls(_attribute_table(pd.DataFrame(rows)))
+        if path is not None:
+            store.save(path)
+        return store
+
+    @classmethod
+    def load(cls, path=MTBS_ATTRIBUTE_STORE_PATH):
+        """
+        Load a store saved with save(), from_mtbs() or from_earth_engine().
+        """
+        return cls(pd.read_parquet(path))
+
+    def save(self, path=MTBS_ATTRIBUTE_STORE_PATH):
+        """
+        Write the attributes to a Parquet file (through a temporary file and a rename).
+        """
+        import os
+
+        tmp_path = f"{path}.tmp"
+        self.attributes.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        return path
+
+    def lookup(self, event_id):
+        """
+        Return the attributes of one event as a dict, or None if the Event_ID is unknown.
+        """
+        i = self._by_id.get(event_id)
+        return None if i is None else self._records[i]
+
+    def lookup_many(self, event_ids):
+        """
+        Return the attributes of many events, one row per known Event_ID in the order given.
+
+        Parameters:
+        - event_ids (list): Event IDs to look up; unknown IDs are reported and skipped.
+
+        Returns:
+        - pd.DataFrame: The matching attribute rows.
+        """
+        positions = [self._by_id.get(event_id) for event_id in event_ids]
+        missing = [event_id for event_id, i in zip(event_ids, positions) if i is None]
+        if missing:
+            print(f"No feature found for {len(missing)} Event_IDs: {missing[:5]}{'...' if len(missing) > 5 else ''}")
+        return self.attributes.iloc[[i for i in positions if i is not None]].reset_index(drop=True)
+
+    def lookup_by_name(self, event_name):
+        """
+        Return the attributes of every event with an Incid_Name as a list of dicts.
+
+        Names match exactly, like the ee.Filter.eq of mtbs_utils.get_mtbs_properties_by_name
+        (MTBS names are upper case, e.g. 'DIXIE').
+        """
+        return [self._records[i] for i in self._by_name.get(event_name, [])]
+
+    def get_properties(self, event_id):
+        """
+        Local equivalent of mtbs_utils.get_mtbs_properties.
+
+        Parameters:
+        - event_id (str): The Event ID to look up.
+
+        Returns:
+        - pd.DataFrame: A one-row DataFrame containing the event's properties, or None if not found.
+        """
+        record = self.lookup(event_id)
+        if record is None:
+            print(f"No feature found with Event_ID: {event_id}")
+            return None
+        return pd.DataFrame([record])
+
+    def get_properties_by_name(self, event_name):
+        """
+        Local equivalent of mtbs_utils.get_mtbs_properties_by_name (the first event with that name).
+
+        Parameters:
+        - event_name (str): The Incid_Name to look up.
+
+        Returns:
+        - pd.DataFrame: A one-row DataFrame containing the event's properties, or None if not found.
+        """
+        records = self.lookup_by_name(event_name)
+        if not records:
+            print(f"No feature found with Incid_Name: {event_name}")
+            return None
+        return pd.DataFrame(records[:1])
+#-------------------------------------------------------------------------------------------------------------------
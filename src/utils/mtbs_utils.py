@@ -1,9 +1,27 @@
 import ee
-import geemap
+import json
+import sqlite3
+import threading
+import time
 import pandas as pd
-from datetime import datetime
-import matplotlib.pyplot as plt
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 import calendar
+
+# Earth Engine asset of the MTBS burned area boundaries
+MTBS_BOUNDARIES_ASSET = 'USFS/GTAC/MTBS/burned_area_boundaries/v1'
+
+# Default location of the on-disk tier of the MTBSEventResolver
+EVENT_CACHE_PATH = 'mtbs_event_cache.sqlite'
+
+_EVENT_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mtbs_events (
+    event_id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
 #-------------------------------------------------------------------------------------------------------------------
 def initialize_gee():
     """
@@ -40,27 +58,29 @@ def get_month_start_end(event_date):
     
     return start_date, end_date
 #-------------------------------------------------------------------------------------------------------------------
-from datetime import datetime, timedelta
-
-def get_event_start_end(event_date):
+def get_event_start_end(event_date, days_before=10, days_after=10):
     """
     Given an event date, return the start date as 10 days before the event date 
     and the end date as 10 days after the event date.
 
     Parameters:
-    - event_date (str): Date string in 'YYYY-MM-DD HH:MM:SS' format.
+    - event_date (str or datetime): Date string in 'YYYY-MM-DD HH:MM:SS' format, or a datetime.
+    - days_before, days_after (int): Days before and after the event date (default: 10).
 
     Returns:
     - tuple: (start_date, end_date) in 'YYYY-MM-DD' format.
     """
     # Convert event_date to a datetime object
-    event_date_dt = datetime.strptime(event_date, '%Y-%m-%d %H:%M:%S')
+    if isinstance(event_date, datetime):
+        event_date_dt = event_date
+    else:
+        event_date_dt = datetime.strptime(event_date, '%Y-%m-%d %H:%M:%S')
     
-    # Calculate the start date as 10 days before the event date
-    start_date = (event_date_dt - timedelta(days=10)).strftime('%Y-%m-%d')
+    # Calculate the start date as days_before days before the event date
+    start_date = (event_date_dt - timedelta(days=days_before)).strftime('%Y-%m-%d')
     
-    # Calculate the end date as 10 days after the event date
-    end_date = (event_date_dt + timedelta(days=10)).strftime('%Y-%m-%d')
+    # Calculate the end date as days_after days after the event date
+    end_date = (event_date_dt + timedelta(days=days_after)).strftime('%Y-%m-%d')
     
     return start_date, end_date
 #-------------------------------------------------------------------------------------------------------------------
@@ -100,7 +120,7 @@ def unix_to_date(unix_timestamp):
     Returns:
     - str: Date string in 'YYYY-MM-DD HH:MM:SS' format.
     """
-    return datetime.utcfromtimestamp(unix_timestamp / 1000).strftime('%Y-%m-%d %H:%M:%S')
+    return datetime.fromtimestamp(unix_timestamp / 1000, tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
 #-------------------------------------------------------------------------------------------------------------------
 def display_mtbs_burn_severity(start_date, end_date, bbox):
     """
@@ -111,6 +131,7 @@ def display_mtbs_burn_severity(start_date, end_date, bbox):
     - end_date (str): The end date in 'YYYY-MM-DD' format.
     - bbox (list): Bounding box as [min_lon, min_lat, max_lon, max_lat].
     """
+    import geemap
 
     # Load the MTBS burn severity dataset
     mtbs = ee.ImageCollection("USFS/GTAC/MTBS/annual_burn_severity_mosaics/v1")
@@ -168,6 +189,8 @@ def display_mtbs_boundaries(bbox, start_date,end_date):
     - start_date (str): The start date in 'YYYY-MM-DD' format (default is '2016-01-01').
     - end_date (str): The end date in 'YYYY-MM-DD' format (default is '2021-12-31').
     """
+    import geemap
+
     # Convert start_date and end_date to Unix timestamps in milliseconds
     start_Ig_date = date_to_unix(start_date)
     end_Ig_date = date_to_unix(end_date)
@@ -208,30 +231,288 @@ def display_mtbs_boundaries(bbox, start_date,end_date):
     # Display the map
     return map_
 #-------------------------------------------------------------------------------------------------------------------
+@lru_cache(maxsize=None)
+def mtbs_boundaries():
+    """
+    Return the shared MTBS burned area boundaries FeatureCollection (built on first use, after ee.Initialize).
+    """
+    return ee.FeatureCollection(MTBS_BOUNDARIES_ASSET)
+#-------------------------------------------------------------------------------------------------------------------
+def _geojson_bounds(geometry):
+    """
+    Return (min_lon, min_lat, max_lon, max_lat) of a GeoJSON geometry dict.
+    """
+    import numpy as np
+
+    def flatten(coordinates):
+        if coordinates and isinstance(coordinates[0], (int, float)):
+            yield coordinates[:2]
+        else:
+            for item in coordinates:
+                yield from flatten(item)
+
+    if geometry['type'] == 'GeometryCollection':
+        points = [p for g in geometry['geometries'] for p in flatten(g['coordinates'])]
+    else:
+        points = list(flatten(geometry['coordinates']))
+    points = np.asarray(points, dtype=float)
+    return tuple(float(v) for v in (*points.min(axis=0), *points.max(axis=0)))
+#-------------------------------------------------------------------------------------------------------------------
+def event_date_window(ig_date_ms, days_before=10, days_after=10):
+    """
+    Return the ('YYYY-MM-DD', 'YYYY-MM-DD') window around an Ig_Date given in Unix milliseconds.
+
+    The Ig_Date is read as UTC and the window is computed by get_event_start_end.
+
+    Parameters:
+    - ig_date_ms (int): Ignition date as a Unix timestamp in milliseconds.
+    - days_before, days_after (int): Days before and after the ignition date (default: 10).
+
+    Returns:
+    - tuple: (start_date, end_date) strings.
+    """
+    ig_date_dt = datetime.fromtimestamp(ig_date_ms / 1000, tz=timezone.utc)
+    return get_event_start_end(ig_date_dt, days_before, days_after)
+#-------------------------------------------------------------------------------------------------------------------
+def _copy_entry(entry):
+    """
+    Copy a cached resolver entry so callers and concurrent resolves never share its 'extras' dict.
+    """
+    if not entry['found']:
+        return dict(entry)
+    return {**entry, 'extras': dict(entry['extras'])}
+#-------------------------------------------------------------------------------------------------------------------
+class MTBSEventResolver:
+    """
+    Memoized lookup of the geometry, Ig_Date and properties of MTBS events in Earth Engine.
+
+    An unknown event costs one getInfo of the first matching feature (geometry and all
+    properties together). Results are kept in an LRU of maxsize events and in a SQLite file,
+    so later calls, also in new sessions, cost no round trip. Callers can ask for extra
+    server-side values computed from the feature (e.g. an image count); missing extras are
+    fetched in the same getInfo as the event and cached with it. Events that do not exist are
+    remembered in memory only. The resolver can be shared between threads; the LRU and the
+    SQLite connection are guarded by one lock, which is not held during the getInfo.
+
+    Parameters:
+    - maxsize (int): Events kept in memory (default: 256).
+    - cache_path (str): SQLite file of the on-disk tier, or None for memory only
+      (default: 'mtbs_event_cache.sqlite').
+
+    Example:
+        resolver = get_event_resolver()
+        event = resolver.resolve('CA3983912034520210702')
+        event['ig_date_ms'], event['bounds'], event['properties']['BurnBndAc']
+    """
+    def __init__(self, maxsize=256, cache_path=EVENT_CACHE_PATH):
+        self.maxsize = maxsize
+        self.cache_path = cache_path
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.round_trips = 0
+        self._memory = OrderedDict()
+        self._conn = None
+        self._lock = threading.RLock()
+
+    def __repr__(self):
+        return (f"MTBSEventResolver(cached={len(self._memory)}/{self.maxsize}, hits={self.hits}, "
+                f"disk_hits={self.disk_hits}, misses={self.misses}, round_trips={self.round_trips})")
+
+    def _disk(self):
+        """
+        Open the SQLite tier on first use.
+        """
+        if self._conn is None and self.cache_path is not None:
+            # check_same_thread=False: the connection is shared between threads under self._lock
+            self._conn = sqlite3.connect(self.cache_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_EVENT_CACHE_SCHEMA)
+        return self._conn
+
+    def _remember(self, event_id, entry):
+        """
+        Put an entry in the LRU (and, for existing events, in the SQLite tier).
+
+        Extras already cached for the event (e.g. by a concurrent resolve) are kept.
+        """
+        with self._lock:
+            cached = self._memory.get(event_id)
+            if cached is not None and cached['found'] and entry['found']:
+                entry = {**entry, 'extras': {**cached['extras'], **entry['extras']}}
+            self._memory[event_id] = entry
+            self._memory.move_to_end(event_id)
+            while len(self._memory) > self.maxsize:
+                self._memory.popitem(last=False)
+            if entry['found'] and self._disk() is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO mtbs_events (event_id, payload, fetched_at) VALUES (?, ?, ?)",
+                    (event_id, json.dumps(entry), time.time())
+                )
+                self._conn.commit()
+
+    def _cached(self, event_id):
+        """
+        Return a copy of the cached entry of an event from memory or disk, or None.
+        """
+        with self._lock:
+            if event_id in self._memory:
+                self._memory.move_to_end(event_id)
+                return _copy_entry(self._memory[event_id])
+            if self._disk() is not None:
+                row = self._conn.execute("SELECT payload FROM mtbs_events WHERE event_id = ?", (event_id,)).fetchone()
+                if row is not None:
+                    self.disk_hits += 1
+                    entry = json.loads(row[0])
+                    entry['bounds'] = tuple(entry['bounds'])  # JSON stores the tuple as a list
+                    self._memory[event_id] = entry
+                    while len(self._memory) > self.maxsize:
+                        self._memory.popitem(last=False)
+                    return _copy_entry(entry)
+        return None
+
+    def collection(self, event_id):
+        """
+        Return the MTBS collection filtered to an event (lazy, no round trip).
+        """
+        return mtbs_boundaries().filter(ee.Filter.eq('Event_ID', event_id))
+
+    def resolve(self, event_id, extras=None):
+        """
+        Return the geometry, Ig_Date and properties of an event, fetching them with at most one getInfo.
+
+        Parameters:
+        - event_id (str): The Event ID to resolve.
+        - extras (dict): Optional {name: function(ee.Feature) -> ee.ComputedObject} of server-side
+          values to compute from the event's feature. The name must identify the computation and
+          its parameters, as results are cached under it (default: None).
+
+        Returns:
+        - dict: 'event_id', 'properties', 'geometry' (GeoJSON), 'ig_date_ms', 'bounds'
+          (min_lon, min_lat, max_lon, max_lat) and 'extras', or None if no feature has this Event ID.
+        """
+        extras = extras or {}
+        entry = self._cached(event_id)
+        if entry is not None and not entry['found']:
+            with self._lock:
+                self.hits += 1
+            return None
+        missing = [name for name in extras if entry is None or name not in entry['extras']]
+        if entry is not None and not missing:
+            with self._lock:
+                self.hits += 1
+            return entry
+
+        with self._lock:
+            self.misses += 1
+        matches = self.collection(event_id)
+        request = {}
+        if entry is None:
+            request['features'] = matches.limit(1)
+        if missing:
+            feature = ee.Feature(matches.first())
+            request['extras'] = ee.Algorithms.If(
+                matches.size().gt(0), ee.Dictionary({name: extras[name](feature) for name in missing}), None
+            )
+        info = ee.Dictionary(request).getInfo()
+        with self._lock:
+            self.round_trips += 1
+
+        if entry is None:
+            features = info['features']['features']
+            if not features:
+                self._remember(event_id, {'event_id': event_id, 'found': False})
+                return None
+            feature_info = features[0]
+            entry = {
+                'event_id': event_id,
+                'found': True,
+                'properties': feature_info['properties'],
+                'geometry': feature_info['geometry'],
+                'ig_date_ms': feature_info['properties'].get('Ig_Date'),
+                'bounds': _geojson_bounds(feature_info['geometry']),
+                'extras': {},
+            }
+        entry['extras'].update(info.get('extras') or {})
+        self._remember(event_id, entry)
+        return _copy_entry(entry)
+
+    def center(self, event_id):
+        """
+        Return the (latitude, longitude) of the center of an event's bounding box, or None.
+        """
+        event = self.resolve(event_id)
+        if event is None:
+            return None
+        min_lon, min_lat, max_lon, max_lat = event['bounds']
+        return (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
+
+    def clear(self, disk=False):
+        """
+        Empty the in-memory LRU and, with disk=True, the SQLite tier.
+        """
+        with self._lock:
+            self._memory.clear()
+            if disk and self._disk() is not None:
+                self._conn.execute("DELETE FROM mtbs_events")
+                self._conn.commit()
+
+    def cache_info(self):
+        """
+        Return the counters: 'hits', 'disk_hits', 'misses', 'round_trips', 'entries' and 'maxsize'.
+        """
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'round_trips': self.round_trips,
+            'entries': len(self._memory),
+            'maxsize': self.maxsize,
+        }
+#-------------------------------------------------------------------------------------------------------------------
+@lru_cache(maxsize=None)
+def get_event_resolver(maxsize=256, cache_path=EVENT_CACHE_PATH):
+    """
+    Return the MTBSEventResolver shared by mtbs_utils and evi_utlis (one per maxsize and cache_path).
+    """
+    return MTBSEventResolver(maxsize=maxsize, cache_path=cache_path)
+#-------------------------------------------------------------------------------------------------------------------
+def center_map_on_event(map_, event, zoom=10):
+    """
+    Center a geemap map on a resolved event's bounding box without an Earth Engine round trip.
+
+    Parameters:
+    - map_ (geemap.Map): The map to center.
+    - event (dict): An event returned by MTBSEventResolver.resolve.
+    - zoom (int): Zoom level (default: 10).
+    """
+    min_lon, min_lat, max_lon, max_lat = event['bounds']
+    map_.setCenter((min_lon + max_lon) / 2, (min_lat + max_lat) / 2, zoom)
+#-------------------------------------------------------------------------------------------------------------------
 def display_mtbs_by_event_id(event_id):
     """
     Display the MTBS burned area boundary for a specific Event ID.
 
+    The event is looked up with the shared MTBSEventResolver, so repeated calls need no
+    round trip before the map is built.
+
     Parameters:
     - event_id (str): The Event ID to filter the dataset by.
     """
-
-    # Load the MTBS burned area boundaries dataset
-    dataset = ee.FeatureCollection('USFS/GTAC/MTBS/burned_area_boundaries/v1')
+    import geemap
 
     # Define the field and value to filter by
     field_name = 'Event_ID'  # Field name to filter by
 
-    # Filter the dataset by the specified Event ID
-    filtered_feature = dataset.filter(ee.Filter.eq(field_name, event_id))
-
-    # Check if the filtered dataset is empty
-    count = filtered_feature.size().getInfo()
-    if count == 0:
+    # Resolve the event (cached after the first call)
+    resolver = get_event_resolver()
+    event = resolver.resolve(event_id)
+    if event is None:
         print(f"No feature found with {field_name}: {event_id}")
         return None
     else:
         print(f"Displaying feature with {field_name}: {event_id}")
+    filtered_feature = resolver.collection(event_id)
 
     # Visualization parameters
     vis_params = {
@@ -246,24 +527,29 @@ def display_mtbs_by_event_id(event_id):
     # Add the filtered feature to the map
     map_.addLayer(filtered_feature, vis_params, f"{field_name}: {event_id}")
 
-    # Zoom to the feature if it exists
-    map_.centerObject(filtered_feature, zoom=10)
+    # Zoom to the feature from its cached bounds
+    center_map_on_event(map_, event, zoom=10)
 
     # Display the map
     return map_
 #-------------------------------------------------------------------------------------------------------------------
-def get_mtbs_properties(event_id):
+def get_mtbs_properties(event_id, store=None):
     """
     Retrieve the properties of an MTBS burned area boundary feature based on Event ID.
 
     Parameters:
     - event_id (str): The Event ID to filter the dataset by.
+    - store (MTBSAttributeStore): Local attribute store from mtbs_local_utils; when given, the
+      properties are read from it instead of Earth Engine (default: None).
 
     Returns:
     - pd.DataFrame: A DataFrame containing the feature's properties.
     """
+    if store is not None:
+        return store.get_properties(event_id)
+
     # Load the MTBS burned area boundaries dataset
-    dataset = ee.FeatureCollection('USFS/GTAC/MTBS/burned_area_boundaries/v1')
+    dataset = mtbs_boundaries()
 
     # Filter the dataset by the specified Event ID
     filtered_feature = dataset.filter(ee.Filter.eq('Event_ID', event_id)).first()
@@ -281,18 +567,23 @@ def get_mtbs_properties(event_id):
 
         return df
 #-------------------------------------------------------------------------------------------------------------------
-def get_mtbs_properties_by_name(event_name):
+def get_mtbs_properties_by_name(event_name, store=None):
     """
     Retrieve the properties of an MTBS burned area boundary feature based on Event ID.
 
     Parameters:
     - event_name (str): The Event ID to filter the dataset by.
+    - store (MTBSAttributeStore): Local attribute store from mtbs_local_utils; when given, the
+      properties are read from it instead of Earth Engine (default: None).
 
     Returns:
     - pd.DataFrame: A DataFrame containing the feature's properties.
     """
+    if store is not None:
+        return store.get_properties_by_name(event_name)
+
     # Load the MTBS burned area boundaries dataset
-    dataset = ee.FeatureCollection('USFS/GTAC/MTBS/burned_area_boundaries/v1')
+    dataset = mtbs_boundaries()
 
     # Filter the dataset by the specified Event ID
     filtered_feature = dataset.filter(ee.Filter.eq('Incid_Name', event_name)).first()
@@ -376,6 +667,8 @@ def get_season(month):
 #-------------------------------------------------------------------------------------------------------------------
 # Function to plot BurnBndAc by seasonality
 def plot_burned_area_by_season(df):
+    import matplotlib.pyplot as plt
+
     if df.empty:
         print("No data available to plot.")
         return
@@ -401,6 +694,8 @@ def plot_burned_area_by_season(df):
 #-------------------------------------------------------------------------------------------------------------------
 # Function to plot BurnBndAc by seasonality with side-by-side bars
 def plot_burned_area_by_season_side(df):
+    import matplotlib.pyplot as plt
+
     if df.empty:
         print("No data available to plot.")
         return
@@ -427,6 +722,8 @@ def plot_burned_area_by_season_side(df):
 #-------------------------------------------------------------------------------------------------------------------
 # Function to plot BurnBndHa_1000 by seasonality with side-by-side bars
 def plot_burned_area_by_season_hectars(df):
+    import matplotlib.pyplot as plt
+
     if df.empty:
         print("No data available to plot.")
         return
@@ -463,9 +760,10 @@ def display_mtbs_by_event_start_date(event_name,start_date):
     - event_name (str): The Event ID to filter the dataset by.
     - start_date (str): The Event Date to filter the dataset by (format: 'YYYY-MM-DD').
     """
+    import geemap
 
     # Load the MTBS burned area boundaries dataset
-    dataset = ee.FeatureCollection('USFS/GTAC/MTBS/burned_area_boundaries/v1')
+    dataset = mtbs_boundaries()
     start_Ig_date = datetime_to_unix(start_date)
     # Define the field names for filtering
     field_event_name = 'Incid_Name'      # Field name for Event ID
@@ -1,17 +1,180 @@
-import openmeteo_requests
-import requests_cache
+import asyncio
+import time
+from functools import lru_cache
+import numpy as np
 import pandas as pd
-from retry_requests import retry
 
-# Setup the Open-Meteo API client with cache and retry on error
-cache_session = requests_cache.CachedSession('.cache', expire_after=3600)
-retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
-openmeteo = openmeteo_requests.Client(session=retry_session)
+# Open-Meteo API endpoint
+OPENMETEO_URL = "https://historical-forecast-api.open-meteo.com/v1/forecast"
 
-def fetch_weather_data(latitude, longitude, start_date, end_date, daily_variables, timezone="GMT"):
-    # Open-Meteo API endpoint
-    url = "https://historical-forecast-api.open-meteo.com/v1/forecast"
+# HTTP status codes worth retrying (rate limited or transient server errors)
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Response block accessor for each supported time resolution
+RESOLUTION_BLOCKS = {"daily": "Daily", "hourly": "Hourly", "minutely_15": "Minutely15"}
+
+#-------------------------------------------------------------------------------------------------------------------
+@lru_cache(maxsize=None)
+def _get_sessions():
+    """
+    Build the cached and retrying HTTP sessions on first use.
+
+    Returns:
+    - tuple: (requests_cache.CachedSession, retrying session)
+    """
+    import requests_cache
+    from retry_requests import retry
+
+    cache_session = requests_cache.CachedSession('.cache', expire_after=3600)
+    retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
+    return cache_session, retry_session
+#-------------------------------------------------------------------------------------------------------------------
+@lru_cache(maxsize=None)
+def _get_openmeteo_client():
+    """
+    Setup the Open-Meteo API client with cache and retry on error on first use.
+
+    The sessions and client are created lazily so importing this module (for example when
+    a Dask worker unpickles one of its functions) does not open a cache or a session.
+
+    Returns:
+    - openmeteo_requests.Client: Shared Open-Meteo client.
+    """
+    import openmeteo_requests
+
+    return openmeteo_requests.Client(session=_get_sessions()[1])
+#-------------------------------------------------------------------------------------------------------------------
+def __getattr__(name):
+    # Keep the former module-level cache_session, retry_session and openmeteo attributes available
+    if name == "cache_session":
+        return _get_sessions()[0]
+    if name == "retry_session":
+        return _get_sessions()[1]
+    if name == "openmeteo":
+        return _get_openmeteo_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+#-------------------------------------------------------------------------------------------------------------------
+def _block_time_index(block):
+    """
+    Build the UTC timestamps of a daily, hourly or 15-minutely response block.
+
+    Parameters:
+    - block (VariablesWithTime): Block returned by response.Daily(), Hourly() or Minutely15().
+
+    Returns:
+    - pd.DatetimeIndex: One timestamp per value in the block.
+    """
+    return pd.date_range(
+        start=pd.to_datetime(block.Time(), unit="s", utc=True),
+        end=pd.to_datetime(block.TimeEnd(), unit="s", utc=True),
+        freq=pd.Timedelta(seconds=block.Interval()),
+        inclusive="left"
+    )
+#-------------------------------------------------------------------------------------------------------------------
+def _daily_response_to_dataframe(response, daily_variables):
+    """
+    Convert the daily block of a single Open-Meteo response into a DataFrame.
+
+    Parameters:
+    - response (WeatherApiResponse): One location of an Open-Meteo response.
+    - daily_variables (list): Daily variables in the order they were requested.
+
+    Returns:
+    - pd.DataFrame: DataFrame with a 'date' column and one column per variable.
+    """
+    # Process daily data
+    daily = response.Daily()
+    daily_data = {"date": _block_time_index(daily)}
+
+    # Assign each variable to the daily data dictionary
+    for i, var in enumerate(daily_variables):
+        daily_data[var] = daily.Variables(i).ValuesAsNumpy()
+
+    # Create DataFrame
+    return pd.DataFrame(data=daily_data)
+#-------------------------------------------------------------------------------------------------------------------
+def assemble_responses(responses, variables, location_ids=None, resolution="daily", as_arrow=False):
+    """
+    Assemble one block of many Open-Meteo responses into one columnar table.
+
+    One contiguous buffer is preallocated per variable for all locations and each response's
+    values are written straight into its slice, so there is no per-response DataFrame and
+    no pd.concat. The returned pandas frame or Arrow table wraps those buffers without copying.
+
+    Parameters:
+    - responses (list): WeatherApiResponse objects, one per location.
+    - variables (list): Variables in the order they were requested.
+    - location_ids (list): Identifier of each response (default: positional index).
+    - resolution (str): Block to read: 'daily', 'hourly' or 'minutely_15' (default: 'daily').
+    - as_arrow (bool): Return a pyarrow.Table instead of a pandas DataFrame (default: False).
 
+    Returns:
+    - pd.DataFrame or pyarrow.Table: Columns 'location_id' (categorical/dictionary), 'date' (UTC)
+      and one float32 column per variable.
+    """
+    if resolution not in RESOLUTION_BLOCKS:
+        raise ValueError(f"resolution must be one of {list(RESOLUTION_BLOCKS)}, not {resolution!r}.")
+
+    responses = list(responses)
+    if location_ids is None:
+        location_ids = range(len(responses))
+    location_ids = list(location_ids)
+    if len(location_ids) != len(responses):
+        raise ValueError("location_ids must have one entry per response.")
+
+    # First pass: size every block so the output buffers can be allocated once
+    block_method = RESOLUTION_BLOCKS[resolution]
+    blocks = [getattr(response, block_method)() for response in responses]
+    lengths = np.fromiter(
+        ((block.TimeEnd() - block.Time()) // block.Interval() for block in blocks),
+        dtype=np.int64, count=len(blocks)
+    )
+    offsets = np.zeros(len(blocks) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    total = int(offsets[-1])
+
+    codes = np.repeat(np.arange(len(blocks), dtype=np.int32), lengths)
+    dates = np.empty(total, dtype=np.int64)
+    values = {var: np.empty(total, dtype=np.float32) for var in variables}
+
+    # Second pass: write each block into its slice of the shared buffers. Locations of one
+    # request share a time axis, so each distinct axis is only built once
+    time_axes = {}
+    for k, block in enumerate(blocks):
+        start, stop = offsets[k], offsets[k + 1]
+        axis_key = (block.Time(), block.TimeEnd(), block.Interval())
+        if axis_key not in time_axes:
+            time_axes[axis_key] = _block_time_index(block).asi8
+        dates[start:stop] = time_axes[axis_key]
+        for i, var in enumerate(variables):
+            values[var][start:stop] = block.Variables(i).ValuesAsNumpy()
+
+    if as_arrow:
+        import pyarrow as pa
+
+        columns = {
+            "location_id": pa.DictionaryArray.from_arrays(pa.array(codes), pa.array(location_ids)),
+            "date": pa.array(dates, type=pa.timestamp("ns", tz="UTC")),
+        }
+        columns.update({var: pa.array(buffer) for var, buffer in values.items()})
+        return pa.table(columns)
+
+    columns = {
+        "location_id": pd.Categorical.from_codes(codes, categories=pd.Index(location_ids)),
+        "date": pd.DatetimeIndex(dates.view("datetime64[ns]"), copy=False).tz_localize("UTC"),
+    }
+    columns.update(values)
+    return pd.DataFrame(columns, copy=False)
+#-------------------------------------------------------------------------------------------------------------------
+def assemble_daily_responses(responses, daily_variables, location_ids=None, as_arrow=False):
+    """
+    Assemble the daily blocks of many Open-Meteo responses into one columnar table.
+
+    Shortcut for assemble_responses(..., resolution='daily').
+    """
+    return assemble_responses(responses, daily_variables, location_ids, resolution="daily", as_arrow=as_arrow)
+#-------------------------------------------------------------------------------------------------------------------
+def fetch_weather_data(latitude, longitude, start_date, end_date, daily_variables, timezone="GMT"):
     # API parameters
     params = {
         "latitude": latitude,
@@ -23,7 +186,7 @@ def fetch_weather_data(latitude, longitude, start_date, end_date, daily_variable
     }
 
     # Fetch the weather data
-    responses = openmeteo.weather_api(url, params=params)
+    responses = _get_openmeteo_client().weather_api(OPENMETEO_URL, params=params)
     response = responses[0]
 
     # # Print metadata
@@ -32,21 +195,357 @@ def fetch_weather_data(latitude, longitude, start_date, end_date, daily_variable
     # print(f"Timezone {response.Timezone()} {response.TimezoneAbbreviation()}")
     # print(f"Timezone difference to GMT+0 {response.UtcOffsetSeconds()} s")
 
-    # Process daily data
-    daily = response.Daily()
-    daily_data = {
-        "date": pd.date_range(
-            start=pd.to_datetime(daily.Time(), unit="s", utc=True),
-            end=pd.to_datetime(daily.TimeEnd(), unit="s", utc=True),
-            freq=pd.Timedelta(seconds=daily.Interval()),
-            inclusive="left"
+    daily_dataframe = _daily_response_to_dataframe(response, daily_variables)
+    return daily_dataframe
+#-------------------------------------------------------------------------------------------------------------------
+def _build_location_table(latitudes, longitudes, start_dates, end_dates, location_ids=None):
+    """
+    Normalize per-location request arrays into a single DataFrame.
+
+    Parameters:
+    - latitudes, longitudes (array-like): Coordinates of each location.
+    - start_dates, end_dates (array-like or scalar): Date window of each location in 'YYYY-MM-DD' format.
+      A single date (string, datetime, date or Timestamp) is broadcast to every location.
+    - location_ids (array-like): Optional identifier for each location (default: 0..n-1).
+
+    Returns:
+    - pd.DataFrame: Columns 'location_id', 'latitude', 'longitude', 'start_date', 'end_date'.
+    """
+    locations = pd.DataFrame({
+        "latitude": pd.Series(latitudes, dtype="float64").to_numpy(),
+        "longitude": pd.Series(longitudes, dtype="float64").to_numpy(),
+    })
+    if len(locations) == 0:
+        raise ValueError("At least one location is required.")
+
+    # Dates may be given as strings, dates, datetimes or Timestamps; the API expects 'YYYY-MM-DD'
+    for column, values in (("start_date", start_dates), ("end_date", end_dates)):
+        if not pd.api.types.is_list_like(values):
+            values = [values] * len(locations)
+        locations[column] = pd.to_datetime(pd.Series(list(values))).dt.strftime('%Y-%m-%d').to_numpy()
+
+    if location_ids is None:
+        location_ids = range(len(locations))
+    locations.insert(0, "location_id", list(location_ids))
+
+    if locations["location_id"].duplicated().any():
+        raise ValueError("location_ids must be unique.")
+
+    return locations
+#-------------------------------------------------------------------------------------------------------------------
+def _iter_location_chunks(locations, chunk_size):
+    """
+    Group locations that share a date window and split each group into chunks.
+
+    Open-Meteo accepts comma-separated coordinate lists, but one date window per call,
+    so only locations with the same start and end date can share a request.
+
+    Parameters:
+    - locations (pd.DataFrame): Table returned by _build_location_table.
+    - chunk_size (int): Maximum number of locations per request.
+
+    Yields:
+    - tuple: (start_date, end_date, chunk DataFrame)
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be a positive integer.")
+
+    for (start_date, end_date), group in locations.groupby(["start_date", "end_date"], sort=False):
+        for offset in range(0, len(group), chunk_size):
+            yield start_date, end_date, group.iloc[offset:offset + chunk_size]
+#-------------------------------------------------------------------------------------------------------------------
+def fetch_weather_data_batch(latitudes, longitudes, start_dates, end_dates, daily_variables,
+                             timezone="GMT", location_ids=None, chunk_size=100):
+    """
+    Fetch daily weather data for many locations using multi-location Open-Meteo requests.
+
+    Locations with the same date window are sent together, up to chunk_size coordinates per
+    request, instead of one HTTP round trip per location.
+
+    Parameters:
+    - latitudes (array-like): Latitude of each location.
+    - longitudes (array-like): Longitude of each location.
+    - start_dates (array-like or str): Start date of each location in 'YYYY-MM-DD' format.
+    - end_dates (array-like or str): End date of each location in 'YYYY-MM-DD' format.
+    - daily_variables (list): Daily variables to retrieve (e.g. 'temperature_2m_max').
+    - timezone (str): Timezone used to aggregate daily values (default: 'GMT').
+    - location_ids (array-like): Optional unique identifier for each location, e.g. MTBS Event_IDs
+      (default: positional index).
+    - chunk_size (int): Maximum number of locations per request (default: 100).
+
+    Returns:
+    - pd.DataFrame: Long-format DataFrame with a categorical 'location_id', 'date' and one column per variable.
+    """
+    locations = _build_location_table(latitudes, longitudes, start_dates, end_dates, location_ids)
+
+    responses, response_ids = [], []
+    for start_date, end_date, chunk in _iter_location_chunks(locations, chunk_size):
+        # API parameters for every location in the chunk
+        params = {
+            "latitude": chunk["latitude"].tolist(),
+            "longitude": chunk["longitude"].tolist(),
+            "start_date": start_date,
+            "end_date": end_date,
+            "daily": daily_variables,
+            "timezone": timezone
+        }
+
+        # One response is returned per location, in request order
+        responses.extend(_get_openmeteo_client().weather_api(OPENMETEO_URL, params=params))
+        response_ids.extend(chunk["location_id"])
+
+    weather_dataframe = assemble_daily_responses(responses, daily_variables, location_ids=response_ids)
+    return weather_dataframe
+#-------------------------------------------------------------------------------------------------------------------
+class TokenBucket:
+    """
+    Asyncio token bucket that keeps request starts within a per-minute quota.
+
+    Parameters:
+    - rate_per_minute (float): Tokens added per minute (Open-Meteo free tier: 600 calls/minute).
+    - capacity (int): Maximum burst size (default: one second worth of tokens, at least 1).
+    """
+    def __init__(self, rate_per_minute, capacity=None):
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be positive.")
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1, int(self.rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens=1):
+        """
+        Wait until the requested number of tokens is available and consume them.
+
+        Requests larger than the bucket capacity are let through once the bucket is full and
+        leave it in debt, so later callers wait for the quota to recover.
+        """
+        async with self._lock:
+            self._refill()
+            while self.tokens < min(tokens, self.capacity):
+                await asyncio.sleep((min(tokens, self.capacity) - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= tokens
+#-------------------------------------------------------------------------------------------------------------------
+def _parse_flatbuffer_responses(data):
+    """
+    Split a raw Open-Meteo flatbuffers payload into one response per location.
+
+    Each message is prefixed with its length as a little-endian 32-bit integer.
+
+    Parameters:
+    - data (bytes): Body of a request made with format=flatbuffers.
+
+    Returns:
+    - list: WeatherApiResponse objects in request order.
+    """
+    from openmeteo_sdk.WeatherApiResponse import WeatherApiResponse
+
+    responses = []
+    pos = 0
+    while pos < len(data):
+        length = int.from_bytes(data[pos:pos + 4], byteorder="little")
+        responses.append(WeatherApiResponse.GetRootAs(data, pos + 4))
+        pos += length + 4
+    return responses
+#-------------------------------------------------------------------------------------------------------------------
+async def _get_with_retry(session, url, params, cost, bucket, stats, retries, backoff_factor):
+    """
+    GET an Open-Meteo URL, retrying rate-limited, server and connection errors with exponential backoff.
+
+    Returns:
+    - bytes: Response body.
+    """
+    import aiohttp
+
+    for attempt in range(retries + 1):
+        await bucket.acquire(cost)
+        try:
+            async with session.get(url, params=params) as resp:
+                stats["requests"] += 1
+                if resp.status == 200:
+                    return await resp.read()
+                if resp.status not in RETRY_STATUS_CODES:
+                    # Invalid parameters are not worth retrying
+                    resp.raise_for_status()
+                error = aiohttp.ClientResponseError(
+                    resp.request_info, resp.history, status=resp.status, message=resp.reason
+                )
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as exc:
+            error = exc
+
+        if attempt == retries:
+            raise error
+        stats["retries"] += 1
+        await asyncio.sleep(backoff_factor * (2 ** attempt))
+#-------------------------------------------------------------------------------------------------------------------
+async def fetch_weather_data_async(latitudes, longitudes, start_dates, end_dates, daily_variables,
+                                   timezone="GMT", location_ids=None, chunk_size=1, max_in_flight=8,
+                                   requests_per_minute=600, retries=5, backoff_factor=0.2,
+                                   timeout=60, url=OPENMETEO_URL, stats=None):
+    """
+    Concurrently fetch daily weather data and stream results back as requests finish.
+
+    At most max_in_flight requests are open at once, and request starts are throttled by a
+    token bucket so the per-minute quota is respected. Each location in a request costs one
+    token. The url can point at a local stub server for testing.
+
+    Parameters:
+    - latitudes, longitudes, start_dates, end_dates, daily_variables, timezone, location_ids:
+      Same as fetch_weather_data_batch.
+    - chunk_size (int): Locations per request (default: 1, one request per location).
+    - max_in_flight (int): Maximum number of concurrent requests (default: 8).
+    - requests_per_minute (float): Token bucket refill rate (default: 600).
+    - retries (int): Retries per request on 429/5xx or connection errors (default: 5).
+    - backoff_factor (float): Base delay in seconds of the exponential backoff (default: 0.2).
+    - timeout (float): Total timeout per HTTP request in seconds (default: 60).
+    - url (str): Open-Meteo compatible endpoint (default: OPENMETEO_URL).
+    - stats (dict): Optional dictionary updated in place with 'requests', 'retries', 'locations',
+      'elapsed_s', 'requests_per_s' and 'locations_per_s'.
+
+    Yields:
+    - pd.DataFrame: Long-format DataFrame ('location_id', 'date', variables) for each finished request.
+
+    Example:
+        async for df in fetch_weather_data_async(lats, lons, starts, ends, variables):
+            ...
+    """
+    import aiohttp
+
+    locations = _build_location_table(latitudes, longitudes, start_dates, end_dates, location_ids)
+    if max_in_flight < 1:
+        raise ValueError("max_in_flight must be a positive integer.")
+
+    if stats is None:
+        stats = {}
+    stats.update(requests=0, retries=0, locations=0, elapsed_s=0.0, requests_per_s=0.0, locations_per_s=0.0)
+
+    bucket = TokenBucket(requests_per_minute)
+    semaphore = asyncio.Semaphore(max_in_flight)
+    started = time.perf_counter()
+
+    async def run(session, start_date, end_date, chunk):
+        params = {
+            "latitude": ",".join(map(str, chunk["latitude"])),
+            "longitude": ",".join(map(str, chunk["longitude"])),
+            "start_date": start_date,
+            "end_date": end_date,
+            "daily": ",".join(daily_variables),
+            "timezone": timezone,
+            "format": "flatbuffers"
+        }
+        async with semaphore:
+            data = await _get_with_retry(session, url, params, len(chunk), bucket, stats, retries, backoff_factor)
+
+        responses = _parse_flatbuffer_responses(data)
+        return assemble_daily_responses(responses, daily_variables, location_ids=chunk["location_id"].tolist())
+
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        tasks = [
+            asyncio.ensure_future(run(session, start_date, end_date, chunk))
+            for start_date, end_date, chunk in _iter_location_chunks(locations, chunk_size)
+        ]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                weather_dataframe = await finished
+                stats["locations"] += weather_dataframe["location_id"].nunique()
+                stats["elapsed_s"] = time.perf_counter() - started
+                stats["requests_per_s"] = stats["requests"] / stats["elapsed_s"]
+                stats["locations_per_s"] = stats["locations"] / stats["elapsed_s"]
+                yield weather_dataframe
+        finally:
+            # Stop outstanding requests if the consumer exits early or a request fails
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+#-------------------------------------------------------------------------------------------------------------------
+async def collect_weather_data_async(latitudes, longitudes, start_dates, end_dates, daily_variables, **kwargs):
+    """
+    Run fetch_weather_data_async to completion and gather every result.
+
+    In a notebook use `await collect_weather_data_async(...)`; in a script use
+    `asyncio.run(collect_weather_data_async(...))`.
+
+    Parameters:
+    - Same as fetch_weather_data_async (stats is created internally).
+
+    Returns:
+    - tuple: (pd.DataFrame sorted by location_id and date, stats dict with throughput and retry counts)
+    """
+    kwargs.pop("stats", None)
+    stats = {}
+    frames = [
+        weather_dataframe async for weather_dataframe in fetch_weather_data_async(
+            latitudes, longitudes, start_dates, end_dates, daily_variables, stats=stats, **kwargs
         )
-    }
+    ]
+    weather_dataframe = pd.concat(frames, ignore_index=True)
+    weather_dataframe["location_id"] = weather_dataframe["location_id"].astype("category")
+    weather_dataframe = weather_dataframe.sort_values(["location_id", "date"], ignore_index=True)
+    return weather_dataframe, stats
+#-------------------------------------------------------------------------------------------------------------------
+def fetch_weather_data_sub_daily(latitudes, longitudes, start_dates, end_dates, variables, resolution="hourly",
+                                 timezone="GMT", location_ids=None, chunk_size=50, resample=None,
+                                 aggregation="mean"):
+    """
+    Fetch hourly or 15-minutely weather data for many locations with compact dtypes.
 
-    # Assign each variable to the daily data dictionary
-    for i, var in enumerate(daily_variables):
-        daily_data[var] = daily.Variables(i).ValuesAsNumpy()
+    Values are float32 and 'location_id' is categorical. When resample is given, every chunk
+    of locations is aggregated as soon as it arrives and the raw data is dropped, so
+    multi-year pulls for many fires only hold the aggregated rows in memory.
 
-    # Create DataFrame
-    daily_dataframe = pd.DataFrame(data=daily_data)
-    return daily_dataframe
+    Parameters:
+    - latitudes, longitudes, start_dates, end_dates, timezone, location_ids: Same as fetch_weather_data_batch.
+    - variables (list): Hourly or 15-minutely variables (e.g. 'wind_speed_10m', 'relative_humidity_2m').
+    - resolution (str): 'hourly' or 'minutely_15' (default: 'hourly'). 15-minutely data is only
+      available for some regions and models.
+    - chunk_size (int): Maximum number of locations per request (default: 50).
+    - resample (str): Optional pandas frequency to aggregate to, e.g. '6h' or '1D' (default: None).
+    - aggregation (str, list or dict): Aggregation applied when resampling, e.g. 'mean' or
+      {'wind_speed_10m': 'max', 'relative_humidity_2m': 'min'} (default: 'mean').
+
+    Returns:
+    - pd.DataFrame: Long-format DataFrame with 'location_id', 'date' and one float32 column per variable
+      (per variable and aggregation when several aggregations are requested).
+    """
+    if resolution not in ("hourly", "minutely_15"):
+        raise ValueError(f"resolution must be 'hourly' or 'minutely_15', not {resolution!r}.")
+
+    locations = _build_location_table(latitudes, longitudes, start_dates, end_dates, location_ids)
+    all_ids = pd.Index(locations["location_id"])
+
+    frames = []
+    for start_date, end_date, chunk in _iter_location_chunks(locations, chunk_size):
+        params = {
+            "latitude": chunk["latitude"].tolist(),
+            "longitude": chunk["longitude"].tolist(),
+            "start_date": start_date,
+            "end_date": end_date,
+            resolution: variables,
+            "timezone": timezone
+        }
+        responses = _get_openmeteo_client().weather_api(OPENMETEO_URL, params=params)
+        weather_dataframe = assemble_responses(
+            responses, variables, location_ids=chunk["location_id"].tolist(), resolution=resolution
+        )
+
+        if resample is not None:
+            weather_dataframe = weather_dataframe.groupby(
+                ["location_id", pd.Grouper(key="date", freq=resample)], observed=True
+            ).agg(aggregation)
+            if isinstance(weather_dataframe.columns, pd.MultiIndex):
+                weather_dataframe.columns = ["_".join(column) for column in weather_dataframe.columns]
+            weather_dataframe = weather_dataframe.astype("float32").reset_index()
+
+        # Share one category set so the chunks concatenate without falling back to object
+        weather_dataframe["location_id"] = weather_dataframe["location_id"].cat.set_categories(all_ids)
+        frames.append(weather_dataframe)
+
+    weather_dataframe = pd.concat(frames, ignore_index=True)
+    return weather_dataframe
@@ -0,0 +1,271 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+import pandas as pd
+
+# Per-stage instrumentation for the Source Cooperative pipelines.
+
+#-------------------------------------------------------------------------------------------------------------------
+def _process_rss():
+    """
+    Return the resident memory in bytes of the calling process (run on each worker by client.run).
+    """
+    import psutil
+
+    return psutil.Process().memory_info().rss
+#-------------------------------------------------------------------------------------------------------------------
+def _network_bytes():
+    """
+    Return (received, sent) bytes over all non-loopback network interfaces of this machine.
+    """
+    import psutil
+
+    counters = psutil.net_io_counters(pernic=True)
+    received = sum(c.bytes_recv for name, c in counters.items() if not name.startswith("lo"))
+    sent = sum(c.bytes_sent for name, c in counters.items() if not name.startswith("lo"))
+    return received, sent
+#-------------------------------------------------------------------------------------------------------------------
+class _MemorySampler:
+    """
+    Background thread recording the peak resident memory of the Dask workers (or of this process without a client).
+    """
+    def __init__(self, client=None, interval=0.5):
+        self.client = client
+        self.interval = interval
+        self.peak_worker_bytes = 0
+        self.peak_total_bytes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self):
+        if self.client is None:
+            usage = [_process_rss()]
+        else:
+            try:
+                usage = list(self.client.run(_process_rss).values())
+            except Exception:
+                # Workers can be restarting or scaling; skip this sample
+                return
+        self.peak_worker_bytes = max(self.peak_worker_bytes, max(usage, default=0))
+        self.peak_total_bytes = max(self.peak_total_bytes, sum(usage))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+#-------------------------------------------------------------------------------------------------------------------
+class StageRecord(dict):
+    """
+    Metrics of one pipeline stage. Stages fill in 'bytes' and 'partitions' with set() or track().
+    """
+    def set(self, **metrics):
+        """
+        Record extra metrics, e.g. stage.set(bytes=summary['bytes']).
+        """
+        self.update(metrics)
+
+    def track(self, collection):
+        """
+        Record the partition count of a Dask collection and return the collection unchanged.
+        """
+        self['partitions'] = getattr(collection, "npartitions", None)
+        return collection
+#-------------------------------------------------------------------------------------------------------------------
+class PipelineMetrics:
+    """
+    Times the stages of a pipeline run and records bytes moved, partitions touched and peak memory.
+
+    Each stage records its wall time, the network bytes received and sent by this machine
+    (S3 downloads and remote reads), the partitions of the collection it produced, and the
+    peak resident memory of the Dask workers, sampled every sample_interval seconds. With
+    output_dir, the run writes '<run_name>_<timestamp>.json' on exit and, if
+    performance_report is set and a distributed client is given, a Dask performance report
+    HTML file next to it. JSON files from nightly runs can be compared with load_run_metrics.
+
+    Parameters:
+    - run_name (str): Name used in the output file names (default: 'source_coop').
+    - output_dir (str): Directory of the JSON and HTML reports (default: None, nothing written).
+    - client (dask.distributed.Client): Cluster to sample and describe (default: None).
+    - performance_report (bool): Also write a distributed.performance_report HTML (default: False).
+    - sample_interval (float): Seconds between memory samples (default: 0.5).
+
+    Example:
+        with PipelineMetrics('nightly', output_dir='metrics', client=client, performance_report=True) as run:
+            with run.stage('get_mtbs_shp') as stage:
+                mtbs_shp_ddf = stage.track(get_mtbs_shp(file_name, s3_client, local_path))
+        run.summary()
+    """
+    def __init__(self, run_name="source_coop", output_dir=None, client=None, performance_report=False,
+                 sample_interval=0.5):
+        self.run_name = run_name
+        self.output_dir = output_dir
+        self.client = client
+        self.performance_report = performance_report
+        self.sample_interval = sample_interval
+        self.stages = []
+        self.started_at = None
+        self.total_s = None
+        self.json_path = None
+        self.html_path = None
+        self._report = nullcontext()
+
+    def __enter__(self):
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+        stem = f"{self.run_name}_{self.started_at.strftime('%Y%m%dT%H%M%SZ')}"
+        if self.output_dir is not None:
+            os.makedirs(self.output_dir, exist_ok=True)
+            self.json_path = os.path.join(self.output_dir, f"{stem}.json")
+            if self.performance_report and self.client is not None:
+                from dask.distributed import performance_report
+
+                self.html_path = os.path.join(self.output_dir, f"{stem}.html")
+                self._report = performance_report(filename=self.html_path)
+        self._report.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        self._report.__exit__(*exc)
+        self.total_s = time.perf_counter() - self._started
+        if self.json_path is not None:
+            self.write_json(self.json_path)
+            print(f"Run metrics written to {self.json_path}")
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Measure one stage. Yields a StageRecord the stage can add 'bytes' and 'partitions' to.
+        """
+        record = StageRecord(stage=name, status="ok", partitions=None, bytes=None)
+        # Bound before the try, so the finally block can read it even if starting the sampler fails
+        sampler = _MemorySampler(self.client, self.sample_interval)
+        received, sent = _network_bytes()
+        started = time.perf_counter()
+        try:
+            with sampler:
+                yield record
+        except Exception as error:
+            record.set(status="error", error=f"{type(error).__name__}: {error}")
+            raise
+        finally:
+            end_received, end_sent = _network_bytes()
+            record.set(
+                wall_s=time.perf_counter() - started,
+                net_received_bytes=end_received - received,
+                net_sent_bytes=end_sent - sent,
+                peak_worker_memory_bytes=sampler.peak_worker_bytes,
+                peak_total_memory_bytes=sampler.peak_total_bytes,
+            )
+            self.stages.append(record)
+            print(f"[{self.run_name}] {name}: {record['wall_s']:.2f}s, {record['status']}")
+
+    def to_dict(self):
+        """
+        Return the run as a JSON-serializable dict with the cluster description and every stage.
+        """
+        cluster = None
+        if self.client is not None:
+            from .source_coop_utils import cluster_performance_report
+
+            try:
+                cluster = cluster_performance_report(self.client)
+            except Exception as error:
+                cluster = {"error": str(error)}
+        return {
+            "run_name": self.run_name,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "total_s": self.total_s,
+            "cluster": cluster,
+            "performance_report": self.html_path,
+            "stages": [dict(stage) for stage in self.stages],
+        }
+
+    def write_json(self, path):
+        """
+        Write the run metrics to a JSON file.
+        """
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+
+    def summary(self):
+        """
+        Return one row per stage as a DataFrame.
+        """
+        return pd.DataFrame([dict(stage) for stage in self.stages])
+#-------------------------------------------------------------------------------------------------------------------
+def load_run_metrics(output_dir, run_name="source_coop"):
+    """
+    Load every JSON metrics file of a run name into one table, e.g. to track nightly regressions.
+
+    Parameters:
+    - output_dir (str): Directory the PipelineMetrics JSON files were written to.
+    - run_name (str): Run name to load (default: 'source_coop').
+
+    Returns:
+    - pd.DataFrame: One row per run and stage, with 'started_at' and the stage metrics, sorted by time.
+    """
+    rows = []
+    for file_name in sorted(os.listdir(output_dir)):
+        if not (file_name.startswith(f"{run_name}_") and file_name.endswith(".json")):
+            continue
+        with open(os.path.join(output_dir, file_name)) as f:
+            run = json.load(f)
+        profile = (run.get("cluster") or {}).get("profile")
+        for stage in run["stages"]:
+            rows.append({"started_at": run["started_at"], "profile": profile, **stage})
+
+    runs = pd.DataFrame(rows)
+    if not runs.empty:
+        runs["started_at"] = pd.to_datetime(runs["started_at"])
+        runs = runs.sort_values(["started_at"], kind="stable", ignore_index=True)
+    return runs
+#-------------------------------------------------------------------------------------------------------------------
+def run_source_coop_pipeline(s3_client, local_path, usgs_file_name="usgs-mtbs", mtbs_file_name="mtbs_perims_DD",
+                             client=None, output_dir=None, performance_report=False, run_name="source_coop"):
+    """
+    Run get_usgs_data -> get_mtbs_shp -> create_wildfire_severity_map with per-stage metrics.
+
+    The get_usgs_data stage records the bytes downloaded as 'bytes' (0 when the local files are
+    up to date) and the compressed size of the selected column chunks as 'bytes_read_estimate'.
+
+    Parameters:
+    - s3_client (boto3 client): S3 client for the Source Cooperative endpoint.
+    - local_path (str): Local directory for the downloaded files.
+    - usgs_file_name (str): File name prefix passed to get_usgs_data (default: 'usgs-mtbs').
+    - mtbs_file_name (str): File name prefix passed to get_mtbs_shp (default: 'mtbs_perims_DD').
+    - client, output_dir, performance_report, run_name: Same as PipelineMetrics.
+
+    Returns:
+    - tuple: (usgs_ddf, mtbs_shp_ddf, map_object, metrics) where metrics is the PipelineMetrics run.
+    """
+    from .source_coop_utils import create_wildfire_severity_map, get_mtbs_shp, get_usgs_data
+
+    with PipelineMetrics(run_name, output_dir, client, performance_report) as metrics:
+        with metrics.stage("get_usgs_data") as stage:
+            usgs_ddf, plan = get_usgs_data(usgs_file_name, s3_client, local_path, return_plan=True)
+            stage.track(usgs_ddf)
+            # bytes is what was actually downloaded; the row-group selection is a footer-based estimate
+            stage.set(bytes=plan["bytes_downloaded"], bytes_read_estimate=plan["bytes_selected"],
+                      row_groups=plan["row_groups_selected"])
+
+        with metrics.stage("get_mtbs_shp") as stage:
+            mtbs_shp_ddf = stage.track(get_mtbs_shp(mtbs_file_name, s3_client, local_path))
+
+        with metrics.stage("create_wildfire_severity_map") as stage:
+            map_object = create_wildfire_severity_map(mtbs_shp_ddf)
+            stage.set(partitions=mtbs_shp_ddf.npartitions)
+
+    return usgs_ddf, mtbs_shp_ddf, map_object, metrics
+#-------------------------------------------------------------------------------------------------------------------
@@ -1,34 +1,223 @@
 import os
-import dask_geopandas as dg
-import geopandas as gpd
-import boto3
-import leafmap
-from botocore.exceptions import ClientError
-from dask.distributed import Client, LocalCluster
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+# Bytes per megabyte (MiB), used for transfer sizes and throughput
+MB = 1024 * 1024
+
+# Download manifest kept in each local directory (see load_manifest)
+MANIFEST_NAME = '.s3_manifest.json'
+
+# Multipart part sizes of common uploaders (boto3 and the AWS CLI use 8 MiB, 5 MiB is the S3
+# minimum), tried when matching a multipart ETag whose part size cannot be inferred
+MULTIPART_PART_SIZES = (8 * MB, 5 * MB, 16 * MB, 15 * MB, 64 * MB, 100 * MB)
 
 #-------------------------------------------------------------------------------------------------------------------
-def initialize_dask_cluster(**cluster_kwargs):
+# Named LocalCluster profiles. 'cluster' is passed to LocalCluster, 'memory' sets the
+# worker memory fractions (distributed.worker.memory.*) at which a worker starts spilling
+# to disk ('target' by managed memory, 'spill' by process memory), pauses new tasks
+# ('pause') and is restarted ('terminate'), and 'adapt' bounds cluster.adapt()
+# (None keeps a fixed size). n_workers/threads of None are sized from the CPU count.
+DASK_CLUSTER_PROFILES = {
+    'io': {
+        'description': 'I/O-bound downloads and remote reads: one process, many threads',
+        'cluster': {'processes': False, 'n_workers': 1, 'threads_per_worker': None},
+        'memory': {'target': 0.6, 'spill': 0.7, 'pause': 0.8, 'terminate': 0.95},
+        'adapt': None,
+    },
+    'geometry': {
+        'description': 'Geometry-heavy CPU work (joins, overlays): one single-threaded process per core',
+        'cluster': {'processes': True, 'n_workers': None, 'threads_per_worker': 1},
+        'memory': {'target': 0.6, 'spill': 0.7, 'pause': 0.8, 'terminate': 0.95},
+        'adapt': {'minimum': 1, 'maximum': None},
+    },
+    'low_memory': {
+        'description': 'Laptops with little RAM: two workers that spill to disk early',
+        'cluster': {'processes': True, 'n_workers': 2, 'threads_per_worker': 1},
+        'memory': {'target': 0.4, 'spill': 0.5, 'pause': 0.7, 'terminate': 0.9},
+        'adapt': {'minimum': 1, 'maximum': 2},
+    },
+}
+
+# Resolved profile of every cluster started by initialize_dask_cluster, by scheduler address
+_CLUSTER_PROFILES = {}
+#-------------------------------------------------------------------------------------------------------------------
+def get_cluster_profile(profile):
+    """
+    Resolves a named cluster profile for this machine.
+
+    Parameters:
+    - profile (str or dict): Name in DASK_CLUSTER_PROFILES, or a dict with the same keys.
+
+    Returns:
+    - dict: Copy of the profile with 'name' and the CPU-dependent worker and thread counts filled in.
+    """
+    import copy
+
+    if isinstance(profile, str):
+        if profile not in DASK_CLUSTER_PROFILES:
+            raise ValueError(f"Unknown cluster profile {profile!r}. Choose from {sorted(DASK_CLUSTER_PROFILES)}.")
+        resolved = copy.deepcopy(DASK_CLUSTER_PROFILES[profile])
+        resolved['name'] = profile
+    else:
+        resolved = copy.deepcopy(profile)
+        resolved.setdefault('name', 'custom')
+        resolved.setdefault('memory', {})
+        resolved.setdefault('adapt', None)
+
+    cpus = os.cpu_count() or 1
+    cluster = resolved['cluster']
+    if cluster.get('n_workers', 0) is None:
+        cluster['n_workers'] = cpus
+    if cluster.get('threads_per_worker', 0) is None:
+        # Threads mostly wait on the network, so oversubscribe the cores
+        cluster['threads_per_worker'] = min(32, 4 * cpus)
+    if resolved['adapt'] is not None and resolved['adapt'].get('maximum') is None:
+        resolved['adapt']['maximum'] = cluster.get('n_workers') or cpus
+    return resolved
+#-------------------------------------------------------------------------------------------------------------------
+def initialize_dask_cluster(profile=None, spill_directory=None, **cluster_kwargs):
     """
     Initializes a Dask LocalCluster and Client, and prints the dashboard link.
-    
+
+    Without a profile the keyword arguments are passed to LocalCluster unchanged. With a
+    profile, its processes/threads layout, memory spill thresholds and adapt() bounds are
+    applied first and cluster_kwargs override the layout. The resolved profile is recorded
+    and returned by cluster_performance_report.
+
     Parameters:
+    - profile (str or dict): 'io', 'geometry', 'low_memory' or a custom profile dict (default: None).
+    - spill_directory (str): Directory for spilled data (default: Dask's temporary directory).
     - cluster_kwargs: Optional keyword arguments to configure the LocalCluster.
                       Examples: n_workers=4, threads_per_worker=2, memory_limit='2GB'
-    
+
     Returns:
     - client: The initialized Dask Client.
     """
+    import dask
+    from dask.distributed import Client, LocalCluster
+
+    resolved = None
+    config = {}
+    if profile is not None:
+        resolved = get_cluster_profile(profile)
+        cluster_kwargs = {**resolved['cluster'], **cluster_kwargs}
+        config = {f'distributed.worker.memory.{key}': value for key, value in resolved['memory'].items()}
+        # Worker arguments are reused for workers added later by adapt(); 'terminate' is only
+        # read from the config, so it applies to the workers started here
+        for key in ('target', 'spill', 'pause'):
+            if key in resolved['memory']:
+                cluster_kwargs.setdefault(f'memory_{key}_fraction', resolved['memory'][key])
+    if spill_directory is not None:
+        cluster_kwargs['local_directory'] = spill_directory
+
     # Initialize LocalCluster with optional arguments
-    cluster = LocalCluster(**cluster_kwargs)
-    
+    with dask.config.set(config):
+        cluster = LocalCluster(**cluster_kwargs)
+        if resolved is not None and resolved['adapt'] is not None:
+            cluster.adapt(**resolved['adapt'])
+
     # Create a Dask Client connected to the cluster
     client = Client(cluster)
-    
+    _CLUSTER_PROFILES[client.scheduler.address] = {
+        'profile': resolved['name'] if resolved else None,
+        'settings': {**(resolved or {}), 'cluster': cluster_kwargs},
+    }
+
     # Print the dashboard link
     print(f"Dask Dashboard is available at: {client.dashboard_link}")
-    
+    if resolved is not None:
+        print(f"Cluster profile '{resolved['name']}': {resolved.get('description', '')}")
+
     return client
+#-------------------------------------------------------------------------------------------------------------------
+@contextmanager
+def dask_cluster(profile='geometry', spill_directory=None, **cluster_kwargs):
+    """
+    Context manager that starts a profiled Dask cluster and always shuts it down.
+
+    Example:
+        with dask_cluster('low_memory') as client:
+            stats = compute_wildfire_statistics(mtbs_shp_ddf)
+            print(cluster_performance_report(client))
+
+    Parameters:
+    - profile, spill_directory, cluster_kwargs: Same as initialize_dask_cluster (default profile: 'geometry').
+
+    Yields:
+    - client: The Dask Client, closed together with its cluster on exit.
+    """
+    client = initialize_dask_cluster(profile, spill_directory=spill_directory, **cluster_kwargs)
+    address = client.scheduler.address
+    try:
+        yield client
+    finally:
+        cluster = client.cluster
+        client.close()
+        if cluster is not None:
+            cluster.close()
+        _CLUSTER_PROFILES.pop(address, None)
+#-------------------------------------------------------------------------------------------------------------------
+def cluster_performance_report(client):
+    """
+    Describes a running cluster and the profile it was started with.
+
+    Parameters:
+    - client (dask.distributed.Client): Client from initialize_dask_cluster or dask_cluster.
+
+    Returns:
+    - dict: 'profile' (name or None), 'settings' (resolved profile), 'workers', 'threads',
+      'memory_limit_per_worker' (bytes), 'memory_thresholds' and 'dashboard_link'.
+    """
+    import dask
 
+    workers = client.scheduler_info()['workers'].values()
+    recorded = _CLUSTER_PROFILES.get(client.scheduler.address, {'profile': None, 'settings': {}})
+    thresholds = recorded['settings'].get('memory') or {
+        key: dask.config.get(f'distributed.worker.memory.{key}') for key in ('target', 'spill', 'pause', 'terminate')
+    }
+    return {
+        'profile': recorded['profile'],
+        'settings': recorded['settings'],
+        'workers': len(workers),
+        'threads': sum(worker['nthreads'] for worker in workers),
+        'memory_limit_per_worker': max((worker['memory_limit'] for worker in workers), default=0),
+        'memory_thresholds': thresholds,
+        'dashboard_link': client.dashboard_link,
+    }
+#-------------------------------------------------------------------------------------------------------------------
+def list_s3_objects(bucket_name, prefix, client):
+    """
+    Lists every S3 object under a prefix, following continuation tokens past the 1000-key page limit.
+
+    Inputs:
+    --------
+    bucket_name : string
+        The name of the S3 bucket.
+    prefix : string
+        The prefix to filter the keys (e.g., folder path).
+    client : boto3 client object
+        An S3 client returned by boto3.client.
+
+    Returns:
+    --------
+    objects : list
+        One dict per object with 'Key', 'Size', 'ETag' (without quotes) and 'LastModified'.
+    """
+    objects = []
+
+    paginator = client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            objects.append({
+                'Key': obj['Key'],
+                'Size': obj['Size'],
+                'ETag': obj['ETag'].strip('"'),
+                'LastModified': obj['LastModified'],
+            })
+
+    return objects
 #-------------------------------------------------------------------------------------------------------------------
 def get_s3_keys(bucket_name, prefix, client):
     """
@@ -48,73 +237,1063 @@ def get_s3_keys(bucket_name, prefix, client):
     keys : list
         List of all keys that match the given prefix.
     """
-    keys = []    
+    keys = [obj['Key'] for obj in list_s3_objects(bucket_name, prefix, client)]
+
+    return keys
+#-------------------------------------------------------------------------------------------------------------------
+def _head_s3_object(bucket_name, key, client):
+    """
+    Returns the list_s3_objects-style description of a single key.
+    """
+    response = client.head_object(Bucket=bucket_name, Key=key)
+    return {
+        'Key': key,
+        'Size': response['ContentLength'],
+        'ETag': response['ETag'].strip('"'),
+        'LastModified': response['LastModified'],
+    }
+#-------------------------------------------------------------------------------------------------------------------
+def _multipart_etag(path, part_size, parts):
+    """
+    Computes the multipart ETag of a local file uploaded in parts of part_size bytes.
+    """
+    import hashlib
+
+    digests = b''
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(part_size), b''):
+            digests += hashlib.md5(block).digest()
+    return f"{hashlib.md5(digests).hexdigest()}-{parts}"
+#-------------------------------------------------------------------------------------------------------------------
+def _local_etag(path, etag):
+    """
+    Computes the S3-style ETag of a local file, in the same single-part or multipart form as etag.
+
+    Multipart ETags are the MD5 of the concatenated part MD5s followed by '-<parts>'. The part
+    size is not stored by S3, so the size divided by the part count rounded up to a whole MiB
+    is tried first, then the part sizes of common uploaders (MULTIPART_PART_SIZES) that give
+    the same part count. Returns the first matching ETag, or the last one computed (None if
+    no candidate part size fits the part count).
+    """
+    import hashlib
+    import math
+
+    size = os.path.getsize(path)
+    if '-' not in etag:
+        md5 = hashlib.md5()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(8 * MB), b''):
+                md5.update(block)
+        return md5.hexdigest()
+
+    parts = int(etag.split('-')[1])
+    inferred = math.ceil(math.ceil(size / parts) / MB) * MB
+    candidates = [inferred, *(part_size for part_size in MULTIPART_PART_SIZES if part_size != inferred)]
+    local_etag = None
+    for part_size in candidates:
+        if math.ceil(size / part_size) != parts:
+            continue
+        local_etag = _multipart_etag(path, part_size, parts)
+        if local_etag == etag:
+            break
+    return local_etag
+#-------------------------------------------------------------------------------------------------------------------
+def _is_up_to_date(local_fname, obj, verify_etag):
+    """
+    Returns True if local_fname exists with the object's size and, when verify_etag is set, its ETag.
+    """
+    if not os.path.exists(local_fname) or os.path.getsize(local_fname) != obj['Size']:
+        return False
+    return not verify_etag or _local_etag(local_fname, obj['ETag']) == obj['ETag']
+#-------------------------------------------------------------------------------------------------------------------
+def load_manifest(local_path):
+    """
+    Loads the download manifest of a local directory.
+
+    The manifest maps each downloaded file (relative to local_path) to the 'Bucket', 'Key',
+    'Size', 'ETag' and 'LastModified' of the S3 object it came from, and to the local
+    modification time ('Mtime') recorded after the download.
+
+    Inputs:
+    --------
+    local_path : string
+        Directory the files were downloaded to.
+
+    Returns:
+    --------
+    manifest : dict
+        The manifest entries, or an empty dict if the directory has no manifest yet.
+    """
+    import json
+
+    manifest_path = os.path.join(local_path, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path) as f:
+        return json.load(f)
+#-------------------------------------------------------------------------------------------------------------------
+def _write_json_atomic(path, data):
+    """
+    Writes data as JSON to path through a temporary file and a rename.
+    """
+    import json
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=1, default=str)
+    os.replace(tmp_path, path)
+#-------------------------------------------------------------------------------------------------------------------
+def _manifest_entry(bucket_name, obj, local_fname):
+    """
+    Returns the manifest entry of an object that is now stored at local_fname.
+    """
+    last_modified = obj['LastModified']
+    return {
+        'Bucket': bucket_name,
+        'Key': obj['Key'],
+        'Size': obj['Size'],
+        'ETag': obj['ETag'],
+        'LastModified': last_modified.isoformat() if hasattr(last_modified, 'isoformat') else last_modified,
+        'Mtime': os.path.getmtime(local_fname),
+    }
+#-------------------------------------------------------------------------------------------------------------------
+def _matches_manifest(entry, bucket_name, obj, local_fname):
+    """
+    Returns True if the manifest entry describes obj and local_fname is unchanged since it was recorded.
+
+    Only the listing and a stat of the local file are used, so no file is read.
+    """
+    if entry is None or not os.path.exists(local_fname):
+        return False
+    return (
+        entry['Bucket'] == bucket_name and entry['Key'] == obj['Key'] and entry['ETag'] == obj['ETag']
+        and entry['Size'] == obj['Size'] == os.path.getsize(local_fname)
+        and entry['Mtime'] == os.path.getmtime(local_fname)
+    )
+#-------------------------------------------------------------------------------------------------------------------
+def _download_object(bucket_name, obj, local_fname, s3_client, part_size=8 * MB, max_concurrency=4):
+    """
+    Downloads one object to local_fname through '<local_fname>.part', resuming an interrupted download.
+
+    The object is fetched in byte ranges of part_size bytes by up to max_concurrency threads,
+    written in place into the .part file. Finished parts are recorded with the object's ETag in
+    '<local_fname>.part.json', so a later call only fetches the missing ranges if the object is
+    unchanged, and starts over otherwise. Every range request carries If-Match, so an object
+    replaced during the download fails instead of mixing two versions. The complete file is
+    renamed into place, so local_fname is never a partial file.
+
+    Returns the number of bytes fetched.
+    """
+    import json
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    part_fname = f"{local_fname}.part"
+    state_fname = f"{part_fname}.json"
+    size, etag = obj['Size'], obj['ETag']
+    n_parts = -(-size // part_size)
+
+    state = None
+    if os.path.exists(state_fname) and os.path.exists(part_fname):
+        with open(state_fname) as f:
+            state = json.load(f)
+        if (state.get('ETag'), state.get('Size'), state.get('PartSize')) != (etag, size, part_size) \
+                or os.path.getsize(part_fname) != size:
+            state = None
+    if state is None:
+        state = {'ETag': etag, 'Size': size, 'PartSize': part_size, 'Done': []}
+        with open(part_fname, 'wb') as f:
+            f.truncate(size)
+        _write_json_atomic(state_fname, state)
+    elif state['Done']:
+        print(f"Resuming {obj['Key']}: {len(state['Done'])}/{n_parts} parts already downloaded.")
+
+    done = set(state['Done'])
+    lock = threading.Lock()
+
+    def fetch(part):
+        start = part * part_size
+        end = min(start + part_size, size) - 1
+        response = s3_client.get_object(
+            Bucket=bucket_name, Key=obj['Key'], Range=f"bytes={start}-{end}", IfMatch=f'"{etag}"'
+        )
+        body = response['Body'].read()
+        if len(body) != end - start + 1:
+            raise IOError(f"Short read for {obj['Key']} bytes {start}-{end}: got {len(body)} bytes.")
+        with open(part_fname, 'r+b') as f:
+            f.seek(start)
+            f.write(body)
+        with lock:
+            done.add(part)
+            _write_json_atomic(state_fname, {**state, 'Done': sorted(done)})
+        return len(body)
+
+    missing = [part for part in range(n_parts) if part not in done]
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+        nbytes = sum(executor.map(fetch, missing))
+
+    os.replace(part_fname, local_fname)
+    os.remove(state_fname)
+    return nbytes
+#-------------------------------------------------------------------------------------------------------------------
+def download_s3_objects(bucket_name, objects, local_path, s3_client, max_workers=8,
+                        multipart_chunksize=8 * MB, max_concurrency=4, verify_etag=True, prefix=None):
+    """
+    Downloads many S3 objects in parallel, fetching only objects that are new or changed since the last download.
+
+    Objects are downloaded by a thread pool of max_workers. Each object is fetched in ranges of
+    multipart_chunksize bytes by up to max_concurrency threads into a temporary '.part' file
+    that is renamed into place when complete; an interrupted download resumes with its missing
+    ranges (see _download_object). Every download is recorded in the manifest of local_path
+    (see load_manifest). A file is skipped when its manifest entry has the listed size and ETag
+    and the local file still has the recorded size and modification time, so up-to-date files
+    are never read. Files without a manifest entry (downloaded before the manifest existed) are
+    checked once by size and, when verify_etag is set, by hashing them, then recorded.
+
+    Inputs:
+    --------
+    bucket_name : string
+        The name of the S3 bucket.
+    objects : list
+        Objects returned by list_s3_objects, or plain keys (their size and ETag are then looked up).
+    local_path : string
+        Directory the files are written to, using the last component of each key as file name.
+    s3_client : boto3 client object
+        An S3 client returned by boto3.client (works with moto or MinIO stand-ins).
+    max_workers : int
+        Number of objects downloaded at once (default: 8).
+    multipart_chunksize : int
+        Size in bytes of each range request (default: 8 MB).
+    max_concurrency : int
+        Range requests in flight per object (default: 4).
+    verify_etag : bool
+        Hash files without a manifest entry to compare ETags as well as sizes (default: True).
+    prefix : string
+        If given, files keep their key path relative to prefix instead of only the last component
+        (default: None).
+
+    Returns:
+    --------
+    summary : dict
+        'files', 'downloaded', 'skipped', 'failed' (list of keys), 'bytes', 'elapsed_s' and 'mb_per_s'.
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    from botocore.exceptions import ClientError
+
+    os.makedirs(local_path, exist_ok=True)
+    manifest = load_manifest(local_path)
+    manifest_path = os.path.join(local_path, MANIFEST_NAME)
+
+    def relative_path(key):
+        if prefix is not None and key.startswith(prefix):
+            return key[len(prefix):].lstrip('/')
+        return key.split('/')[-1]
+
+    def download(obj):
+        if not isinstance(obj, dict):
+            obj = _head_s3_object(bucket_name, obj, s3_client)
+        name = relative_path(obj['Key'])
+        local_fname = os.path.join(local_path, name)
+        entry = manifest.get(name)
+        if _matches_manifest(entry, bucket_name, obj, local_fname):
+            return name, None, 'skipped', 0
+        if entry is None and _is_up_to_date(local_fname, obj, verify_etag):
+            return name, _manifest_entry(bucket_name, obj, local_fname), 'skipped', 0
+        os.makedirs(os.path.dirname(local_fname), exist_ok=True)
+        nbytes = _download_object(bucket_name, obj, local_fname, s3_client, multipart_chunksize, max_concurrency)
+        return name, _manifest_entry(bucket_name, obj, local_fname), 'downloaded', nbytes
+
+    summary = {'files': len(objects), 'downloaded': 0, 'skipped': 0, 'failed': [], 'bytes': 0}
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(download, obj): obj['Key'] if isinstance(obj, dict) else obj
+            for obj in objects
+        }
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                name, entry, status, nbytes = future.result()
+            except ClientError as error:
+                code = error.response["Error"]["Code"]
+                if code in ("404", "NoSuchKey"):
+                    print(f"The specified key does not exist in the bucket: {key}")
+                elif code in ("412", "PreconditionFailed"):
+                    print(f"{key} changed during the download; it will be fetched again on the next sync.")
+                else:
+                    print(f"An error occurred downloading {key}: {error}")
+                summary['failed'].append(key)
+                continue
+            except Exception as error:
+                print(f"An unexpected error occurred downloading {key}: {error}")
+                summary['failed'].append(key)
+                continue
+            if entry is not None:
+                # Record each file as soon as it is in place, so an interrupted run keeps its progress
+                manifest[name] = entry
+                _write_json_atomic(manifest_path, manifest)
+            summary[status] += 1
+            summary['bytes'] += nbytes
+
+    summary['elapsed_s'] = time.perf_counter() - started
+    summary['mb_per_s'] = summary['bytes'] / MB / summary['elapsed_s'] if summary['elapsed_s'] > 0 else 0.0
+    print(
+        f"Download complete: {summary['downloaded']} downloaded, {summary['skipped']} already up to date, "
+        f"{len(summary['failed'])} failed ({summary['bytes'] / MB:.1f} MB at {summary['mb_per_s']:.1f} MB/s)."
+    )
+    return summary
+#-------------------------------------------------------------------------------------------------------------------
+def sync_s3_prefix(bucket_name, prefix, local_path, s3_client, delete=False, **download_kwargs):
+    """
+    Mirrors every object under an S3 prefix into a local directory, fetching only new or changed objects.
+
+    The prefix is listed once, and the listing is compared with the manifest of local_path, so
+    a sync with nothing to do costs a single listing and transfers no data. Files keep their key
+    path relative to prefix.
+
+    Inputs:
+    --------
+    bucket_name : string
+        The name of the S3 bucket.
+    prefix : string
+        The prefix to mirror (e.g., 'fire/').
+    local_path : string
+        Local directory of the mirror.
+    s3_client : boto3 client object
+        An S3 client returned by boto3.client.
+    delete : bool
+        Also delete local files whose objects are no longer listed (default: False, only reported).
+    download_kwargs :
+        Optional download_s3_objects settings (max_workers, multipart_chunksize, ...).
+
+    Returns:
+    --------
+    summary : dict
+        The download_s3_objects summary, plus 'removed' (keys recorded locally but no longer listed).
+    """
+    objects = list_s3_objects(bucket_name, prefix, s3_client)
+    summary = download_s3_objects(bucket_name, objects, local_path, s3_client, prefix=prefix, **download_kwargs)
+
+    listed = {obj['Key'] for obj in objects}
+    manifest = load_manifest(local_path)
+    removed = [
+        name for name, entry in manifest.items()
+        if entry['Bucket'] == bucket_name and entry['Key'].startswith(prefix) and entry['Key'] not in listed
+    ]
+    summary['removed'] = [manifest[name]['Key'] for name in removed]
+    if removed and delete:
+        for name in removed:
+            local_fname = os.path.join(local_path, name)
+            if os.path.exists(local_fname):
+                os.remove(local_fname)
+            del manifest[name]
+        _write_json_atomic(os.path.join(local_path, MANIFEST_NAME), manifest)
+        print(f"Deleted {len(removed)} local files whose objects were removed from s3://{bucket_name}/{prefix}.")
+    elif removed:
+        print(f"{len(removed)} local files are no longer listed under s3://{bucket_name}/{prefix} (kept).")
+    return summary
+#-------------------------------------------------------------------------------------------------------------------
+def _s3_storage_options(s3_client):
+    """
+    Builds fsspec/s3fs storage options that reach the same endpoint as s3_client.
+
+    An unsigned client (signature_version=botocore.UNSIGNED) reads anonymously. Otherwise the
+    credentials come from the default boto3 credential chain (environment variables, shared
+    config, instance role); a client built with other explicit keys needs storage_options
+    passed to get_usgs_data, e.g. {'key': ..., 'secret': ...} or {'profile': ...}.
+    """
+    import boto3
+    from botocore import UNSIGNED
+
+    storage_options = {'client_kwargs': {'endpoint_url': s3_client.meta.endpoint_url}}
+    if s3_client.meta.region_name:
+        storage_options['client_kwargs']['region_name'] = s3_client.meta.region_name
+
+    credentials = None
+    if s3_client.meta.config.signature_version is not UNSIGNED:
+        credentials = boto3.Session().get_credentials()
+    if credentials is not None:
+        frozen = credentials.get_frozen_credentials()
+        storage_options.update(key=frozen.access_key, secret=frozen.secret_key, token=frozen.token)
+    else:
+        storage_options['anon'] = True
+
+    return storage_options
+#-------------------------------------------------------------------------------------------------------------------
+def _build_parquet_filters(ig_date_range=None, event_id_prefix=None):
+    """
+    Translates an Ig_Date range and an Event_ID prefix into pyarrow-style filter tuples.
+
+    An Event_ID prefix such as 'CA' becomes the range 'CA' <= Event_ID < 'CB', which can be
+    checked against row-group min/max statistics.
+    """
+    filters = []
+    if ig_date_range is not None:
+        start, end = ig_date_range
+        if start is not None:
+            filters.append(('Ig_Date', '>=', start))
+        if end is not None:
+            filters.append(('Ig_Date', '<=', end))
+    if event_id_prefix:
+        upper = event_id_prefix[:-1] + chr(ord(event_id_prefix[-1]) + 1)
+        filters.extend([('Event_ID', '>=', event_id_prefix), ('Event_ID', '<', upper)])
+    return filters
+#-------------------------------------------------------------------------------------------------------------------
+def _coerce_filter_value(value, arrow_type):
+    """
+    Converts a filter value to the Python type pyarrow uses for statistics of arrow_type.
+    """
+    import pandas as pd
+    import pyarrow as pa
 
-    response = client.list_objects_v2(Bucket=bucket_name, Prefix=prefix)
-    for obj in response['Contents']:
-        keys.append(obj['Key'])
+    if pa.types.is_timestamp(arrow_type):
+        timestamp = pd.Timestamp(value)
+        if arrow_type.tz is not None and timestamp.tzinfo is None:
+            timestamp = timestamp.tz_localize(arrow_type.tz)
+        return timestamp.to_pydatetime()
+    if pa.types.is_date(arrow_type):
+        return pd.Timestamp(value).date()
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return str(value)
+    return value
+#-------------------------------------------------------------------------------------------------------------------
+def _row_group_may_match(row_group, column_index, filters):
+    """
+    Returns False only if the row-group min/max statistics prove no row can satisfy every filter.
+    """
+    for column, op, value in filters:
+        statistics = row_group.column(column_index[column]).statistics
+        if statistics is None or not statistics.has_min_max:
+            continue
+        low, high = statistics.min, statistics.max
+        if (op == '>=' and high < value) or (op == '>' and high <= value) \
+                or (op == '<=' and low > value) or (op == '<' and low >= value) \
+                or (op == '==' and not low <= value <= high):
+            return False
+    return True
+#-------------------------------------------------------------------------------------------------------------------
+def plan_parquet_read(fs, objects, columns=None, filters=None):
+    """
+    Reads only the parquet footers to work out which row groups and column chunks a query needs.
+
+    Parameters:
+    - fs (fsspec filesystem): Filesystem holding the objects (e.g. s3fs for Source Cooperative).
+    - objects (list): Objects from list_s3_objects, with 'Path' set to the fsspec path.
+    - columns (list): Columns to read (default: all).
+    - filters (list): (column, op, value) tuples combined with AND; ops are >=, >, <=, < and ==.
 
-    return keys  
+    Returns:
+    - dict: 'columns' and 'filters' coerced to the file schema, 'row_groups', 'row_groups_selected',
+      'bytes_selected' (column chunks fetched with range requests) and 'object_bytes' (total size).
+    """
+    import pyarrow.parquet as pq
+
+    plan = {'row_groups': 0, 'row_groups_selected': 0, 'bytes_selected': 0,
+            'object_bytes': sum(obj['Size'] for obj in objects)}
+    filters = list(filters or [])
+    coerced = None
+
+    for obj in objects:
+        with fs.open(obj['Path'], 'rb') as f:
+            metadata = pq.ParquetFile(f).metadata
+        schema = metadata.schema.to_arrow_schema()
+        column_index = {metadata.schema.column(i).path: i for i in range(metadata.num_columns)}
+
+        if coerced is None:
+            # Keep the geometry column so the result is still a GeoDataFrame
+            geometry = 'geometry'
+            if schema.metadata and b'geo' in schema.metadata:
+                import json
+                geometry = json.loads(schema.metadata[b'geo'])['primary_column']
+            if columns is not None and geometry in schema.names and geometry not in columns:
+                columns = [*columns, geometry]
+            coerced = [(c, op, _coerce_filter_value(v, schema.field(c).type)) for c, op, v in filters]
+
+        selected = [i for name, i in column_index.items() if columns is None or name.split('.')[0] in columns]
+        for r in range(metadata.num_row_groups):
+            row_group = metadata.row_group(r)
+            plan['row_groups'] += 1
+            if _row_group_may_match(row_group, column_index, coerced):
+                plan['row_groups_selected'] += 1
+                plan['bytes_selected'] += sum(row_group.column(i).total_compressed_size for i in selected)
+
+    plan['columns'] = columns
+    plan['filters'] = coerced or None
+    return plan
 #-------------------------------------------------------------------------------------------------------------------
-def get_usgs_data(file_name, s3_client,local_path):
+def get_usgs_data(file_name, s3_client,local_path, mode='local', columns=None, ig_date_range=None,
+                  event_id_prefix=None, storage_options=None, return_plan=False, optimize_dtypes=True,
+                  **download_kwargs):
+    """
+    Opens the USGS MTBS parquet files from Source Cooperative with dask-geopandas.
+
+    In 'local' mode (the default) the objects are downloaded to local_path first. In 'remote'
+    mode they are read in place over S3: only the requested columns are fetched (projection),
+    row groups whose Ig_Date / Event_ID statistics cannot match are skipped (predicate
+    pushdown), and the remaining column chunks are fetched with range requests. The bytes
+    selected are reported against the object size. Every parquet footer is read before the
+    frame is returned, with the same storage options the frame reads with, so missing
+    credentials, denied permissions and unreachable objects are detected up front and the
+    local download path is used instead.
+
+    Parameters:
+    - file_name (str): File name prefix under 'fire/' (e.g. 'usgs-mtbs').
+    - s3_client (boto3 client): S3 client for the Source Cooperative endpoint.
+    - local_path (str): Local directory for the downloaded files.
+    - mode (str): 'local' or 'remote' (default: 'local').
+    - columns (list): Columns to read; the geometry column is always kept (default: all).
+    - ig_date_range (tuple): (start, end) Ig_Date bounds, either may be None (default: None).
+    - event_id_prefix (str): Event_ID prefix, e.g. a state code such as 'CA' (default: None).
+    - storage_options (dict): s3fs options for remote mode (default: derived from s3_client).
+    - return_plan (bool): Also return the plan_parquet_read summary, plus 'bytes_downloaded' (bytes
+      fetched by download_s3_objects; 0 when read in place or already up to date) (default: False).
+    - optimize_dtypes (bool): Convert to compact dtypes with optimize_mtbs_dtypes (default: True).
+    - download_kwargs: Optional download_s3_objects settings (max_workers, multipart_chunksize, ...).
+
+    Returns:
+    - dask_geopandas.GeoDataFrame: The parquet data, or (GeoDataFrame, plan) if return_plan is set.
+    """
+    import dask_geopandas as dg
+    import fsspec
 
     bucket_name = 'cboettig'
     prefix = "fire/"
     file_prefix = f"{prefix}{file_name}"
-    keys = get_s3_keys(bucket_name, file_prefix, s3_client)
+    objects = [obj for obj in list_s3_objects(bucket_name, file_prefix, s3_client) if obj['Key'].endswith('.parquet')]
+    filters = _build_parquet_filters(ig_date_range, event_id_prefix)
 
-    for key in keys:
-        local_fname = f"{local_path}/{key.split("/")[-1]}"
-        if not os.path.exists(local_fname):
-            print(f"File not found locally. Downloading from s3...")
-            
-            try:
-                s3_client.download_file(Bucket = bucket_name,
-                                        Key = key,
-                                        Filename = f"{local_path}/{key.split("/")[-1]}"
-                                       )
-                print("Download complete.")
-            except:
-                print("An error occurred. Download failed")
-        else:
-            print("File already exists locally. No download needed.")
+    if mode == 'remote':
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        try:
+            if storage_options is None:
+                storage_options = _s3_storage_options(s3_client)
+            # skip_instance_cache: a cached filesystem could have been validated with other credentials
+            fs = fsspec.filesystem('s3', skip_instance_cache=True, **storage_options)
+            for obj in objects:
+                obj['Path'] = f"{bucket_name}/{obj['Key']}"
+            # Reads every footer now, so access errors surface here rather than at .compute()
+            plan = plan_parquet_read(fs, objects, columns, filters)
+            plan['bytes_downloaded'] = 0
+            print(
+                f"Reading {plan['bytes_selected'] / MB:.1f} MB of {plan['object_bytes'] / MB:.1f} MB "
+                f"({plan['row_groups_selected']}/{plan['row_groups']} row groups) from s3..."
+            )
+            usgs_ddf = dg.read_parquet(
+                [f"s3://{obj['Path']}" for obj in objects], columns=plan['columns'], filters=plan['filters'],
+                storage_options=storage_options, gather_spatial_partitions=False
+            )
+            if optimize_dtypes:
+                usgs_ddf = optimize_mtbs_dtypes(usgs_ddf)
+            return (usgs_ddf, plan) if return_plan else usgs_ddf
+        except (OSError, BotoCoreError, ClientError) as error:
+            print(f"Remote read failed ({type(error).__name__}: {error}). Falling back to local download...")
+    elif mode != 'local':
+        raise ValueError(f"mode must be 'local' or 'remote', not {mode!r}.")
+
+    download_summary = download_s3_objects(bucket_name, objects, local_path, s3_client, **download_kwargs)
+
+    local_objects = [
+        {'Path': os.path.join(local_path, obj['Key'].split('/')[-1]), 'Size': obj['Size']} for obj in objects
+    ]
+    plan = plan_parquet_read(fsspec.filesystem('file'), local_objects, columns, filters)
+    plan['bytes_downloaded'] = download_summary['bytes']
+    usgs_ddf = dg.read_parquet(
+        [obj['Path'] for obj in local_objects], columns=plan['columns'], filters=plan['filters'],
+        gather_spatial_partitions=False
+    )
+    if optimize_dtypes:
+        usgs_ddf = optimize_mtbs_dtypes(usgs_ddf)
+
+    return (usgs_ddf, plan) if return_plan else usgs_ddf
+#-------------------------------------------------------------------------------------------------------------------
+def convert_shp_to_geoparquet(shp_path, parquet_path, npartitions=16):
+    """
+    Converts a shapefile to a Hilbert-sorted, spatially partitioned GeoParquet dataset.
+
+    Rows are shuffled along a Hilbert curve (spatial_shuffle), so every partition covers a
+    compact area. The partition bounding boxes are stored in the GeoParquet metadata, so
+    later reads can skip partitions outside a query box. The dataset is written to a
+    temporary directory and renamed, so an interrupted conversion never leaves a partial dataset.
+
+    Parameters:
+    - shp_path (str): Path of the .shp file.
+    - parquet_path (str): Output directory of the GeoParquet dataset.
+    - npartitions (int): Number of spatial partitions (default: 16).
 
-    usgs_ddf = dg.read_parquet(f"{local_path}/{file_name}*.parquet", gather_spatial_partitions=False)
+    Returns:
+    - str: parquet_path.
+    """
+    import shutil
+    import dask_geopandas as dg
+
+    print(f"Converting {shp_path} to GeoParquet (one-time)...")
+    tmp_path = f"{parquet_path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
 
-    return usgs_ddf
+    shp_ddf = dg.read_file(shp_path, npartitions=npartitions)
+    shp_ddf = shp_ddf.spatial_shuffle(by='hilbert', npartitions=npartitions)
+    shp_ddf.to_parquet(tmp_path)
+
+    shutil.rmtree(parquet_path, ignore_errors=True)
+    os.replace(tmp_path, parquet_path)
+    return parquet_path
 #-------------------------------------------------------------------------------------------------------------------
-def get_mtbs_shp(file_name, s3_client,local_path):
+def get_mtbs_shp(file_name, s3_client,local_path, file_format='geoparquet', npartitions=16, optimize_dtypes=True,
+                 **download_kwargs):
+    """
+    Downloads the MTBS perimeter shapefile components from Source Cooperative and opens them with dask-geopandas.
+
+    With file_format='geoparquet' (the default) the shapefile is converted once to a
+    spatially partitioned GeoParquet dataset next to it (see convert_shp_to_geoparquet),
+    and later calls load that dataset. The conversion is redone if the shapefile is newer.
+    Bounding-box queries such as query_bbox then prune whole partitions.
+
+    Parameters:
+    - file_name (str): File name prefix under 'fire/USGS-MTBS/' (e.g. 'mtbs_perims_DD').
+    - s3_client (boto3 client): S3 client for the Source Cooperative endpoint.
+    - local_path (str): Local directory for the downloaded files.
+    - file_format (str): 'geoparquet' or 'shapefile' to read the shapefile directly (default: 'geoparquet').
+    - npartitions (int): Number of partitions (default: 16 for GeoParquet; 4 were used for shapefiles).
+    - optimize_dtypes (bool): Convert to compact dtypes with optimize_mtbs_dtypes, which also adds a
+      categorical 'State' column and keeps the partition bounds (default: True).
+    - download_kwargs: Optional download_s3_objects settings (max_workers, multipart_chunksize, ...).
+
+    Returns:
+    - dask_geopandas.GeoDataFrame: The perimeter data.
+    """
+    import dask_geopandas as dg
 
     bucket_name = 'cboettig'
     prefix = "fire/USGS-MTBS/"
     file_prefix = f"{prefix}{file_name}"
-    keys = get_s3_keys(bucket_name, file_prefix, s3_client)
+    objects = list_s3_objects(bucket_name, file_prefix, s3_client)
 
-    for key in keys:
-        local_fname = f"{local_path}/{key.split("/")[-1]}"
-        if not os.path.exists(local_fname):
-            print(f"File not found locally. Downloading from s3...")
-            
-            try:
-                s3_client.download_file(Bucket = bucket_name,
-                                        Key = key,
-                                        Filename = f"{local_path}/{key.split("/")[-1]}"
-                                       )
-                print("Download complete.")
-            except ClientError as error:
-                if error.response["Error"]["Code"] == "404":
-                    print("The specified key does not exist in the bucket.")
-                else:
-                    print(f"An error occurred: {error}")
-            except Exception as error:
-                print(f"An unexpected error occurred: {error}")
-        else:
-            print("File already exists locally. No download needed.")
+    download_s3_objects(bucket_name, objects, local_path, s3_client, **download_kwargs)
+
+    shp_path = f"{local_path}/{file_name}.shp"
+    if file_format == 'shapefile':
+        mtbs_shp_ddf = dg.read_file(shp_path, npartitions=npartitions)
+        return optimize_mtbs_dtypes(mtbs_shp_ddf) if optimize_dtypes else mtbs_shp_ddf
+    if file_format != 'geoparquet':
+        raise ValueError(f"file_format must be 'geoparquet' or 'shapefile', not {file_format!r}.")
 
-    mtbs_shp_ddf = dg.read_file(f"{local_path}/{file_name}.shp",npartitions=4)
+    parquet_path = f"{local_path}/{file_name}.parquet"
+    if not os.path.exists(parquet_path) or os.path.getmtime(shp_path) > os.path.getmtime(parquet_path):
+        convert_shp_to_geoparquet(shp_path, parquet_path, npartitions=npartitions)
+
+    mtbs_shp_ddf = dg.read_parquet(parquet_path)
+    if optimize_dtypes:
+        mtbs_shp_ddf = optimize_mtbs_dtypes(mtbs_shp_ddf)
 
     return mtbs_shp_ddf
 #-------------------------------------------------------------------------------------------------------------------
+def query_bbox(ddf, bbox):
+    """
+    Selects the rows of a Dask GeoDataFrame that intersect a bounding box.
+
+    When the frame has spatial_partitions (e.g. GeoParquet from get_mtbs_shp), partitions
+    whose bounding box misses the query are pruned before any data is read.
+
+    Parameters:
+    - ddf (dask_geopandas.GeoDataFrame): Data to query.
+    - bbox (list): Bounding box as [min_lon, min_lat, max_lon, max_lat].
+
+    Returns:
+    - dask_geopandas.GeoDataFrame: Lazy selection (call .compute() to materialize).
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    if ddf.spatial_partitions is None:
+        # Without partition bounds every partition has to be scanned
+        return ddf.map_partitions(lambda df: df.cx[min_lon:max_lon, min_lat:max_lat])
+    return ddf.cx[min_lon:max_lon, min_lat:max_lat]
+#-------------------------------------------------------------------------------------------------------------------
+# Compact dtypes of the MTBS attribute columns; columns missing from a table are skipped
+MTBS_CATEGORICAL_COLUMNS = ['Incid_Type', 'Map_Prog', 'Asmnt_Type']
+MTBS_STRING_COLUMNS = ['Event_ID', 'irwinID', 'Incid_Name', 'Pre_ID', 'Post_ID', 'Perim_ID', 'Comment']
+MTBS_FLOAT32_COLUMNS = [
+    'BurnBndAc', 'BurnBndLat', 'BurnBndLon',
+    'dNBR_offst', 'dNBR_stdDv', 'NoData_T', 'IncGreen_T', 'Low_T', 'Mod_T', 'High_T',
+]
+#-------------------------------------------------------------------------------------------------------------------
+def apply_mtbs_schema(df):
+    """
+    Converts one MTBS attribute table (or partition) to compact dtypes.
+
+    Low-cardinality text columns become categoricals and a categorical 'State' is derived
+    from the first two characters of Event_ID. Identifier and name columns become Arrow
+    strings, acreage, coordinates and dNBR thresholds become float32, and Ig_Date is parsed
+    to datetime64 once.
+
+    Parameters:
+    - df (pd.DataFrame or geopandas.GeoDataFrame): MTBS perimeters or USGS MTBS table.
+
+    Returns:
+    - Same type as df: Copy with compact dtypes.
+    """
+    import pandas as pd
+
+    df = df.copy()
+    columns = set(df.columns)
+    for column in MTBS_STRING_COLUMNS:
+        if column in columns:
+            df[column] = df[column].astype('string[pyarrow]')
+    if 'Event_ID' in columns:
+        df['State'] = df['Event_ID'].str[:2].astype('category')
+    for column in MTBS_CATEGORICAL_COLUMNS:
+        if column in columns:
+            df[column] = df[column].astype('category')
+    for column in MTBS_FLOAT32_COLUMNS:
+        if column in columns:
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype('float32')
+    if 'Ig_Date' in columns:
+        df['Ig_Date'] = pd.to_datetime(df['Ig_Date'], errors='coerce')
+    return df
+#-------------------------------------------------------------------------------------------------------------------
+def optimize_mtbs_dtypes(ddf):
+    """
+    Applies apply_mtbs_schema to every partition of a Dask (Geo)DataFrame.
+
+    The conversion is fused into the read tasks, so it costs no extra pass over the data.
+    Categories are left unknown because they are only seen partition by partition. The
+    partition bounds (spatial_partitions) of a GeoDataFrame are kept, so query_bbox and
+    spatial_join_units still prune partitions on the optimized frame.
+
+    Parameters:
+    - ddf (dask.dataframe.DataFrame or dask_geopandas.GeoDataFrame): Data from get_mtbs_shp or get_usgs_data.
+
+    Returns:
+    - Same type as ddf: Lazy frame with compact dtypes.
+    """
+    from dask.dataframe.utils import clear_known_categories
+
+    meta = apply_mtbs_schema(ddf._meta)
+    categorical = [c for c in meta.columns if str(meta[c].dtype) == 'category']
+    meta = clear_known_categories(meta, cols=categorical, index=False)
+    optimized_ddf = ddf.map_partitions(apply_mtbs_schema, meta=meta)
+    # map_partitions does not carry the partition bounds over; the rows of each partition are unchanged
+    if getattr(ddf, 'spatial_partitions', None) is not None:
+        optimized_ddf.spatial_partitions = ddf.spatial_partitions
+    return optimized_ddf
+#-------------------------------------------------------------------------------------------------------------------
+def dtype_memory_report(ddf, optimized_ddf=None):
+    """
+    Reports the in-memory size of every partition before and after optimize_mtbs_dtypes.
+
+    Parameters:
+    - ddf (dask.dataframe.DataFrame): Data with the original dtypes.
+    - optimized_ddf (dask.dataframe.DataFrame): Same data with compact dtypes (default: optimize_mtbs_dtypes(ddf)).
+
+    Returns:
+    - pd.DataFrame: One row per partition with 'original_bytes', 'optimized_bytes' and 'reduction'.
+    """
+    import dask
+    import pandas as pd
+
+    if optimized_ddf is None:
+        optimized_ddf = optimize_mtbs_dtypes(ddf)
+    original, optimized = dask.compute(
+        ddf.memory_usage_per_partition(deep=True), optimized_ddf.memory_usage_per_partition(deep=True)
+    )
+    report = pd.DataFrame({'original_bytes': original.to_numpy(), 'optimized_bytes': optimized.to_numpy()})
+    report.index.name = 'partition'
+    report['reduction'] = 1 - report['optimized_bytes'] / report['original_bytes']
+    return report
+#-------------------------------------------------------------------------------------------------------------------
+# Equal-area CRS (CONUS Albers) used to measure the overlap of perimeters and units
+AREA_CRS = 'EPSG:5070'
+#-------------------------------------------------------------------------------------------------------------------
+def _join_partition(perimeters, units, units_area, candidates, columns, unit_columns, weighted_columns, area_crs):
+    """
+    Spatially join one partition of perimeters to the candidate units, with area-weighted overlap fractions.
+    """
+    import numpy as np
+    import pandas as pd
+    import shapely
+
+    if candidates is not None:
+        units = units.iloc[candidates]
+        units_area = units_area.iloc[candidates]
+
+    perimeter_idx, unit_idx = units.sindex.query(perimeters.geometry, predicate='intersects')
+
+    # Overlap fractions are measured in the equal-area CRS; units covering a whole perimeter skip the intersection
+    perimeter_geoms = np.asarray(perimeters.geometry.to_crs(area_crs).values)[perimeter_idx]
+    unit_geoms = np.asarray(units_area.geometry.values)[unit_idx]
+    perimeter_area = shapely.area(perimeter_geoms)
+    overlap_area = perimeter_area.copy()
+    split = ~shapely.covers(unit_geoms, perimeter_geoms)
+    if split.any():
+        overlap_area[split] = shapely.area(shapely.intersection(
+            shapely.make_valid(unit_geoms[split]), shapely.make_valid(perimeter_geoms[split])
+        ))
+    fraction = np.divide(overlap_area, perimeter_area, out=np.ones_like(perimeter_area), where=perimeter_area > 0)
+
+    joined = perimeters[list(columns)].iloc[perimeter_idx].reset_index(drop=True)
+    for column in unit_columns:
+        joined[column] = units[column].to_numpy()[unit_idx]
+    joined['overlap_fraction'] = fraction
+    for column in weighted_columns:
+        joined[f'{column}_weighted'] = joined[column] * fraction
+
+    # Pairs that only touch along a border have no overlap
+    return pd.DataFrame(joined[fraction > 0]).reset_index(drop=True)
+#-------------------------------------------------------------------------------------------------------------------
+def spatial_join_units(mtbs_ddf, units, unit_columns=('State',), columns=None, weighted_columns=('BurnBndAc',),
+                       area_crs=AREA_CRS):
+    """
+    Joins MTBS perimeters to any polygon layer (states, counties, ecoregions, grid cells) partition by partition.
+
+    Each perimeter gets one row per unit it overlaps, with the share of its area inside
+    that unit ('overlap_fraction', measured in an equal-area CRS) and area-weighted copies
+    of weighted_columns, so a fire crossing a border is split between the units instead of
+    being attributed by its Event_ID prefix. The units layer is shipped to each worker once.
+    When the perimeters have spatial_partitions (GeoParquet from get_mtbs_shp), every
+    partition only receives the units near it. The join runs as one task per partition, so
+    it scales across the workers of initialize_dask_cluster.
+
+    Parameters:
+    - mtbs_ddf (dask_geopandas.GeoDataFrame): MTBS perimeters (from get_mtbs_shp).
+    - units (geopandas.GeoDataFrame): Polygon layer to attribute the perimeters to (e.g. load_us_states()).
+    - unit_columns (tuple): Columns of units copied onto the result (default: ('State',)).
+    - columns (list): Perimeter columns kept (default: all except the geometry).
+    - weighted_columns (tuple): Perimeter columns multiplied by the overlap fraction into
+      '<column>_weighted' (default: ('BurnBndAc',)).
+    - area_crs (str): Equal-area CRS for the overlap areas (default: 'EPSG:5070').
+
+    Returns:
+    - dask.dataframe.DataFrame: Lazy join with the perimeter columns, unit_columns,
+      'overlap_fraction' and the weighted columns (call .compute() to materialize).
+    """
+    import dask
+    import dask.dataframe as dd
+    import numpy as np
+    import pandas as pd
+
+    geometry_name = mtbs_ddf.geometry.name
+    if columns is None:
+        columns = [c for c in mtbs_ddf.columns if c != geometry_name]
+    unit_columns = list(unit_columns)
+    weighted_columns = list(weighted_columns)
+
+    units = units[[*unit_columns, units.geometry.name]].to_crs(mtbs_ddf.crs).reset_index(drop=True)
+    units_area = units[[units.geometry.name]]
+    if units.crs.is_geographic:
+        # Densify long straight edges (e.g. grid cells) so they follow their parallels once projected
+        units_area = units_area.set_geometry(units_area.geometry.segmentize(0.01))
+    units_area = units_area.to_crs(area_crs)
+
+    # Candidate units per partition from the partition bounds; None tests every unit
+    if mtbs_ddf.spatial_partitions is not None:
+        candidates = [
+            units.sindex.query(partition, predicate='intersects')
+            for partition in mtbs_ddf.spatial_partitions.to_crs(mtbs_ddf.crs).values
+        ]
+        pairs = sum(len(c) for c in candidates)
+        print(f"Spatial partitions prune the join to {pairs} of {len(units) * mtbs_ddf.npartitions} partition/unit pairs.")
+    else:
+        candidates = [None] * mtbs_ddf.npartitions
+
+    meta = pd.DataFrame(mtbs_ddf._meta[list(columns)])
+    for column in unit_columns:
+        meta[column] = units[column].iloc[:0]
+    meta['overlap_fraction'] = np.array([], dtype='float64')
+    for column in weighted_columns:
+        meta[f'{column}_weighted'] = np.array([], dtype='float64')
+
+    units_delayed = dask.delayed(units)
+    units_area_delayed = dask.delayed(units_area)
+    parts = [
+        dask.delayed(_join_partition)(part, units_delayed, units_area_delayed, part_candidates,
+                                      columns, unit_columns, weighted_columns, area_crs)
+        for part, part_candidates in zip(mtbs_ddf.to_delayed(), candidates)
+    ]
+    return dd.from_delayed(parts, meta=meta, verify_meta=False)
+#-------------------------------------------------------------------------------------------------------------------
+# Census cartographic boundary file for US states (1:20,000,000)
+US_STATES_URL = "https://www2.census.gov/geo/tiger/GENZ2021/shp/cb_2021_us_state_20m.zip"
+
+# Local GeoParquet copy of the states layer; ship a file at this path to build maps fully offline.
+# Setting WILDFIRE_UTILS_CACHE_DIR (e.g. in tests or CI) moves the cache out of the home directory
+US_STATES_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "wildfire_utils", "us_states_20m.parquet")
+CACHE_DIR_ENV = "WILDFIRE_UTILS_CACHE_DIR"
+
+STATE_ABBREVIATIONS = {
+    'Alaska': 'AK', 'Hawaii': 'HI', 'Alabama': 'AL', 'Arizona': 'AZ', 'Arkansas': 'AR',
+    'California': 'CA', 'Colorado': 'CO', 'Connecticut': 'CT', 'Delaware': 'DE', 'Florida': 'FL',
+    'Georgia': 'GA', 'Idaho': 'ID', 'Illinois': 'IL', 'Indiana': 'IN', 'Iowa': 'IA', 'Kansas': 'KS',
+    'Kentucky': 'KY', 'Louisiana': 'LA', 'Maine': 'ME', 'Maryland': 'MD', 'Massachusetts': 'MA',
+    'Michigan': 'MI', 'Minnesota': 'MN', 'Mississippi': 'MS', 'Missouri': 'MO', 'Montana': 'MT',
+    'Nebraska': 'NE', 'Nevada': 'NV', 'New Hampshire': 'NH', 'New Jersey': 'NJ', 'New Mexico': 'NM',
+    'New York': 'NY', 'North Carolina': 'NC', 'North Dakota': 'ND', 'Ohio': 'OH', 'Oklahoma': 'OK',
+    'Oregon': 'OR', 'Pennsylvania': 'PA', 'Rhode Island': 'RI', 'South Carolina': 'SC',
+    'South Dakota': 'SD', 'Tennessee': 'TN', 'Texas': 'TX', 'Utah': 'UT', 'Vermont': 'VT',
+    'Virginia': 'VA', 'Washington': 'WA', 'West Virginia': 'WV', 'Wisconsin': 'WI', 'Wyoming': 'WY'
+}
+#-------------------------------------------------------------------------------------------------------------------
+def load_us_states(cache_path=None, simplify_tolerance=0.01):
+    """
+    Loads the US states boundary layer with a 'State' abbreviation column, caching it on disk and in memory.
+
+    The first call downloads the Census file, simplifies the geometries, adds the
+    abbreviations and saves the result as GeoParquet at cache_path. Later sessions read that
+    file, with no network needed, and repeat calls in a session return the in-memory copy.
+    Treat the returned frame as read-only; call .copy() before modifying it.
+
+    Parameters:
+    - cache_path (str): GeoParquet cache location (default: None, 'us_states_20m.parquet' in the
+      WILDFIRE_UTILS_CACHE_DIR directory if that variable is set, else US_STATES_CACHE_PATH).
+    - simplify_tolerance (float): Simplification tolerance in degrees (default: 0.01).
+
+    Returns:
+    - geopandas.GeoDataFrame: Columns 'NAME', 'State' and 'geometry'.
+    """
+    if cache_path is None:
+        cache_dir = os.environ.get(CACHE_DIR_ENV)
+        cache_path = os.path.join(cache_dir, "us_states_20m.parquet") if cache_dir else US_STATES_CACHE_PATH
+    return _load_us_states(os.path.abspath(cache_path), simplify_tolerance)
+#-------------------------------------------------------------------------------------------------------------------
+@lru_cache(maxsize=4)
+def _load_us_states(cache_path, simplify_tolerance):
+    """
+    Reads or builds the cached states layer of load_us_states, memoized by resolved path.
+    """
+    import geopandas as gpd
+
+    if os.path.exists(cache_path):
+        return gpd.read_parquet(cache_path)
+
+    print("US states layer not cached. Downloading from census.gov...")
+    us_states = gpd.read_file(US_STATES_URL)
+    us_states['State'] = us_states['NAME'].map(STATE_ABBREVIATIONS)
+    us_states = us_states[['NAME', 'State', 'geometry']].copy()
+    us_states['geometry'] = us_states.geometry.simplify(simplify_tolerance, preserve_topology=True)
+
+    os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+    tmp_path = f"{cache_path}.tmp"
+    us_states.to_parquet(tmp_path)
+    os.replace(tmp_path, cache_path)
+
+    return us_states
+#-------------------------------------------------------------------------------------------------------------------
+# Wildfire-count thresholds separating the Low / Medium / High severity classes
+SEVERITY_THRESHOLDS = (50, 200)
+SEVERITY_LABELS = ['Low', 'Medium', 'High']
+SEVERITY_COLORS = {'Low': '#ffffb2', 'Medium': '#fd8d3c', 'High': '#bd0026'}
+#-------------------------------------------------------------------------------------------------------------------
+def classify_severity(counts, thresholds=SEVERITY_THRESHOLDS):
+    """
+    Vectorized severity classification of wildfire counts.
+
+    Counts below thresholds[0] are 'Low', counts below thresholds[1] are 'Medium' and the rest 'High'.
+
+    Parameters:
+    - counts (pd.Series): Wildfire counts.
+    - thresholds (tuple): (low/medium, medium/high) boundaries (default: (50, 200)).
+
+    Returns:
+    - pd.Series: Categorical severity labels.
+    """
+    import numpy as np
+    import pandas as pd
+
+    return pd.cut(counts, bins=[-np.inf, *thresholds, np.inf], labels=SEVERITY_LABELS, right=False)
+#-------------------------------------------------------------------------------------------------------------------
+def compute_wildfire_statistics(mtbs_shp_ddf, incid_type='Wildfire', metrics=None, thresholds=SEVERITY_THRESHOLDS,
+                                units=None, unit_column='State'):
+    """
+    Computes per-state and per-year wildfire statistics in a single dask.compute pass.
+
+    All requested groupbys share one filtered frame and are computed together, so the
+    perimeter data is read once, not once per metric. By default the state is the first two
+    characters of Event_ID. With units, perimeters are spatially joined to that layer
+    instead (spatial_join_units) and a fire crossing a border adds its overlap fraction to
+    the count and its area-weighted BurnBndAc to the sum of each unit.
+
+    Parameters:
+    - mtbs_shp_ddf (Dask GeoDataFrame): MTBS perimeter data (from get_mtbs_shp or get_usgs_data).
+    - incid_type (str): Incid_Type to keep, or None for all incidents (default: 'Wildfire').
+    - metrics (list): Subset of 'by_state', 'by_year', 'by_state_year' (default: all).
+    - thresholds (tuple): Severity class thresholds passed to classify_severity.
+    - units (geopandas.GeoDataFrame): Optional polygon layer (e.g. load_us_states() or counties)
+      to attribute the perimeters to (default: None, use the Event_ID prefix).
+    - unit_column (str): Column of units used as the 'State' key (default: 'State').
+
+    Returns:
+    - dict: DataFrames for each requested metric:
+        'by_state'      -> State, Wildfire Count, BurnBndAc, Severity
+        'by_year'       -> Year, Wildfire Count, BurnBndAc
+        'by_state_year' -> State, Year, Wildfire Count, BurnBndAc
+        'severity_shares' (with by_state) -> Severity, States, Wildfire Count, State Share, Wildfire Share
+      and 'report' with 'metrics', 'graph_tasks', 'npartitions' and 'compute_s'.
+    """
+    import dask
+    import dask.dataframe as dd
+    import pandas as pd
+
+    all_metrics = ['by_state', 'by_year', 'by_state_year']
+    metrics = all_metrics if metrics is None else list(metrics)
+    unknown = set(metrics) - set(all_metrics)
+    if unknown:
+        raise ValueError(f"Unknown metrics: {sorted(unknown)}")
+
+    # Filter the data for the incident type and derive the grouping keys once
+    wildfire_ddf = mtbs_shp_ddf
+    if incid_type is not None:
+        wildfire_ddf = wildfire_ddf[wildfire_ddf['Incid_Type'] == incid_type]
+    if units is None:
+        # Frames from optimize_mtbs_dtypes already carry a categorical State column
+        state = wildfire_ddf['State'] if 'State' in wildfire_ddf.columns else wildfire_ddf['Event_ID'].str[:2]
+        columns = {'State': state, 'Fires': 1}
+    else:
+        wildfire_ddf = spatial_join_units(
+            wildfire_ddf, units, unit_columns=[unit_column], columns=['Ig_Date', 'BurnBndAc']
+        )
+        columns = {
+            'State': wildfire_ddf[unit_column],
+            'Fires': wildfire_ddf['overlap_fraction'],
+            'BurnBndAc': wildfire_ddf['BurnBndAc_weighted'],
+        }
+    if 'by_year' in metrics or 'by_state_year' in metrics:
+        columns['Year'] = dd.to_datetime(wildfire_ddf['Ig_Date']).dt.year
+    wildfire_ddf = wildfire_ddf[['BurnBndAc']].assign(**columns)
+
+    keys = {'by_state': ['State'], 'by_year': ['Year'], 'by_state_year': ['State', 'Year']}
+    lazy = {
+        metric: wildfire_ddf.groupby(keys[metric], observed=True)[['Fires', 'BurnBndAc']].sum()
+        for metric in metrics
+    }
+
+    graph_tasks = len(dask.base.collections_to_dsk(list(lazy.values())))
+    started = time.perf_counter()
+    computed = dict(zip(lazy, dask.compute(*lazy.values())))
+    compute_s = time.perf_counter() - started
+
+    results = {}
+    for metric, df in computed.items():
+        df = df.rename(columns={'Fires': 'Wildfire Count'}).reset_index()
+        if 'State' in df and isinstance(df['State'].dtype, pd.CategoricalDtype):
+            df['State'] = df['State'].astype(str)
+        results[metric] = df.sort_values(keys[metric], ignore_index=True)
+
+    if 'by_state' in results:
+        by_state = results['by_state']
+        by_state['Severity'] = classify_severity(by_state['Wildfire Count'], thresholds)
+        shares = by_state.groupby('Severity', observed=False).agg(
+            States=('State', 'size'), **{'Wildfire Count': ('Wildfire Count', 'sum')}
+        ).reset_index()
+        shares['State Share'] = shares['States'] / max(len(by_state), 1)
+        shares['Wildfire Share'] = shares['Wildfire Count'] / max(by_state['Wildfire Count'].sum(), 1)
+        results['severity_shares'] = shares
+
+    results['report'] = {
+        'metrics': metrics,
+        'graph_tasks': graph_tasks,
+        'npartitions': mtbs_shp_ddf.npartitions,
+        'compute_s': compute_s,
+    }
+    return results
+#-------------------------------------------------------------------------------------------------------------------
 
 def create_wildfire_severity_map(mtbs_shp_ddf):
     """
@@ -126,68 +1305,24 @@ def create_wildfire_severity_map(mtbs_shp_ddf):
     Returns:
     - leafmap.Map: Interactive map showing wildfire severity by state.
     """
-    
-    # Filter the data for Wildfire incidents
-    wildfire_ddf = mtbs_shp_ddf[mtbs_shp_ddf['Incid_Type'] == 'Wildfire']
-
-    # Extract state abbreviation from the 'Event_ID' (first two characters)
-    wildfire_ddf['State'] = wildfire_ddf['Event_ID'].str[:2]
-
-    # Group by 'State' and count the number of wildfires
-    wildfires_by_state = wildfire_ddf.groupby('State').size().compute()
-
-    # Convert to a DataFrame for merging
-    wildfires_by_state_df = wildfires_by_state.reset_index()
-    wildfires_by_state_df.columns = ['State', 'Wildfire Count']
-
-    # Categorize severity levels
-    def classify_severity(count):
-        if count < 50:
-            return 'Low'
-        elif 50 <= count < 200:
-            return 'Medium'
-        else:
-            return 'High'
-
-    wildfires_by_state_df['Severity'] = wildfires_by_state_df['Wildfire Count'].apply(classify_severity)
-
-    # Load US states shapefile from Natural Earth
-    us_states = gpd.read_file("https://www2.census.gov/geo/tiger/GENZ2021/shp/cb_2021_us_state_20m.zip")
-
-    # Create a column for state abbreviations in the shapefile
-    state_abbrev_mapping = {
-        'Alaska': 'AK', 'Hawaii': 'HI', 'Alabama': 'AL', 'Arizona': 'AZ', 'Arkansas': 'AR',
-        'California': 'CA', 'Colorado': 'CO', 'Connecticut': 'CT', 'Delaware': 'DE', 'Florida': 'FL',
-        'Georgia': 'GA', 'Idaho': 'ID', 'Illinois': 'IL', 'Indiana': 'IN', 'Iowa': 'IA', 'Kansas': 'KS',
-        'Kentucky': 'KY', 'Louisiana': 'LA', 'Maine': 'ME', 'Maryland': 'MD', 'Massachusetts': 'MA',
-        'Michigan': 'MI', 'Minnesota': 'MN', 'Mississippi': 'MS', 'Missouri': 'MO', 'Montana': 'MT',
-        'Nebraska': 'NE', 'Nevada': 'NV', 'New Hampshire': 'NH', 'New Jersey': 'NJ', 'New Mexico': 'NM',
-        'New York': 'NY', 'North Carolina': 'NC', 'North Dakota': 'ND', 'Ohio': 'OH', 'Oklahoma': 'OK',
-        'Oregon': 'OR', 'Pennsylvania': 'PA', 'Rhode Island': 'RI', 'South Carolina': 'SC',
-        'South Dakota': 'SD', 'Tennessee': 'TN', 'Texas': 'TX', 'Utah': 'UT', 'Vermont': 'VT',
-        'Virginia': 'VA', 'Washington': 'WA', 'West Virginia': 'WV', 'Wisconsin': 'WI', 'Wyoming': 'WY'
-    }
-    us_states['State'] = us_states['NAME'].map(state_abbrev_mapping)
+    import leafmap
+    from .map_render_utils import add_style_columns
+
+    # Count wildfires per state and classify their severity in one pass over the data
+    wildfires_by_state_df = compute_wildfire_statistics(mtbs_shp_ddf, metrics=['by_state'])['by_state']
+    wildfires_by_state_df = wildfires_by_state_df[['State', 'Wildfire Count', 'Severity']]
+    wildfires_by_state_df['Severity'] = wildfires_by_state_df['Severity'].astype(str)
+
+    # Load the cached US states layer (downloaded and simplified once, then served from memory)
+    us_states = load_us_states()
 
     # Merge the wildfire counts with the US states shapefile
     us_states = us_states.merge(wildfires_by_state_df, on='State', how='left')
     us_states['Wildfire Count'] = us_states['Wildfire Count'].fillna(0)
     us_states['Severity'] = us_states['Severity'].fillna('Low')
 
-    # Define a style callback function for dynamic styling based on severity
-    def style_callback(feature):
-        severity = feature['properties']['Severity']
-        color_map = {
-            'Low': '#ffffb2',
-            'Medium': '#fd8d3c',
-            'High': '#bd0026'
-        }
-        return {
-            "fillColor": color_map.get(severity, '#ffffb2'),
-            "color": "black",
-            "weight": 1,
-            "fillOpacity": 0.7
-        }
+    # Precompute each state's style into a column, which ipyleaflet applies without a per-feature callback
+    us_states = add_style_columns(us_states, 'Severity', SEVERITY_COLORS)
 
     # Create a map using leafmap
     m = leafmap.Map(center=[39.8283, -98.5795], zoom=4)
@@ -197,14 +1332,13 @@ def create_wildfire_severity_map(mtbs_shp_ddf):
         us_states,
         layer_name='Wildfires by State',
         info_mode='on_click',
-        style_callback=style_callback,
     )
 
     # Add a legend
     m.add_legend(
         title="Wildfire Severity by State",
-        labels=['Low', 'Medium', 'High'],
-        colors=['#ffffb2', '#fd8d3c', '#bd0026']
+        labels=SEVERITY_LABELS,
+        colors=[SEVERITY_COLORS[label] for label in SEVERITY_LABELS]
     )
 
     return m
@@ -0,0 +1,288 @@
+import sqlite3
+import time
+from datetime import date, timedelta
+import pandas as pd
+from .openmeteo_utils import _build_location_table, fetch_weather_data_batch
+
+# Default location of the on-disk weather cache
+DEFAULT_CACHE_PATH = "weather_cache.sqlite"
+
+# Size of a cache grid cell in degrees (about the resolution of the Open-Meteo models)
+GRID_RESOLUTION = 0.1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS daily_weather (
+    cell_y INTEGER NOT NULL,
+    cell_x INTEGER NOT NULL,
+    timezone TEXT NOT NULL,
+    variable TEXT NOT NULL,
+    day TEXT NOT NULL,
+    value REAL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (cell_y, cell_x, timezone, variable, day)
+) WITHOUT ROWID;
+"""
+
+#-------------------------------------------------------------------------------------------------------------------
+def open_weather_cache(cache_path=DEFAULT_CACHE_PATH, grid_resolution=GRID_RESOLUTION):
+    """
+    Open (and create if needed) the SQLite weather cache.
+
+    Parameters:
+    - cache_path (str): Path of the SQLite file (default: 'weather_cache.sqlite').
+    - grid_resolution (float): Cell size in degrees. A cache file keeps the resolution it was created with.
+
+    Returns:
+    - sqlite3.Connection: Open connection to the cache.
+    """
+    conn = sqlite3.connect(cache_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+
+    row = conn.execute("SELECT value FROM meta WHERE key = 'grid_resolution'").fetchone()
+    if row is None:
+        conn.execute("INSERT INTO meta (key, value) VALUES ('grid_resolution', ?)", (repr(grid_resolution),))
+        conn.commit()
+    elif float(row[0]) != grid_resolution:
+        conn.close()
+        raise ValueError(
+            f"Cache {cache_path} was built with grid_resolution={row[0]}, not {grid_resolution}."
+        )
+    return conn
+#-------------------------------------------------------------------------------------------------------------------
+def snap_to_grid(latitude, longitude, grid_resolution=GRID_RESOLUTION):
+    """
+    Snap a coordinate to its cache grid cell.
+
+    Parameters:
+    - latitude, longitude (float): Coordinate in decimal degrees.
+    - grid_resolution (float): Cell size in degrees.
+
+    Returns:
+    - tuple: (cell_y, cell_x, center_latitude, center_longitude)
+    """
+    cell_y = int(round(latitude / grid_resolution))
+    cell_x = int(round(longitude / grid_resolution))
+    return cell_y, cell_x, round(cell_y * grid_resolution, 6), round(cell_x * grid_resolution, 6)
+#-------------------------------------------------------------------------------------------------------------------
+def _requested_days(windows):
+    """
+    Return the set of 'YYYY-MM-DD' days covered by a collection of (start_date, end_date) windows.
+    """
+    days = set()
+    for start_date, end_date in windows:
+        days.update(pd.date_range(start_date, end_date, freq="D").strftime('%Y-%m-%d'))
+    return days
+#-------------------------------------------------------------------------------------------------------------------
+def _missing_ranges(requested_days, cached_days):
+    """
+    Group the requested days that are not cached into contiguous (start, end) ranges.
+
+    Parameters:
+    - requested_days (set): 'YYYY-MM-DD' strings that are needed.
+    - cached_days (set): 'YYYY-MM-DD' strings already present in the cache.
+
+    Returns:
+    - list: (start, end) tuples of 'YYYY-MM-DD' strings, inclusive.
+    """
+    gaps = []
+    for day in sorted(date.fromisoformat(day) for day in requested_days - cached_days):
+        if gaps and day - gaps[-1][1] == timedelta(days=1):
+            gaps[-1][1] = day
+        else:
+            gaps.append([day, day])
+    return [(start.isoformat(), end.isoformat()) for start, end in gaps]
+#-------------------------------------------------------------------------------------------------------------------
+def _load_requested_windows(conn, locations):
+    """
+    Fill the connection's temporary requested_windows table with one (position, cell, window) row per location.
+
+    The cache is then read for every location with one join instead of one query per location.
+    """
+    conn.execute(
+        """
+        CREATE TEMP TABLE IF NOT EXISTS requested_windows (
+            position INTEGER PRIMARY KEY,
+            cell_y INTEGER NOT NULL,
+            cell_x INTEGER NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute("DELETE FROM requested_windows")
+    conn.executemany(
+        "INSERT INTO requested_windows VALUES (?, ?, ?, ?, ?)",
+        (
+            (position, int(cell_y), int(cell_x), start_date, end_date)
+            for position, (cell_y, cell_x, start_date, end_date) in enumerate(zip(
+                locations["cell_y"], locations["cell_x"], locations["start_date"], locations["end_date"]))
+        )
+    )
+#-------------------------------------------------------------------------------------------------------------------
+def _cached_days(conn, timezone, daily_variables, fresh_after, fresh_since):
+    """
+    Return {(cell_y, cell_x): days} of the requested cells for which every variable is cached and still valid.
+
+    Each cell is checked over the span of its requested windows, in one query over requested_windows.
+    Days before fresh_after are historical and never expire; later days are only valid if
+    fetched at or after fresh_since.
+    """
+    placeholders = ",".join("?" * len(daily_variables))
+    rows = conn.execute(
+        f"""
+        SELECT w.cell_y, w.cell_x, d.day
+        FROM (
+            SELECT cell_y, cell_x, MIN(start_date) AS start_date, MAX(end_date) AS end_date
+            FROM requested_windows GROUP BY cell_y, cell_x
+        ) AS w
+        JOIN daily_weather AS d
+          ON d.cell_y = w.cell_y AND d.cell_x = w.cell_x AND d.timezone = ?
+         AND d.day BETWEEN w.start_date AND w.end_date
+        WHERE d.variable IN ({placeholders})
+          AND (d.day < ? OR d.fetched_at >= ?)
+        GROUP BY w.cell_y, w.cell_x, d.day
+        HAVING COUNT(*) = ?
+        """,
+        (timezone, *daily_variables, fresh_after, fresh_since, len(daily_variables))
+    ).fetchall()
+    cached = {}
+    for cell_y, cell_x, day in rows:
+        cached.setdefault((cell_y, cell_x), set()).add(day)
+    return cached
+#-------------------------------------------------------------------------------------------------------------------
+def _store_gaps(conn, gaps, fetched, daily_variables, timezone):
+    """
+    Write freshly fetched gap data into the cache in long (cell, variable, day) format.
+
+    Parameters:
+    - gaps (pd.DataFrame): One row per fetched gap with 'location_id', 'cell_y', 'cell_x', 'start_date'.
+    - fetched (pd.DataFrame): Output of fetch_weather_data_batch keyed by the gap location_id.
+    """
+    fetched = fetched.merge(gaps[["location_id", "cell_y", "cell_x", "start_date"]], on="location_id")
+
+    # The API returns one row per requested day in order, so the day is derived from the
+    # requested start date rather than from the timezone-shifted timestamp
+    offsets = fetched.groupby("location_id", observed=True).cumcount()
+    fetched["day"] = (pd.to_datetime(fetched["start_date"]) + pd.to_timedelta(offsets, unit="D")).dt.strftime('%Y-%m-%d')
+
+    long_format = fetched.melt(
+        id_vars=["cell_y", "cell_x", "day"], value_vars=daily_variables, var_name="variable"
+    )
+    fetched_at = time.time()
+    conn.executemany(
+        "INSERT OR REPLACE INTO daily_weather VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (
+            (int(row.cell_y), int(row.cell_x), timezone, row.variable, row.day,
+             None if pd.isna(row.value) else float(row.value), fetched_at)
+            for row in long_format.itertuples(index=False)
+        )
+    )
+    conn.commit()
+#-------------------------------------------------------------------------------------------------------------------
+def get_cached_weather_data_batch(latitudes, longitudes, start_dates, end_dates, daily_variables,
+                                  timezone="GMT", location_ids=None, cache_path=DEFAULT_CACHE_PATH,
+                                  grid_resolution=GRID_RESOLUTION, recent_days=7, recent_ttl=3600,
+                                  chunk_size=100, verbose=False):
+    """
+    Fetch daily weather for many locations, serving cached days locally and fetching only the gaps.
+
+    Weather is cached per (grid cell, timezone, variable, day). Overlapping windows, such as
+    the ±10-day windows of nearby fires, reuse each other's days. Days older than recent_days
+    are historical and never expire; more recent days are refetched after recent_ttl seconds
+    because Open-Meteo may still revise them. The cache is read with one query to find the
+    gaps and one query to serve every location, however many locations are requested.
+
+    Parameters:
+    - latitudes, longitudes, start_dates, end_dates, daily_variables, timezone, location_ids, chunk_size:
+      Same as fetch_weather_data_batch.
+    - cache_path (str): Path of the SQLite cache (default: 'weather_cache.sqlite').
+    - grid_resolution (float): Cache cell size in degrees (default: 0.1). Locations are fetched at
+      their cell center.
+    - recent_days (int): Days before today that are still treated as mutable (default: 7).
+    - recent_ttl (float): Lifetime in seconds of cached recent days (default: 3600).
+    - verbose (bool): Print how many uncached ranges are fetched (default: False).
+
+    Returns:
+    - pd.DataFrame: Long-format DataFrame with 'location_id', 'date' (UTC midnight) and one column per variable.
+    """
+    locations = _build_location_table(latitudes, longitudes, start_dates, end_dates, location_ids)
+    cells = [snap_to_grid(lat, lon, grid_resolution) for lat, lon in zip(locations["latitude"], locations["longitude"])]
+    locations["cell_y"] = [cell[0] for cell in cells]
+    locations["cell_x"] = [cell[1] for cell in cells]
+    locations["cell_lat"] = [cell[2] for cell in cells]
+    locations["cell_lon"] = [cell[3] for cell in cells]
+
+    fresh_after = (date.today() - timedelta(days=recent_days)).isoformat()
+    fresh_since = time.time() - recent_ttl
+
+    conn = open_weather_cache(cache_path, grid_resolution)
+    try:
+        _load_requested_windows(conn, locations)
+
+        # Find the uncached gaps of every cell, merging the windows of all locations in it
+        cached_days = _cached_days(conn, timezone, daily_variables, fresh_after, fresh_since)
+        gaps = []
+        for (cell_y, cell_x, cell_lat, cell_lon), cell_locations in locations.groupby(
+                ["cell_y", "cell_x", "cell_lat", "cell_lon"], sort=False):
+            requested = _requested_days(zip(cell_locations["start_date"], cell_locations["end_date"]))
+            cached = cached_days.get((int(cell_y), int(cell_x)), set())
+            for gap_start, gap_end in _missing_ranges(requested, cached):
+                gaps.append((cell_y, cell_x, cell_lat, cell_lon, gap_start, gap_end))
+        gaps = pd.DataFrame(gaps, columns=["cell_y", "cell_x", "cell_lat", "cell_lon", "start_date", "end_date"])
+
+        if not gaps.empty:
+            if verbose:
+                print(f"Fetching {len(gaps)} uncached range(s) from Open-Meteo...")
+            gaps["location_id"] = range(len(gaps))
+            fetched = fetch_weather_data_batch(
+                gaps["cell_lat"], gaps["cell_lon"], gaps["start_date"], gaps["end_date"],
+                daily_variables, timezone=timezone, location_ids=gaps["location_id"], chunk_size=chunk_size
+            )
+            _store_gaps(conn, gaps, fetched, daily_variables, timezone)
+
+        # Serve every location from the cache with one join over the requested windows
+        placeholders = ",".join("?" * len(daily_variables))
+        cached = pd.read_sql_query(
+            f"""
+            SELECT r.position, d.day, d.variable, d.value
+            FROM requested_windows AS r
+            JOIN daily_weather AS d
+              ON d.cell_y = r.cell_y AND d.cell_x = r.cell_x AND d.timezone = ?
+             AND d.day BETWEEN r.start_date AND r.end_date
+            WHERE d.variable IN ({placeholders})
+            """,
+            conn,
+            params=(timezone, *daily_variables)
+        )
+    finally:
+        conn.close()
+
+    weather_dataframe = cached.pivot(index=["position", "day"], columns="variable", values="value")
+    weather_dataframe = weather_dataframe.reindex(columns=daily_variables).astype("float32").reset_index()
+    weather_dataframe.insert(0, "location_id", locations["location_id"].to_numpy()[weather_dataframe.pop("position")])
+    weather_dataframe["date"] = pd.to_datetime(weather_dataframe.pop("day")).dt.tz_localize("UTC")
+    weather_dataframe = weather_dataframe[["location_id", "date", *daily_variables]]
+    weather_dataframe["location_id"] = weather_dataframe["location_id"].astype("category")
+    weather_dataframe.columns.name = None
+    return weather_dataframe
+#-------------------------------------------------------------------------------------------------------------------
+def get_cached_weather_data(latitude, longitude, start_date, end_date, daily_variables, timezone="GMT", **kwargs):
+    """
+    Cached drop-in for fetch_weather_data for a single location.
+
+    Parameters:
+    - latitude, longitude, start_date, end_date, daily_variables, timezone: Same as fetch_weather_data.
+    - kwargs: Cache options of get_cached_weather_data_batch (cache_path, grid_resolution, ...).
+
+    Returns:
+    - pd.DataFrame: DataFrame with a 'date' column and one column per variable.
+    """
+    weather_dataframe = get_cached_weather_data_batch(
+        [latitude], [longitude], [start_date], [end_date], daily_variables, timezone=timezone, **kwargs
+    )
+    return weather_dataframe.drop(columns="location_id")
@@ -0,0 +1,13 @@
+import os
+import sys
+
+# The utils package lives under src/ and is imported as `utils`, as in the notebooks
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _cache_dir(tmp_path_factory, monkeypatch):
+    # Keep on-disk caches (e.g. load_us_states) out of the home directory
+    monkeypatch.setenv("WILDFIRE_UTILS_CACHE_DIR", str(tmp_path_factory.mktemp("wildfire_utils_cache")))
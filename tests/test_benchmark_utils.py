@@ -0,0 +1,17 @@
+import pytest
+
+from utils.benchmark_utils import IMPORT_TIME_BUDGETS_MS, benchmark_import_time
+
+
+def test_utils_modules_import_within_budget():
+    pytest.importorskip("ee")
+
+    report = benchmark_import_time(strict=True)
+
+    assert list(report["module"]) == list(IMPORT_TIME_BUDGETS_MS)
+    assert report["within_budget"].all()
+
+
+def test_strict_import_budget_raises():
+    with pytest.raises(AssertionError, match=r"utils\.source_coop_utils \(\d+ ms > 0\.001 ms\)"):
+        benchmark_import_time({"utils.source_coop_utils": 0.001}, repeat=1, strict=True)
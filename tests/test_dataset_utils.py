@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from utils.dataset_utils import DaskDataset
+
+
+@pytest.fixture
+def perimeters_ddf():
+    gpd = pytest.importorskip("geopandas")
+    dg = pytest.importorskip("dask_geopandas")
+
+    n = 400
+    lon = np.linspace(-125, -67, n)
+    gdf = gpd.GeoDataFrame(
+        {"Incid_Type": np.where(np.arange(n) % 2, "Wildfire", "Prescribed Fire"), "BurnBndAc": np.arange(n) * 1.0},
+        geometry=gpd.points_from_xy(lon, np.full(n, 40.0)),
+        crs="EPSG:4326",
+    )
+    return dg.from_geopandas(gdf, npartitions=4)
+
+
+def test_partition_stats_leaves_the_callers_frame_unchanged(perimeters_ddf):
+    dataset = DaskDataset(perimeters_ddf)
+    stats = dataset.partition_stats()
+
+    assert list(stats["rows"]) == [100, 100, 100, 100]
+    assert perimeters_ddf.spatial_partitions is None
+    assert dataset.ddf.spatial_partitions is not None
+    assert dataset.query(bbox=[-125, 39, -110, 41]).npartitions < perimeters_ddf.npartitions
+
+
+def test_query_cache_hits_and_silent_eviction(perimeters_ddf, capsys):
+    dataset = DaskDataset(perimeters_ddf, memory_budget=1)
+
+    first = dataset.query(incid_type="Wildfire")
+    assert dataset.query(incid_type="Wildfire") is not first  # over budget: returned uncached
+    assert len(first) == 200
+
+    info = dataset.cache_info()
+    assert info["misses"] == 2 and info["hits"] == 0 and info["oversized"] == 2
+    assert capsys.readouterr().out == ""
+
+
+def test_lru_eviction(perimeters_ddf, capsys):
+    dataset = DaskDataset(perimeters_ddf, memory_budget="1GB", verbose=True)
+    wildfire = dataset.query(incid_type="Wildfire")
+    dataset.query(incid_type="Prescribed Fire")
+
+    assert dataset.query(incid_type="Wildfire") is wildfire
+    dataset.memory_budget = dataset.cache_info()["bytes"] - 1
+    dataset._evict()
+
+    info = dataset.cache_info()
+    assert info["hits"] == 1 and info["evictions"] == 1 and info["entries"] == 1
+    assert "Evicted" in capsys.readouterr().out
@@ -0,0 +1,296 @@
+import json
+from unittest.mock import MagicMock
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ee = pytest.importorskip("ee")
+
+from utils.evi_utlis import (  # noqa: E402
+    batch_vegetation_indices,
+    build_vegetation_index_job,
+    vegetation_index_table,
+)
+from utils.mtbs_utils import mtbs_boundaries  # noqa: E402
+
+
+@pytest.fixture
+def ee_api():
+    """
+    Initialize Earth Engine offline with the library's own test algorithms (no credentials or network).
+    """
+    apitestcase = pytest.importorskip("ee.apitestcase")
+
+    case = apitestcase.ApiTestCase()
+    case.setUp()
+    mtbs_boundaries.cache_clear()
+    yield
+    mtbs_boundaries.cache_clear()
+    case.tearDown()
+
+
+def _graph(collection):
+    return json.loads(collection.serialize())
+
+
+def _count_function(graph, name):
+    text = json.dumps(graph)
+    return text.count(f'"functionName": "{name}"')
+
+
+def test_job_is_one_mapped_function_for_any_number_of_events(ee_api):
+    few = _graph(build_vegetation_index_job([f"CA{i:019d}" for i in range(2)]))
+    many = _graph(build_vegetation_index_job([f"CA{i:019d}" for i in range(200)]))
+
+    # Two windows (pre and post) per mapped call, whatever the batch size
+    assert _count_function(few, "Image.reduceRegion") == _count_function(many, "Image.reduceRegion") == 2
+    assert _count_function(many, "Collection.map") == _count_function(few, "Collection.map")
+    assert "CA0000000000000000199" in json.dumps(many)
+
+
+def test_job_rejects_unknown_sensors(ee_api):
+    with pytest.raises(ValueError, match="sensor must be one of"):
+        build_vegetation_index_job(["CA0000000000000000001"], sensor="modis")
+
+
+def test_job_uses_the_sensor_pipeline(ee_api):
+    landsat = json.dumps(_graph(build_vegetation_index_job(["CA0000000000000000001"])))
+    sentinel = json.dumps(_graph(build_vegetation_index_job(["CA0000000000000000001"], sensor="sentinel2")))
+
+    assert "LANDSAT/LC08/C02/T1_L2" in landsat
+    assert "COPERNICUS/S2_SR_HARMONIZED" in sentinel and "LANDSAT" not in sentinel
+
+
+def test_generate_evi_keeps_source_bands_and_properties(ee_api):
+    from utils.evi_utlis import LANDSAT8, generate_evi
+
+    bbox = ee.Geometry.Rectangle([-120, 36, -119, 37])
+    full = json.dumps(_graph(generate_evi(bbox, "2021-07-01", "2021-07-31")))
+    indices_only = json.dumps(_graph(LANDSAT8.collection(bbox, "2021-07-01", "2021-07-31")))
+
+    # Every source band is kept, with reflectance and surface temperature scaled in place
+    assert '"SR_B."' in full and '"ST_B.*"' in full and "0.00341802" in full
+    assert '"ST_B.*"' not in indices_only
+    # All image properties are copied, not only system:time_start
+    for graph in (full, indices_only):
+        assert _count_function(json.loads(graph), "Element.propertyNames") == 1
+
+
+def _feature(event_id, pre, post):
+    return {"type": "Feature", "geometry": None, "properties": {
+        "Event_ID": event_id, "Incid_Name": "CREEK", "Ig_Date": 1625184000000, "pre_images": 3, "post_images": 2,
+        "pre_evi": pre, "pre_ndvi": pre + 0.1, "post_evi": post, "post_ndvi": post + 0.1,
+    }}
+
+
+def test_batch_vegetation_indices_makes_one_request(ee_api, monkeypatch, capsys):
+    calls = []
+    info = {"type": "FeatureCollection", "features": [_feature("B", 0.5, 0.2), _feature("A", 0.4, 0.1)]}
+    monkeypatch.setattr(ee.FeatureCollection, "getInfo", lambda self: calls.append(self) or info)
+
+    df = batch_vegetation_indices(["A", "B", "A", "C"])
+
+    assert len(calls) == 1
+    assert list(df["Event_ID"]) == ["A", "B"]
+    np.testing.assert_allclose(df["delta_evi"], [-0.3, -0.3])
+    np.testing.assert_allclose(df["delta_ndvi"], [-0.3, -0.3])
+    assert "No feature found for 1 Event_IDs: ['C']" in capsys.readouterr().out
+
+
+def test_batch_vegetation_indices_export(ee_api, monkeypatch):
+    to_drive = MagicMock()
+    monkeypatch.setattr(ee.batch.Export.table, "toDrive", to_drive)
+
+    task = batch_vegetation_indices(["A"], export_description="mtbs_evi")
+
+    assert task is to_drive.return_value
+    task.start.assert_called_once_with()
+    assert to_drive.call_args.kwargs["description"] == "mtbs_evi"
+
+
+def test_vegetation_index_table_accepts_rows_and_exports():
+    rows = [_feature("A", 0.4, 0.1)["properties"]]
+    from_rows = vegetation_index_table(rows)
+    from_csv = vegetation_index_table(pd.DataFrame(rows))
+
+    pd.testing.assert_frame_equal(from_rows, from_csv)
+    assert list(from_rows.columns[-2:]) == ["delta_evi", "delta_ndvi"]
+
+
+def _landsat_scene(shape=(64, 48), seed=0):
+    """
+    Raw Landsat 8 C2 L2 digital numbers for vegetation-like reflectances, plus the float64 reflectances.
+    """
+    from utils.evi_utlis import LANDSAT8
+
+    rng = np.random.default_rng(seed)
+    reflectance = {
+        "blue": rng.uniform(0.02, 0.08, shape), "red": rng.uniform(0.03, 0.10, shape),
+        "nir": rng.uniform(0.20, 0.50, shape), "swir2": rng.uniform(0.05, 0.20, shape),
+    }
+    bands = {
+        LANDSAT8.bands[role]: np.round((value - LANDSAT8.offset) / LANDSAT8.scale).astype(np.uint16)
+        for role, value in reflectance.items()
+    }
+    # Reference reflectances from the rounded digital numbers, in float64
+    reference = {role: bands[LANDSAT8.bands[role]] * LANDSAT8.scale + LANDSAT8.offset for role in reflectance}
+    return bands, reference
+
+
+def _reference_indices(r):
+    return {
+        "evi": 2.5 * (r["nir"] - r["red"]) / (r["nir"] + 6 * r["red"] - 7.5 * r["blue"] + 1),
+        "ndvi": (r["nir"] - r["red"]) / (r["nir"] + r["red"]),
+        "nbr": (r["nir"] - r["swir2"]) / (r["nir"] + r["swir2"]),
+    }
+
+
+def test_compute_indices_array_matches_float64():
+    from utils.evi_utlis import compute_indices_array
+
+    bands, reflectance = _landsat_scene()
+    result = compute_indices_array(bands, indices=("evi", "ndvi", "nbr"))
+
+    for index, expected in _reference_indices(reflectance).items():
+        assert result[index].dtype == np.float32
+        np.testing.assert_allclose(result[index], expected, rtol=1e-5, atol=1e-6)
+
+
+def test_compute_indices_array_masks_clouds_nodata_and_zero_denominators():
+    from utils.evi_utlis import SENTINEL2, compute_indices_array
+
+    bands, _ = _landsat_scene((4, 4))
+    qa = np.zeros((4, 4), dtype=np.uint16)
+    qa[0, 0] = 1 << 3  # cloud
+    qa[0, 1] = 1 << 4  # cloud shadow
+    qa[0, 2] = 1 << 6  # clear: kept
+    bands["SR_B4"][1, 0] = 0  # nodata in red
+    out = {"ndvi": np.empty((4, 4), dtype=np.float32)}
+
+    result = compute_indices_array(bands, qa, indices=("ndvi", "nbr"), out=out)
+
+    assert result["ndvi"] is out["ndvi"]
+    assert np.isnan(result["ndvi"][[0, 0, 1], [0, 1, 0]]).all() and not np.isnan(result["ndvi"][0, 2])
+    assert np.isnan(result["nbr"][1, 0])  # nodata in any input band masks every index
+
+    # Bands keyed by role, Sentinel-2 scaling and QA60 bits
+    red = np.full((2, 2), 500, dtype=np.uint16)
+    nir = np.array([[2500, 0], [500, 2500]], dtype=np.uint16)
+    s2 = compute_indices_array({"red": red, "nir": nir}, np.array([[0, 0], [0, 1 << 10]]), SENTINEL2, ("ndvi",))
+    np.testing.assert_allclose(s2["ndvi"][0, 0], (0.25 - 0.05) / 0.3, rtol=1e-6)
+    assert np.isnan(s2["ndvi"][0, 1]) and np.isnan(s2["ndvi"][1, 1]) and s2["ndvi"][1, 0] == 0
+
+    with pytest.raises(ValueError, match="Unknown indices"):
+        compute_indices_array(bands, indices=("savi",))
+
+
+def test_compute_indices_dask_matches_numpy():
+    xr = pytest.importorskip("xarray")
+    pytest.importorskip("dask")
+    from utils.evi_utlis import compute_indices, compute_indices_array
+
+    bands, _ = _landsat_scene((64, 48))
+    qa = np.where(np.arange(64 * 48).reshape(64, 48) % 7 == 0, 1 << 3, 1 << 6).astype(np.uint16)
+    scene = xr.Dataset({name: (("y", "x"), value) for name, value in {**bands, "QA_PIXEL": qa}.items()})
+
+    result = compute_indices(scene.chunk({"y": 16, "x": 24}), indices=("ndvi", "evi", "nbr"))
+    assert result["evi"].chunks == ((16, 16, 16, 16), (24, 24))
+
+    expected = compute_indices_array(bands, qa, indices=("ndvi", "evi", "nbr"))
+    for index in ("ndvi", "evi", "nbr"):
+        computed = result[index].values
+        assert computed.dtype == np.float32
+        np.testing.assert_array_equal(computed, expected[index])
+
+
+def test_compute_dnbr():
+    xr = pytest.importorskip("xarray")
+    from utils.evi_utlis import compute_dnbr
+
+    rng = np.random.default_rng(3)
+    pre, post = rng.uniform(-0.2, 0.8, (32, 32)).astype(np.float32), rng.uniform(-0.5, 0.5, (32, 32)).astype(np.float32)
+    expected = (pre.astype(np.float64) - post) * 1000 - 35.0
+
+    out = np.empty_like(pre)
+    assert compute_dnbr(pre, post, offset=35.0, out=out) is out
+    np.testing.assert_allclose(out, expected, rtol=1e-5, atol=1e-3)
+
+    lazy = compute_dnbr(xr.DataArray(pre), xr.DataArray(post), offset=35.0)
+    assert lazy.dtype == np.float32
+    np.testing.assert_allclose(lazy.values, expected, rtol=1e-5, atol=1e-3)
+
+
+def _index_stack(times=5, shape=(40, 30), seed=4):
+    """
+    Small float32 (time, y, x) index stack with scattered cloud NaN and a few pixels masked in every image.
+    """
+    rng = np.random.default_rng(seed)
+    values = rng.uniform(-0.2, 0.9, (times, *shape)).astype(np.float32)
+    values[rng.random(values.shape) < 0.2] = np.nan
+    values[:, 0, :3] = np.nan
+    return values
+
+
+def test_composite_median_and_percentiles_match_numpy():
+    xr = pytest.importorskip("xarray")
+    pytest.importorskip("dask")
+    from utils.evi_utlis import composite_median, composite_percentiles
+
+    values = _index_stack()
+    stack = xr.DataArray(values, dims=("time", "y", "x")).chunk({"time": 1, "y": 20, "x": 15})
+
+    with np.errstate(all="ignore"), pytest.warns(RuntimeWarning):
+        expected_median = np.nanmedian(values, axis=0)
+        expected_pct = np.moveaxis(np.nanpercentile(values, [10, 50, 90], axis=0), 0, -1)
+
+    median = composite_median(stack, tile_size=16)
+    assert median.dims == ("y", "x") and median.chunks == ((16, 16, 8), (16, 14))
+    np.testing.assert_allclose(median.values, expected_median, rtol=1e-6)
+    assert median.dtype == np.float32 and np.isnan(median.values[0, :3]).all()
+
+    pct = composite_percentiles(stack, tile_size=16)
+    assert pct.dims == ("y", "x", "percentile") and pct["percentile"].values.tolist() == [10.0, 50.0, 90.0]
+    np.testing.assert_allclose(pct.values, expected_pct, rtol=1e-6)
+    np.testing.assert_allclose(pct.sel(percentile=50).values, median.values, rtol=1e-5)
+
+    # numpy-backed input goes through the same tiled path
+    np.testing.assert_array_equal(composite_median(xr.DataArray(values, dims=("time", "y", "x"))).values, median.values)
+
+
+def test_composite_tiles_auto_size():
+    xr = pytest.importorskip("xarray")
+    pytest.importorskip("dask")
+    from utils.evi_utlis import _composite_tiles
+
+    stack = xr.DataArray(np.zeros((5, 300, 300), dtype=np.float32), dims=("time", "y", "x"))
+
+    # sqrt(1e6 / (3 copies * 4 bytes * 5 times)) = 129 pixels per side
+    tiled = _composite_tiles(stack, "time", None, "1MB", copies=3)
+    assert tiled.chunks == ((5,), (129, 129, 42), (129, 129, 42))
+    # Tiny budgets are floored at 64 pixels per side
+    assert _composite_tiles(stack, "time", None, 1024, copies=3).chunks[1][0] == 64
+
+
+def test_quality_mosaic_matches_argmax():
+    xr = pytest.importorskip("xarray")
+    pytest.importorskip("dask")
+    from utils.evi_utlis import quality_mosaic
+
+    ndvi = _index_stack(seed=5)
+    evi = _index_stack(seed=6)
+    stack = xr.Dataset({"ndvi": (("time", "y", "x"), ndvi), "evi": (("time", "y", "x"), evi)})
+
+    mosaic = quality_mosaic(stack.chunk({"time": 1}), "ndvi", tile_size=16)
+    result = mosaic.compute()
+
+    all_nan = np.isnan(ndvi).all(axis=0)
+    best = np.argmax(np.where(np.isnan(ndvi), -np.inf, ndvi), axis=0)
+    expected_evi = np.take_along_axis(evi, best[None], axis=0)[0]
+    expected_evi[all_nan] = np.nan
+
+    assert result["source_index"].dtype == np.int32
+    np.testing.assert_array_equal(result["source_index"].values, np.where(all_nan, -1, best))
+    np.testing.assert_array_equal(result["ndvi"].values, np.where(all_nan, np.nan, np.nanmax(ndvi, axis=0, initial=-np.inf)))
+    np.testing.assert_array_equal(result["evi"].values, expected_evi)
+    assert result["evi"].dtype == np.float32 and all_nan[0, :3].all()
@@ -0,0 +1,107 @@
+import json
+import os
+import socket
+import urllib.request
+
+import pandas as pd
+import pytest
+
+gpd = pytest.importorskip("geopandas")
+shapely = pytest.importorskip("shapely")
+
+from utils.map_render_utils import (  # noqa: E402
+    add_style_columns,
+    geojson_payload_mb,
+    serve_tiles,
+    simplify_for_zoom,
+    stop_tile_server,
+    write_vector_tiles,
+)
+
+
+@pytest.fixture
+def perimeters():
+    """
+    Two detailed circular perimeters in California and one in Oregon, in EPSG:4326.
+    """
+    centers = [(-120.5, 37.5), (-119.0, 36.0), (-122.0, 44.0)]
+    return gpd.GeoDataFrame({
+        "Event_ID": ["CA1", "CA2", "OR1"],
+        "Incid_Type": ["Wildfire", "Prescribed Fire", "Complex"],
+        "Ig_Date": pd.to_datetime(["2020-08-16", "2021-07-13", None]),
+    }, geometry=[shapely.Point(x, y).buffer(0.3, quad_segs=64) for x, y in centers], crs=4326)
+
+
+def test_add_style_columns_precomputes_colors(perimeters):
+    styled = add_style_columns(perimeters, "Incid_Type", {"Wildfire": "#bd0026", "Prescribed Fire": "#31a354"})
+
+    assert "fill_color" not in perimeters.columns
+    assert list(styled["fill_color"]) == ["#bd0026", "#31a354", "#cccccc"]
+    assert json.loads(styled["style"].iloc[0]) == {"color": "black", "weight": 1, "fillOpacity": 0.7, "fillColor": "#bd0026"}
+
+
+def test_simplify_for_zoom_drops_vertices_and_digits(perimeters):
+    simplified = simplify_for_zoom(perimeters, 4, columns=["Event_ID"])
+
+    assert list(simplified.columns) == ["Event_ID", "geometry"]
+    assert (shapely.get_num_coordinates(simplified.geometry.values)
+            < shapely.get_num_coordinates(perimeters.geometry.values)).all()
+    assert geojson_payload_mb(simplified) < geojson_payload_mb(perimeters[["Event_ID", "geometry"]]) / 4
+
+
+def test_write_vector_tiles_pyramid_decodes(perimeters, tmp_path, capsys):
+    mapbox_vector_tile = pytest.importorskip("mapbox_vector_tile")
+    tile_dir = str(tmp_path / "tiles")
+
+    metadata = write_vector_tiles(perimeters, tile_dir, min_zoom=0, max_zoom=5, columns=["Event_ID", "Ig_Date"])
+
+    assert [level["zoom"] for level in metadata["levels"]] == list(range(6))
+    assert metadata["levels"][0]["tiles"] == 1 and metadata["features"] == 3
+    assert not os.path.exists(f"{tile_dir}.tmp")
+
+    # z0 holds every feature, with dates as strings and missing values dropped
+    with open(os.path.join(tile_dir, "0", "0", "0.pbf"), "rb") as f:
+        layer = mapbox_vector_tile.decode(f.read())["mtbs"]
+    properties = sorted((feature["properties"] for feature in layer["features"]), key=lambda p: p["Event_ID"])
+    assert properties == [
+        {"Event_ID": "CA1", "Ig_Date": "2020-08-16"}, {"Event_ID": "CA2", "Ig_Date": "2021-07-13"}, {"Event_ID": "OR1"}
+    ]
+    # The California and Oregon perimeters fall in different z5 tiles
+    z5 = {(x, y.removesuffix(".pbf")) for x in os.listdir(os.path.join(tile_dir, "5"))
+          for y in os.listdir(os.path.join(tile_dir, "5", x))}
+    assert metadata["levels"][5]["tiles"] == len(z5) >= 2
+
+    # An existing pyramid is reused
+    capsys.readouterr()
+    assert write_vector_tiles(perimeters, tile_dir, min_zoom=0, max_zoom=5) == metadata
+    assert "Skipping generation" in capsys.readouterr().out
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+def test_serve_tiles_tracks_and_stops_servers(tmp_path):
+    for name in ("a", "b"):
+        (tmp_path / name / "0" / "0").mkdir(parents=True)
+        (tmp_path / name / "0" / "0" / "0.pbf").write_bytes(name.encode())
+    port = _free_port()
+
+    try:
+        url = serve_tiles(str(tmp_path / "a"), port)
+        assert serve_tiles(str(tmp_path / "a"), port) == url
+        with urllib.request.urlopen(url.format(z=0, x=0, y=0)) as response:
+            assert response.read() == b"a" and response.headers["Access-Control-Allow-Origin"] == "*"
+
+        # Another directory on the same port replaces the running server
+        serve_tiles(str(tmp_path / "b"), port)
+        with urllib.request.urlopen(url.format(z=0, x=0, y=0)) as response:
+            assert response.read() == b"b"
+    finally:
+        assert stop_tile_server(port) == [port]
+
+    assert stop_tile_server(port) == []
+    with pytest.raises(OSError):
+        urllib.request.urlopen(url.format(z=0, x=0, y=0), timeout=2)
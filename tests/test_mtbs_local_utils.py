@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.mtbs_local_utils import MTBSQueryEngine
+
+
+@pytest.fixture
+def perimeters_gdf():
+    gpd = pytest.importorskip("geopandas")
+
+    rng = np.random.default_rng(1)
+    n = 500
+    return gpd.GeoDataFrame(
+        {
+            "Event_ID": [f"CA{i:019d}" for i in range(n)],
+            "Incid_Name": rng.choice(["CREEK", "DIXIE", "CAMP", "PARK"], n),
+            "Incid_Type": rng.choice(["Wildfire", "Prescribed Fire"], n),
+            "BurnBndAc": rng.uniform(1000, 50000, n).round(1),
+            "BurnBndLat": rng.uniform(32, 42, n).round(3),
+            "Ig_Date": pd.to_datetime("2010-01-01") + pd.to_timedelta(rng.integers(0, 4000, n), unit="D"),
+        },
+        geometry=gpd.points_from_xy(rng.uniform(-124, -114, n), rng.uniform(32, 42, n)).buffer(0.1),
+        crs="EPSG:4326",
+    )
+
+
+@pytest.fixture
+def engine(perimeters_gdf):
+    dg = pytest.importorskip("dask_geopandas")
+
+    return MTBSQueryEngine(dg.from_geopandas(perimeters_gdf, npartitions=4))
+
+
+def test_query_matches_a_full_scan(engine, perimeters_gdf):
+    import shapely
+
+    bbox = [-122, 35, -118, 39]
+    df = engine.query(bbox, "2012-01-01", "2016-12-31")
+
+    dates = perimeters_gdf["Ig_Date"]
+    expected = perimeters_gdf[
+        perimeters_gdf.intersects(shapely.box(*bbox))
+        & (dates >= "2012-01-01") & (dates <= "2016-12-31")
+    ]
+    assert len(df) == len(expected) > 0
+    assert sorted(df["BurnBndAc"]) == sorted(expected["BurnBndAc"])
+    assert df["Date"].is_monotonic_increasing
+
+
+def test_query_without_matches_keeps_the_schema(engine):
+    outside_bbox = ([0, 0, 1, 1], "2012-01-01", "2016-12-31")
+    outside_dates = ([-124, 32, -114, 42], "1990-01-01", "1990-12-31")
+    for bbox, start, end in [outside_bbox, outside_dates]:
+        df = engine.query(bbox, start, end, columns=("BurnBndAc", "Incid_Name"))
+
+        assert df.empty
+        assert list(df.columns) == ["Date", "BurnBndAc", "Incid_Name"]
+        assert pd.api.types.is_datetime64_any_dtype(df["Date"])
+        assert df["BurnBndAc"].dtype == np.float64
+
+        gdf = engine.query_gdf(bbox, start, end)
+        assert gdf.empty and list(gdf.columns) == list(engine.partitions[0].columns)
+        assert gdf.crs == "EPSG:4326"
+
+
+def test_engine_over_no_rows_returns_empty_frames(perimeters_gdf):
+    dg = pytest.importorskip("dask_geopandas")
+
+    engine = MTBSQueryEngine(dg.from_geopandas(perimeters_gdf.iloc[:0], npartitions=1))
+
+    assert len(engine) == 0
+    gdf = engine.query_gdf([-124, 32, -114, 42], "2010-01-01", "2021-12-31")
+    assert gdf is not None and gdf.empty and list(gdf.columns) == list(perimeters_gdf.columns)
+    df = engine.query([-124, 32, -114, 42], "2010-01-01", "2021-12-31")
+    assert list(df.columns) == ["Date", "BurnBndAc"] and df["BurnBndAc"].dtype == np.float64
+
+
+def test_attribute_store_round_trip(perimeters_gdf, tmp_path):
+    dg = pytest.importorskip("dask_geopandas")
+    from utils.mtbs_local_utils import MTBSAttributeStore
+    from utils.mtbs_utils import get_mtbs_properties, get_mtbs_properties_by_name
+    from utils.source_coop_utils import optimize_mtbs_dtypes
+
+    path = str(tmp_path / "mtbs_attributes.parquet")
+    mtbs_ddf = optimize_mtbs_dtypes(dg.from_geopandas(perimeters_gdf, npartitions=4))
+    built = MTBSAttributeStore.from_mtbs(mtbs_ddf, path)
+    store = MTBSAttributeStore.load(path)
+
+    assert len(store) == len(built) == 500 and "CA0000000000000000007" in store
+    # Values survive the Parquet round trip; only the string storage (python vs pyarrow) may differ
+    pd.testing.assert_frame_equal(store.attributes, built.attributes, check_dtype=False)
+
+    source = perimeters_gdf.iloc[7]
+    record = store.lookup("CA0000000000000000007")
+    assert record["Ig_Date"] == int(source["Ig_Date"].timestamp() * 1000)
+    # float32 columns are widened without float noise (39.957, not 39.957000732)
+    assert record["BurnBndLat"] == source["BurnBndLat"] and record["BurnBndAc"] == source["BurnBndAc"]
+    assert record["Incid_Type"] == source["Incid_Type"] and "geometry" not in record and "State" in record
+    assert store.lookup("XX0000000000000000000") is None
+
+    ids = ["CA0000000000000000003", "XX0000000000000000000", "CA0000000000000000001"]
+    assert list(store.lookup_many(ids)["Event_ID"]) == [ids[0], ids[2]]
+    assert len(store.lookup_by_name("CREEK")) == (perimeters_gdf["Incid_Name"] == "CREEK").sum()
+    # Names match exactly, as with the Earth Engine filter
+    assert store.lookup_by_name("creek") == []
+
+    df = get_mtbs_properties("CA0000000000000000007", store=store)
+    assert df.shape[0] == 1 and df.loc[0, "Event_ID"] == "CA0000000000000000007"
+    assert get_mtbs_properties_by_name("DIXIE", store=store).loc[0, "Incid_Name"] == "DIXIE"
+    assert get_mtbs_properties_by_name("Dixie", store=store) is None
+
+
+def test_attribute_store_from_earth_engine_pages_the_export(monkeypatch, tmp_path):
+    import sys
+    from unittest.mock import MagicMock
+
+    from utils.mtbs_local_utils import MTBSAttributeStore
+
+    rows = [{"Event_ID": f"CA{i:019d}", "Incid_Name": "CREEK", "BurnBndAc": 1000.5 + i, "Ig_Date": 1625184000000}
+            for i in range(12)]
+    fake_ee = MagicMock()
+    dataset = fake_ee.FeatureCollection.return_value
+    dataset.size.return_value.getInfo.return_value = len(rows)
+    pages = []
+
+    def to_list(count, offset):
+        pages.append((count, offset))
+        page = MagicMock()
+        page.getInfo.return_value = [{"properties": row} for row in rows[offset:offset + count]]
+        return page
+
+    dataset.map.return_value.toList.side_effect = to_list
+    monkeypatch.setitem(sys.modules, "ee", fake_ee)
+
+    store = MTBSAttributeStore.from_earth_engine(str(tmp_path / "ee.parquet"), page_size=5)
+
+    assert pages == [(5, 0), (5, 5), (5, 10)]
+    assert len(MTBSAttributeStore.load(str(tmp_path / "ee.parquet"))) == 12
+    assert store.lookup("CA0000000000000000011") == rows[11]
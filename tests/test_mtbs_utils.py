@@ -0,0 +1,98 @@
+import sqlite3
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import pytest
+
+from utils import mtbs_utils
+from utils.mtbs_utils import MTBSEventResolver, event_date_window, get_event_start_end
+
+IG_DATE_MS = 1625184000000  # 2021-07-02 00:00 UTC
+
+
+def test_event_date_window_uses_get_event_start_end():
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", DeprecationWarning)
+        window = event_date_window(IG_DATE_MS)
+
+    assert window == get_event_start_end("2021-07-02 00:00:00") == ("2021-06-22", "2021-07-12")
+    assert event_date_window(IG_DATE_MS, 30, 5) == ("2021-06-02", "2021-07-07")
+
+
+@pytest.fixture
+def fake_ee(monkeypatch):
+    """
+    Replace ee in mtbs_utils so getInfo answers from a dict of known events and counts the calls.
+    """
+    events = {
+        f"CA{i:019d}": {
+            "type": "Feature",
+            "geometry": {"type": "Polygon", "coordinates": [[[-120, 38], [-119, 38], [-119, 39], [-120, 38]]]},
+            "properties": {"Event_ID": f"CA{i:019d}", "Ig_Date": IG_DATE_MS, "BurnBndAc": 1000 + i},
+        }
+        for i in range(50)
+    }
+    fake = MagicMock()
+    fake.calls = []
+
+    def dictionary(request):
+        handle = MagicMock()
+
+        def get_info():
+            fake.calls.append(request)
+            event_id = request["features"].event_id
+            return {"features": {"features": [events[event_id]] if event_id in events else []}}
+
+        handle.getInfo.side_effect = get_info
+        return handle
+
+    fake.Dictionary.side_effect = dictionary
+    monkeypatch.setattr(mtbs_utils, "ee", fake)
+
+    def collection(self, event_id):
+        matches = MagicMock()
+        matches.limit.return_value.event_id = event_id
+        return matches
+
+    monkeypatch.setattr(MTBSEventResolver, "collection", collection)
+    return fake
+
+
+def test_resolver_memory_and_disk_tiers(fake_ee, tmp_path):
+    cache_path = str(tmp_path / "events.sqlite")
+    resolver = MTBSEventResolver(maxsize=2, cache_path=cache_path)
+
+    event = resolver.resolve("CA0000000000000000001")
+    assert event["ig_date_ms"] == IG_DATE_MS and event["bounds"] == (-120.0, 38.0, -119.0, 39.0)
+    assert resolver.resolve("CA0000000000000000001") == event
+    assert resolver.resolve("XX0000000000000000000") is None
+    assert resolver.resolve("XX0000000000000000000") is None
+    assert len(fake_ee.calls) == 2
+
+    fresh = MTBSEventResolver(cache_path=cache_path)
+    assert fresh.resolve("CA0000000000000000001") == event
+    assert fresh.cache_info()["disk_hits"] == 1 and fresh.cache_info()["round_trips"] == 0
+    with sqlite3.connect(cache_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM mtbs_events").fetchone()[0] == 1
+
+
+def test_resolved_entries_do_not_alias_the_cache(fake_ee):
+    resolver = MTBSEventResolver(cache_path=None)
+    resolver.resolve("CA0000000000000000001")["extras"]["count"] = 99
+
+    assert resolver.resolve("CA0000000000000000001")["extras"] == {}
+
+
+def test_resolver_shared_between_threads(fake_ee, tmp_path):
+    resolver = MTBSEventResolver(maxsize=16, cache_path=str(tmp_path / "events.sqlite"))
+    event_ids = [f"CA{i % 50:019d}" for i in range(400)]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        events = list(executor.map(resolver.resolve, event_ids))
+
+    assert [e["event_id"] for e in events] == event_ids
+    info = resolver.cache_info()
+    assert info["hits"] + info["misses"] == 400 and info["entries"] == 16
+    with sqlite3.connect(resolver.cache_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM mtbs_events").fetchone()[0] == 50
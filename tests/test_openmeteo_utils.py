@@ -0,0 +1,288 @@
+import asyncio
+import datetime
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web  # noqa: E402
+from aiohttp.test_utils import TestServer  # noqa: E402
+
+from utils import openmeteo_utils  # noqa: E402
+from utils.openmeteo_utils import (  # noqa: E402
+    TokenBucket,
+    _build_location_table,
+    _get_with_retry,
+    assemble_responses,
+    collect_weather_data_async,
+    fetch_weather_data_batch,
+    fetch_weather_data_sub_daily,
+)
+
+
+def test_token_bucket_throttles_to_the_rate():
+    async def take(bucket, n):
+        started = time.monotonic()
+        for _ in range(n):
+            await bucket.acquire()
+        return time.monotonic() - started
+
+    # 1200/minute = 20 tokens/s with a burst of 20: 30 tokens need about 0.5 s
+    assert asyncio.run(take(TokenBucket(1200), 30)) == pytest.approx(0.5, abs=0.15)
+
+
+def test_token_bucket_oversized_request_leaves_debt():
+    async def run():
+        bucket = TokenBucket(600, capacity=2)
+        started = time.monotonic()
+        await bucket.acquire(5)
+        first = time.monotonic() - started
+        await bucket.acquire()
+        return first, time.monotonic() - started
+
+    first, second = asyncio.run(run())
+    assert first < 0.05
+    assert second == pytest.approx(0.4, abs=0.1)  # 3 tokens of debt plus 1, at 10 tokens/s
+
+
+class _FakeResponse:
+    def __init__(self, status):
+        self.status = status
+        self.reason = "stub"
+        self.request_info = None
+        self.history = ()
+
+    async def __aenter__(self):
+        if isinstance(self.status, Exception):
+            raise self.status
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def read(self):
+        return b"payload"
+
+    def raise_for_status(self):
+        raise aiohttp.ClientResponseError(self.request_info, self.history, status=self.status)
+
+
+class _FakeSession:
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+
+    def get(self, url, params=None):
+        return _FakeResponse(self.statuses.pop(0))
+
+
+def _retry(statuses, retries=3):
+    stats = {"requests": 0, "retries": 0}
+    session = _FakeSession(statuses)
+    body = asyncio.run(_get_with_retry(session, "http://stub", {}, 1, TokenBucket(60000), stats, retries, 0.001))
+    return body, stats
+
+
+def test_get_with_retry_retries_rate_limits_and_server_errors():
+    body, stats = _retry([429, 503, aiohttp.ClientConnectionError("reset"), 200])
+
+    assert body == b"payload"
+    assert stats == {"requests": 3, "retries": 3}
+
+
+def test_get_with_retry_does_not_retry_client_errors():
+    with pytest.raises(aiohttp.ClientResponseError) as error:
+        _retry([400, 200])
+    assert error.value.status == 400
+
+
+def test_get_with_retry_gives_up_after_retries():
+    with pytest.raises(aiohttp.ClientResponseError) as error:
+        _retry([503, 503, 503], retries=2)
+    assert error.value.status == 503
+
+
+class _FakeValues:
+    def __init__(self, values):
+        self.values = values
+
+    def ValuesAsNumpy(self):
+        return self.values
+
+
+class _FakeWeatherResponse:
+    """
+    Stand-in for WeatherApiResponse: variable i at step t is latitude + 100 * i + t.
+
+    The default is one daily value on 2020-07-01 UTC, equal to the requested latitude.
+    """
+    def __init__(self, latitude, start=1593561600, steps=1, interval=86400):
+        self.latitude = latitude
+        self.start = start
+        self.steps = steps
+        self.interval = interval
+
+    def Daily(self):
+        return self
+
+    Hourly = Daily
+
+    def Time(self):
+        return self.start
+
+    def TimeEnd(self):
+        return self.start + self.steps * self.interval
+
+    def Interval(self):
+        return self.interval
+
+    def Variables(self, i):
+        return _FakeValues(np.float32(self.latitude + 100 * i + np.arange(self.steps)))
+
+
+class _FakeClient:
+    """
+    Stand-in for openmeteo_requests.Client answering every requested location of a window.
+    """
+    def __init__(self):
+        self.calls = []
+
+    def weather_api(self, url, params):
+        self.calls.append(params)
+        start = pd.Timestamp(params["start_date"], tz="UTC")
+        days = (pd.Timestamp(params["end_date"], tz="UTC") - start).days + 1
+        interval = 86400 if "daily" in params else 3600
+        return [
+            _FakeWeatherResponse(latitude, start.value // 10**9, days * 86400 // interval, interval)
+            for latitude in params["latitude"]
+        ]
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    client = _FakeClient()
+    monkeypatch.setattr(openmeteo_utils, "_get_openmeteo_client", lambda: client)
+    return client
+
+
+def test_fetch_bounds_in_flight_requests_and_recovers_from_429(monkeypatch):
+    # The stub echoes the requested latitudes; decoding flatbuffers is replaced by splitting them
+    monkeypatch.setattr(
+        openmeteo_utils, "_parse_flatbuffer_responses",
+        lambda data: [_FakeWeatherResponse(float(lat)) for lat in data.decode().split(",")],
+    )
+    state = {"in_flight": 0, "peak": 0, "calls": 0}
+
+    async def handler(request):
+        state["calls"] += 1
+        if state["calls"] == 1:
+            return web.Response(status=429)
+        state["in_flight"] += 1
+        state["peak"] = max(state["peak"], state["in_flight"])
+        await asyncio.sleep(0.02)
+        state["in_flight"] -= 1
+        return web.Response(body=request.query["latitude"].encode())
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/v1/archive", handler)
+        async with TestServer(app) as server:
+            return await collect_weather_data_async(
+                [float(i) for i in range(20)], [-120.0] * 20, "2020-07-01", "2020-07-01", ["temperature_2m_max"],
+                max_in_flight=3, backoff_factor=0.001, url=str(server.make_url("/v1/archive")),
+            )
+
+    weather, stats = asyncio.run(run())
+    assert state["peak"] == 3
+    assert stats["requests"] == 21 and stats["retries"] == 1 and stats["locations"] == 20
+    assert list(weather["temperature_2m_max"]) == [float(i) for i in range(20)]
+
+
+def test_build_location_table_broadcasts_scalar_dates():
+    for start in ("2020-07-01", pd.Timestamp("2020-07-01"), datetime.date(2020, 7, 1), datetime.datetime(2020, 7, 1)):
+        locations = _build_location_table([40.0, 41.0], [-120.0, -121.0], start, ["2020-07-02", "2020-07-03"])
+        assert list(locations["start_date"]) == ["2020-07-01", "2020-07-01"]
+        assert list(locations["end_date"]) == ["2020-07-02", "2020-07-03"]
+
+    with pytest.raises(ValueError, match="unique"):
+        _build_location_table([40.0, 41.0], [-120.0, -121.0], "2020-07-01", "2020-07-02", location_ids=["a", "a"])
+
+
+def test_fetch_weather_data_batch_groups_windows_and_assembles(fake_client):
+    starts = ["2020-07-01", "2020-07-02", "2020-07-01", pd.Timestamp("2020-07-02"), "2020-07-01"]
+    weather = fetch_weather_data_batch(
+        [0.0, 1.0, 2.0, 3.0, 4.0], [-120.0] * 5, starts, datetime.date(2020, 7, 3),
+        ["temperature_2m_max", "precipitation_sum"], location_ids=list("abcde"), chunk_size=2,
+    )
+
+    # One request per window and chunk: a, c | e for the first window, b, d for the second
+    assert [call["latitude"] for call in fake_client.calls] == [[0.0, 2.0], [4.0], [1.0, 3.0]]
+    assert {(call["start_date"], call["end_date"]) for call in fake_client.calls} == {
+        ("2020-07-01", "2020-07-03"), ("2020-07-02", "2020-07-03")
+    }
+
+    assert list(weather["location_id"].cat.categories) == list("acebd")
+    assert weather.groupby("location_id", observed=True).size().to_dict() == {"a": 3, "c": 3, "e": 3, "b": 2, "d": 2}
+    assert weather["temperature_2m_max"].dtype == np.float32 and str(weather["date"].dt.tz) == "UTC"
+    rows_d = weather[weather["location_id"] == "d"]
+    assert list(rows_d["date"].dt.strftime("%Y-%m-%d")) == ["2020-07-02", "2020-07-03"]
+    np.testing.assert_array_equal(rows_d["temperature_2m_max"], [3.0, 4.0])
+    np.testing.assert_array_equal(rows_d["precipitation_sum"], [103.0, 104.0])
+
+
+def test_assemble_responses_arrow_matches_pandas():
+    pa = pytest.importorskip("pyarrow")
+    responses = [_FakeWeatherResponse(1.0, steps=3), _FakeWeatherResponse(2.0, steps=2)]
+
+    frame = assemble_responses(responses, ["a", "b"], location_ids=["x", "y"])
+    table = assemble_responses(responses, ["a", "b"], location_ids=["x", "y"], as_arrow=True)
+
+    assert isinstance(table, pa.Table)
+    pd.testing.assert_frame_equal(table.to_pandas(), frame, check_dtype=False, check_categorical=False)
+    with pytest.raises(ValueError, match="one entry per response"):
+        assemble_responses(responses, ["a"], location_ids=["x"])
+    with pytest.raises(ValueError, match="resolution"):
+        assemble_responses(responses, ["a"], resolution="weekly")
+
+
+def test_fetch_weather_data_sub_daily_resamples_each_chunk(fake_client):
+    variables = ["wind_speed_10m", "relative_humidity_2m"]
+    args = ([10.0, 20.0, 30.0], [-120.0] * 3, ["2020-07-01", "2020-07-01", "2020-07-02"], "2020-07-02", variables)
+
+    raw = fetch_weather_data_sub_daily(*args, location_ids=["a", "b", "c"], chunk_size=1)
+    assert all("hourly" in call and "daily" not in call for call in fake_client.calls)
+    assert raw.groupby("location_id", observed=True).size().to_dict() == {"a": 48, "b": 48, "c": 24}
+    assert (raw[variables].dtypes == np.float32).all()
+
+    six_hourly = fetch_weather_data_sub_daily(*args, location_ids=["a", "b", "c"], chunk_size=1, resample="6h")
+    # Every chunk shares the categories of all requested locations, so the concat stays categorical
+    assert isinstance(six_hourly["location_id"].dtype, pd.CategoricalDtype)
+    assert list(six_hourly["location_id"].cat.categories) == ["a", "b", "c"]
+    assert six_hourly.groupby("location_id", observed=True).size().to_dict() == {"a": 8, "b": 8, "c": 4}
+    first = six_hourly[six_hourly["location_id"] == "a"].iloc[0]
+    assert first["date"] == pd.Timestamp("2020-07-01", tz="UTC")
+    assert first["wind_speed_10m"] == pytest.approx(10 + 2.5) and first["relative_humidity_2m"] == pytest.approx(112.5)
+    assert (six_hourly[variables].dtypes == np.float32).all()
+
+    daily_extremes = fetch_weather_data_sub_daily(
+        *args, chunk_size=2, resample="1D", aggregation={"wind_speed_10m": ["max", "min"]}
+    )
+    assert list(daily_extremes.columns) == ["location_id", "date", "wind_speed_10m_max", "wind_speed_10m_min"]
+    day_two = daily_extremes[(daily_extremes["location_id"] == 2)].iloc[0]
+    assert (day_two["wind_speed_10m_max"], day_two["wind_speed_10m_min"]) == (30 + 23, 30)
+
+    with pytest.raises(ValueError, match="resolution"):
+        fetch_weather_data_sub_daily(*args, resolution="daily")
+
+
+def test_former_session_attributes_resolve_lazily(monkeypatch):
+    cache_session, retry_session, client = object(), object(), object()
+    monkeypatch.setattr(openmeteo_utils, "_get_sessions", lambda: (cache_session, retry_session))
+    monkeypatch.setattr(openmeteo_utils, "_get_openmeteo_client", lambda: client)
+
+    assert openmeteo_utils.cache_session is cache_session
+    assert openmeteo_utils.retry_session is retry_session
+    assert openmeteo_utils.openmeteo is client
+    with pytest.raises(AttributeError, match="no attribute 'sessions'"):
+        openmeteo_utils.sessions
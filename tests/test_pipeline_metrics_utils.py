@@ -0,0 +1,94 @@
+import json
+import os
+
+import pytest
+
+from utils import pipeline_metrics_utils
+from utils.pipeline_metrics_utils import PipelineMetrics, load_run_metrics, run_source_coop_pipeline
+
+
+def test_stage_records_metrics_and_writes_json(tmp_path):
+    with PipelineMetrics("nightly", output_dir=str(tmp_path), sample_interval=0.01) as run:
+        with run.stage("load") as stage:
+            stage.set(bytes=123)
+
+    (record,) = run.stages
+    assert record["status"] == "ok" and record["bytes"] == 123
+    assert record["wall_s"] >= 0 and record["peak_worker_memory_bytes"] > 0
+    with open(run.json_path) as f:
+        assert json.load(f)["stages"][0]["stage"] == "load"
+    assert list(load_run_metrics(str(tmp_path), "nightly")["stage"]) == ["load"]
+
+
+def test_stage_error_is_recorded_and_reraised():
+    run = PipelineMetrics(sample_interval=0.01)
+    with pytest.raises(ValueError, match="bad partition"):
+        with run.stage("convert"):
+            raise ValueError("bad partition")
+
+    assert run.stages[0]["status"] == "error"
+    assert run.stages[0]["error"] == "ValueError: bad partition"
+
+
+def test_sampler_start_failure_keeps_the_original_exception(monkeypatch):
+    def fail(self):
+        raise RuntimeError("client is gone")
+
+    monkeypatch.setattr(pipeline_metrics_utils._MemorySampler, "__enter__", fail)
+    run = PipelineMetrics(sample_interval=0.01)
+    with pytest.raises(RuntimeError, match="client is gone"):
+        with run.stage("get_mtbs_shp"):
+            pass
+
+    assert run.stages[0]["status"] == "error"
+    assert run.stages[0]["peak_worker_memory_bytes"] == 0
+
+
+def test_run_metrics_round_trip_through_load_run_metrics(tmp_path, monkeypatch):
+    monkeypatch.setattr(PipelineMetrics, "to_dict", _with_profile(PipelineMetrics.to_dict, "io"))
+    for stage_name in ("first", "second"):
+        with PipelineMetrics("nightly", output_dir=str(tmp_path), sample_interval=0.01) as run:
+            with run.stage(stage_name) as stage:
+                stage.set(bytes=10, partitions=2)
+            with pytest.raises(KeyError):
+                with run.stage("failing"):
+                    raise KeyError("State")
+        # File names have one-second resolution; move each run aside so the next cannot overwrite it
+        os.replace(run.json_path, tmp_path / f"nightly_{stage_name}.json")
+    with PipelineMetrics("other", output_dir=str(tmp_path), sample_interval=0.01) as run:
+        with run.stage("ignored"):
+            pass
+
+    runs = load_run_metrics(str(tmp_path), "nightly")
+
+    assert list(runs["stage"]) == ["first", "failing", "second", "failing"]
+    assert runs["started_at"].is_monotonic_increasing and str(runs["started_at"].dt.tz) == "UTC"
+    assert set(runs["profile"]) == {"io"}
+    assert list(runs["bytes"].iloc[[0, 2]]) == [10, 10] and runs["bytes"].iloc[[1, 3]].isna().all()
+    assert list(runs["status"]) == ["ok", "error", "ok", "error"]
+    assert runs["error"].iloc[1] == "KeyError: 'State'"
+    assert load_run_metrics(str(tmp_path), "missing").empty
+
+
+def _with_profile(to_dict, profile):
+    def wrapped(self):
+        return {**to_dict(self), "cluster": {"profile": profile}}
+    return wrapped
+
+
+def test_pipeline_records_downloaded_bytes(monkeypatch):
+    from utils import source_coop_utils
+
+    class Frame:
+        npartitions = 3
+
+    plan = {"bytes_downloaded": 0, "bytes_selected": 5000, "row_groups_selected": 2}
+    monkeypatch.setattr(source_coop_utils, "get_usgs_data", lambda *args, **kwargs: (Frame(), plan))
+    monkeypatch.setattr(source_coop_utils, "get_mtbs_shp", lambda *args, **kwargs: Frame())
+    monkeypatch.setattr(source_coop_utils, "create_wildfire_severity_map", lambda ddf: "map")
+
+    *_, metrics = run_source_coop_pipeline(None, "unused")
+
+    usgs = metrics.stages[0]
+    assert usgs["bytes"] == 0 and usgs["bytes_read_estimate"] == 5000 and usgs["partitions"] == 3
+    assert [stage["stage"] for stage in metrics.stages] == ["get_usgs_data", "get_mtbs_shp", "create_wildfire_severity_map"]
@@ -0,0 +1,577 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.source_coop_utils import optimize_mtbs_dtypes, query_bbox, spatial_join_units
+
+CALIFORNIA_BBOX = [-124.5, 32.5, -114.1, 42.0]
+
+
+@pytest.fixture
+def perimeters_ddf():
+    gpd = pytest.importorskip("geopandas")
+    dg = pytest.importorskip("dask_geopandas")
+
+    rng = np.random.default_rng(0)
+    n = 3000
+    lon = np.sort(rng.uniform(-125, -67, n))
+    lat = rng.uniform(25, 49, n)
+    gdf = gpd.GeoDataFrame(
+        {
+            "Event_ID": [f"CA{i:019d}" for i in range(n)],
+            "Incid_Type": rng.choice(["Wildfire", "Prescribed Fire"], n),
+            "BurnBndAc": rng.uniform(1000, 50000, n),
+            "Ig_Date": pd.date_range("2000-01-01", periods=n, freq="D").strftime("%Y-%m-%d"),
+        },
+        geometry=gpd.points_from_xy(lon, lat).buffer(0.05),
+        crs="EPSG:4326",
+    )
+    ddf = dg.from_geopandas(gdf, npartitions=8)
+    ddf.calculate_spatial_partitions()
+    return ddf
+
+
+def test_optimize_mtbs_dtypes_keeps_spatial_partitions(perimeters_ddf):
+    optimized = optimize_mtbs_dtypes(perimeters_ddf)
+
+    assert optimized.spatial_partitions is not None
+    assert optimized.spatial_partitions.equals(perimeters_ddf.spatial_partitions)
+    assert str(optimized["BurnBndAc"].dtype) == "float32"
+
+
+def test_query_bbox_prunes_optimized_frame(perimeters_ddf):
+    raw = query_bbox(perimeters_ddf, CALIFORNIA_BBOX)
+    optimized = query_bbox(optimize_mtbs_dtypes(perimeters_ddf), CALIFORNIA_BBOX)
+
+    assert optimized.npartitions == raw.npartitions < perimeters_ddf.npartitions
+    assert sorted(optimized.compute()["Event_ID"]) == sorted(raw.compute()["Event_ID"])
+
+
+def test_spatial_join_units_splits_by_area_and_prunes_partitions(capsys):
+    gpd = pytest.importorskip("geopandas")
+    dg = pytest.importorskip("dask_geopandas")
+    from shapely.geometry import box
+
+    units = gpd.GeoDataFrame(
+        {"State": ["W", "E", "F"]},
+        geometry=[box(-122, 36, -120, 38), box(-120, 36, -118, 38), box(-80, 30, -78, 32)], crs="EPSG:4326",
+    )
+    gdf = gpd.GeoDataFrame(
+        {"Event_ID": ["straddle", "inside", "touch", "far"], "BurnBndAc": [1000.0, 500.0, 200.0, 100.0]},
+        geometry=[
+            box(-120.3, 36.5, -119.9, 36.9),  # 3/4 of its width in W, 1/4 in E
+            box(-121.5, 37.0, -121.0, 37.5),
+            box(-120.5, 37.5, -120.0, 37.8),  # shares the W/E border without entering E
+            box(-79.5, 30.5, -79.0, 31.0),
+        ],
+        crs="EPSG:4326",
+    )
+    ddf = dg.from_geopandas(gdf, npartitions=2, sort=False)
+    ddf.calculate_spatial_partitions()
+    full = dg.from_geopandas(gdf, npartitions=2, sort=False)
+    assert full.spatial_partitions is None
+
+    capsys.readouterr()
+    pruned = spatial_join_units(ddf, units).compute()
+    # Partition 0 (straddle, inside) meets W and E, partition 1 (touch, far) meets W, E and F
+    assert "prune the join to 5 of 6 partition/unit pairs" in capsys.readouterr().out
+
+    by_unit = pruned.set_index(["Event_ID", "State"])["overlap_fraction"].sort_index()
+    assert list(by_unit.index) == [
+        ("far", "F"), ("inside", "W"), ("straddle", "E"), ("straddle", "W"), ("touch", "W")
+    ]
+    # EPSG:5070 is equal-area, so the split follows the longitude share at this latitude
+    assert by_unit["straddle", "W"] == pytest.approx(0.75, abs=0.005)
+    assert by_unit["straddle", "W"] + by_unit["straddle", "E"] == pytest.approx(1.0)
+    assert by_unit["inside", "W"] == by_unit["far", "F"] == 1.0
+    assert by_unit["touch", "W"] == pytest.approx(1.0, abs=1e-6)
+    np.testing.assert_allclose(pruned["BurnBndAc_weighted"], pruned["BurnBndAc"] * pruned["overlap_fraction"])
+
+    # Without spatial partitions every unit is tested, with the same result
+    unpruned = spatial_join_units(full, units).compute()
+    key = ["Event_ID", "State"]
+    pd.testing.assert_frame_equal(
+        pruned.sort_values(key, ignore_index=True), unpruned.sort_values(key, ignore_index=True)
+    )
+
+
+@pytest.mark.parametrize("profile", ["io", "geometry", "low_memory"])
+def test_dask_cluster_applies_profile_thresholds(profile, tmp_path):
+    pytest.importorskip("distributed")
+    from utils.source_coop_utils import (
+        _CLUSTER_PROFILES,
+        DASK_CLUSTER_PROFILES,
+        cluster_performance_report,
+        dask_cluster,
+    )
+
+    memory = DASK_CLUSTER_PROFILES[profile]["memory"]
+    with dask_cluster(profile, spill_directory=str(tmp_path), processes=False, n_workers=1,
+                      dashboard_address=":0") as client:
+        address = client.scheduler.address
+        report = cluster_performance_report(client)
+
+        assert report["profile"] == profile and report["memory_thresholds"] == memory
+        assert report["settings"]["cluster"]["processes"] is False
+        assert report["settings"]["cluster"]["local_directory"] == str(tmp_path)
+        assert report["workers"] >= 1
+        # The fractions reach the workers, not only the report
+        fractions = client.run(lambda dask_worker: (
+            dask_worker.memory_manager.memory_target_fraction,
+            dask_worker.memory_manager.memory_spill_fraction,
+            dask_worker.memory_manager.memory_pause_fraction,
+        ))
+        assert set(fractions.values()) == {(memory["target"], memory["spill"], memory["pause"])}
+        assert (getattr(client.cluster, "_adaptive", None) is not None) == (DASK_CLUSTER_PROFILES[profile]["adapt"] is not None)
+
+    assert client.status == "closed" and address not in _CLUSTER_PROFILES
+
+
+def test_unknown_cluster_profile_raises():
+    from utils.source_coop_utils import dask_cluster, get_cluster_profile
+
+    with pytest.raises(ValueError, match="Unknown cluster profile 'gpu'"):
+        get_cluster_profile("gpu")
+    with pytest.raises(ValueError, match="Unknown cluster profile"):
+        with dask_cluster("gpu"):
+            pass
+
+
+def test_get_cluster_profile_sizes_from_the_cpu_count(monkeypatch):
+    from utils.source_coop_utils import DASK_CLUSTER_PROFILES, get_cluster_profile
+
+    monkeypatch.setattr(os, "cpu_count", lambda: 6)
+    io, geometry = get_cluster_profile("io"), get_cluster_profile("geometry")
+
+    assert io["cluster"]["threads_per_worker"] == 24 and geometry["cluster"]["n_workers"] == 6
+    assert geometry["adapt"] == {"minimum": 1, "maximum": 6}
+    assert DASK_CLUSTER_PROFILES["geometry"]["adapt"]["maximum"] is None  # the table is not mutated
+    custom = get_cluster_profile({"cluster": {"n_workers": 2}})
+    assert custom["name"] == "custom" and custom["memory"] == {} and custom["adapt"] is None
+
+
+def test_classify_severity_bin_edges():
+    from utils.source_coop_utils import classify_severity
+
+    counts = pd.Series([0, 49, 49.5, 50, 199, 199.9, 200, 10_000])
+    assert list(classify_severity(counts)) == ["Low", "Low", "Low", "Medium", "Medium", "Medium", "High", "High"]
+    assert list(classify_severity(pd.Series([9, 10, 20]), thresholds=(10, 20))) == ["Low", "Medium", "High"]
+
+
+def test_compute_wildfire_statistics_matches_per_column_compute():
+    dd = pytest.importorskip("dask.dataframe")
+    from utils.source_coop_utils import compute_wildfire_statistics
+
+    rng = np.random.default_rng(1)
+    n = 2000
+    # Skewed state counts so every severity class occurs, with some non-wildfire incidents
+    states = rng.choice(["CA", "OR", "WA", "ID", "NV"], n, p=[0.55, 0.3, 0.1, 0.04, 0.01])
+    df = pd.DataFrame({
+        "Event_ID": [f"{state}{i:019d}" for i, state in enumerate(states)],
+        "Incid_Type": rng.choice(["Wildfire", "Prescribed Fire"], n, p=[0.8, 0.2]),
+        "BurnBndAc": rng.uniform(1000, 50000, n),
+        "Ig_Date": pd.date_range("1990-01-01", periods=n, freq="5D").strftime("%Y-%m-%d"),
+    })
+    ddf = dd.from_pandas(df, npartitions=4)
+
+    stats = compute_wildfire_statistics(ddf)
+
+    # The baseline computed each metric separately from the Event_ID prefix
+    wildfire = ddf[ddf["Incid_Type"] == "Wildfire"]
+    counts = wildfire.assign(State=wildfire["Event_ID"].str[:2]).groupby("State").size().compute().sort_index()
+    years = dd.to_datetime(wildfire["Ig_Date"]).dt.year
+    acres_by_year = wildfire.assign(Year=years).groupby("Year")["BurnBndAc"].sum().compute().sort_index()
+
+    by_state = stats["by_state"]
+    assert list(by_state["State"]) == list(counts.index)
+    np.testing.assert_array_equal(by_state["Wildfire Count"], counts.to_numpy())
+    expected_severity = ["Low" if c < 50 else "Medium" if c < 200 else "High" for c in counts]
+    assert list(by_state["Severity"].astype(str)) == expected_severity
+    assert set(expected_severity) == {"Low", "Medium", "High"}
+
+    np.testing.assert_allclose(stats["by_year"]["BurnBndAc"], acres_by_year.to_numpy())
+    assert stats["by_state_year"]["Wildfire Count"].sum() == counts.sum()
+    shares = stats["severity_shares"].set_index("Severity")
+    assert shares["States"].sum() == len(counts) and shares["Wildfire Share"].sum() == pytest.approx(1.0)
+    assert stats["report"]["npartitions"] == 4
+
+    with pytest.raises(ValueError, match="Unknown metrics"):
+        compute_wildfire_statistics(ddf, metrics=["by_county"])
+
+
+def test_load_us_states_caches_in_the_configured_directory(tmp_path, monkeypatch, capsys):
+    gpd = pytest.importorskip("geopandas")
+    from shapely.geometry import box
+    from utils import source_coop_utils
+    from utils.source_coop_utils import load_us_states
+
+    census = tmp_path / "cb_2021_us_state_20m.geojson"
+    gpd.GeoDataFrame(
+        {"NAME": ["California", "Oregon", "Puerto Rico"], "STATEFP": ["06", "41", "72"]},
+        geometry=[box(-124, 32, -114, 42), box(-124, 42, -116, 46), box(-67, 18, -65, 18.5)], crs="EPSG:4326",
+    ).to_file(census)
+    monkeypatch.setattr(source_coop_utils, "US_STATES_URL", str(census))
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setenv("WILDFIRE_UTILS_CACHE_DIR", str(cache_dir))
+    source_coop_utils._load_us_states.cache_clear()
+
+    try:
+        states = load_us_states()
+        assert "Downloading" in capsys.readouterr().out
+        assert (cache_dir / "us_states_20m.parquet").exists()
+        assert list(states.columns) == ["NAME", "State", "geometry"]
+        assert list(states["State"].fillna("-")) == ["CA", "OR", "-"]
+        assert load_us_states() is states
+
+        # A new session reads the GeoParquet file without the network
+        source_coop_utils._load_us_states.cache_clear()
+        monkeypatch.setattr(source_coop_utils, "US_STATES_URL", str(tmp_path / "missing.zip"))
+        cached = load_us_states()
+        assert "Downloading" not in capsys.readouterr().out
+        assert list(cached["State"].fillna("-")) == ["CA", "OR", "-"]
+        assert cached.geometry.geom_equals(states.geometry).all()
+
+        # An explicit cache_path wins over the environment
+        explicit = tmp_path / "explicit.parquet"
+        cached.to_parquet(explicit)
+        assert len(load_us_states(str(explicit))) == 3
+    finally:
+        source_coop_utils._load_us_states.cache_clear()
+
+
+@pytest.fixture
+def moto_endpoint(monkeypatch):
+    server_module = pytest.importorskip("moto.server")
+
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    server = server_module.ThreadedMotoServer(ip_address="127.0.0.1", port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    yield f"http://{host}:{port}"
+    server.stop()
+
+
+@pytest.fixture
+def usgs_bucket(moto_endpoint, perimeters_ddf, tmp_path):
+    boto3 = pytest.importorskip("boto3")
+
+    s3_client = boto3.client("s3", endpoint_url=moto_endpoint, region_name="us-east-1")
+    s3_client.create_bucket(Bucket="cboettig")
+    parquet_path = tmp_path / "usgs-mtbs.parquet"
+    perimeters_ddf.compute().to_parquet(parquet_path, row_group_size=500)
+    s3_client.upload_file(str(parquet_path), "cboettig", "fire/usgs-mtbs.parquet")
+    return s3_client
+
+
+def test_s3_storage_options_follow_client_signing(moto_endpoint):
+    import boto3
+    from botocore import UNSIGNED
+    from botocore.config import Config
+
+    from utils.source_coop_utils import _s3_storage_options
+
+    signed = _s3_storage_options(boto3.client("s3", endpoint_url=moto_endpoint))
+    assert signed["key"] == "testing" and "anon" not in signed
+    assert signed["client_kwargs"]["endpoint_url"] == moto_endpoint
+
+    unsigned_client = boto3.client("s3", endpoint_url=moto_endpoint, config=Config(signature_version=UNSIGNED))
+    assert _s3_storage_options(unsigned_client)["anon"] is True
+
+
+def test_get_usgs_data_remote_reads_in_place(usgs_bucket, tmp_path):
+    from utils.source_coop_utils import get_usgs_data
+
+    local_path = tmp_path / "local"
+    local_path.mkdir()
+    usgs_ddf, plan = get_usgs_data(
+        "usgs-mtbs", usgs_bucket, str(local_path), mode="remote", columns=["Event_ID"], return_plan=True
+    )
+
+    assert plan["row_groups"] == 6
+    assert len(usgs_ddf.compute()) == 3000
+    assert not any(local_path.iterdir())
+
+
+def test_get_usgs_data_remote_falls_back_when_access_fails(usgs_bucket, tmp_path):
+    from utils.source_coop_utils import get_usgs_data
+
+    # Nothing listens on port 9: every s3fs request fails before the frame is returned
+    unreachable = {"client_kwargs": {"endpoint_url": "http://127.0.0.1:9"}, "anon": True,
+                   "config_kwargs": {"retries": {"max_attempts": 1}, "connect_timeout": 1}}
+    local_path = tmp_path / "local"
+    local_path.mkdir()
+    usgs_ddf = get_usgs_data("usgs-mtbs", usgs_bucket, str(local_path), mode="remote", storage_options=unreachable)
+
+    assert (local_path / "usgs-mtbs.parquet").exists()
+    assert len(usgs_ddf.compute()) == 3000
+
+
+def test_get_usgs_data_remote_does_not_swallow_other_errors(usgs_bucket, tmp_path):
+    from utils.source_coop_utils import get_usgs_data
+
+    local_path = tmp_path / "local"
+    local_path.mkdir()
+    # A bad option is a caller bug, not an access failure, so it is raised instead of downloading
+    with pytest.raises(TypeError):
+        get_usgs_data("usgs-mtbs", usgs_bucket, str(local_path), mode="remote", storage_options={"bogus": 1})
+    assert not any(local_path.iterdir())
+
+
+def test_get_usgs_data_local_reports_bytes_downloaded(usgs_bucket, tmp_path):
+    from utils.source_coop_utils import get_usgs_data
+
+    local_path = tmp_path / "local"
+    size = usgs_bucket.head_object(Bucket="cboettig", Key="fire/usgs-mtbs.parquet")["ContentLength"]
+
+    _, first = get_usgs_data("usgs-mtbs", usgs_bucket, str(local_path), columns=["Event_ID"], return_plan=True)
+    _, second = get_usgs_data("usgs-mtbs", usgs_bucket, str(local_path), columns=["Event_ID"], return_plan=True)
+
+    assert first["bytes_downloaded"] == size and second["bytes_downloaded"] == 0
+    # The footer-based selection only counts the projected column chunks
+    assert 0 < first["bytes_selected"] < size
+
+
+@pytest.fixture
+def s3_client(monkeypatch):
+    moto = pytest.importorskip("moto")
+    boto3 = pytest.importorskip("boto3")
+
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="cboettig")
+        yield client
+
+
+def _count_calls(client, operation):
+    calls = []
+    client.meta.events.register(
+        f"provide-client-params.s3.{operation}", lambda params, **kwargs: calls.append(params)
+    )
+    return calls
+
+
+def test_list_s3_objects_follows_continuation_tokens():
+    import datetime
+
+    import boto3
+    from botocore.stub import Stubber
+
+    from utils.source_coop_utils import get_s3_keys, list_s3_objects
+
+    client = boto3.client("s3", region_name="us-east-1", aws_access_key_id="a", aws_secret_access_key="b")
+    modified = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+    def page(keys, token=None):
+        response = {"Contents": [{"Key": k, "Size": 1, "ETag": '"abc"', "LastModified": modified} for k in keys],
+                    "IsTruncated": token is not None}
+        if token is not None:
+            response["NextContinuationToken"] = token
+        return response
+
+    with Stubber(client) as stubber:
+        stubber.add_response("list_objects_v2", page([f"fire/{i:04d}" for i in range(1000)], "next"),
+                             {"Bucket": "cboettig", "Prefix": "fire/"})
+        stubber.add_response("list_objects_v2", page(["fire/1000", "fire/1001"]),
+                             {"Bucket": "cboettig", "Prefix": "fire/", "ContinuationToken": "next"})
+        stubber.add_response("list_objects_v2", {"IsTruncated": False}, {"Bucket": "cboettig", "Prefix": "none/"})
+
+        objects = list_s3_objects("cboettig", "fire/", client)
+        assert len(objects) == 1002 and objects[-1] == {"Key": "fire/1001", "Size": 1, "ETag": "abc",
+                                                        "LastModified": modified}
+        assert get_s3_keys("cboettig", "none/", client) == []
+        stubber.assert_no_pending_responses()
+
+
+def test_download_s3_objects_downloads_then_skips(s3_client, tmp_path, capsys):
+    from utils.source_coop_utils import MB, download_s3_objects, list_s3_objects
+
+    payloads = {f"fire/usgs-mtbs/part-{i}.parquet": os.urandom(100_000 + i) for i in range(5)}
+    for key, body in payloads.items():
+        s3_client.put_object(Bucket="cboettig", Key=key, Body=body)
+    objects = list_s3_objects("cboettig", "fire/usgs-mtbs/", s3_client)
+
+    summary = download_s3_objects("cboettig", objects + ["fire/missing.parquet"], str(tmp_path), s3_client,
+                                  multipart_chunksize=MB // 16)
+    assert summary["downloaded"] == 5 and summary["failed"] == ["fire/missing.parquet"]
+    assert "does not exist" in capsys.readouterr().out
+    for key, body in payloads.items():
+        assert (tmp_path / key.split("/")[-1]).read_bytes() == body
+
+    gets = _count_calls(s3_client, "GetObject")
+    summary = download_s3_objects("cboettig", objects, str(tmp_path), s3_client)
+    assert summary["skipped"] == 5 and summary["bytes"] == 0 and gets == []
+
+
+def test_download_s3_objects_skips_files_matching_a_multipart_etag(s3_client, tmp_path):
+    from boto3.s3.transfer import TransferConfig
+
+    from utils.source_coop_utils import MB, download_s3_objects, list_s3_objects
+
+    # 20 MiB in boto3's default 8 MiB parts: 3 parts, so the part size cannot be read off the size
+    data = os.urandom(20 * MB)
+    (tmp_path / "perims.shp").write_bytes(data)
+    s3_client.upload_file(str(tmp_path / "perims.shp"), "cboettig", "fire/perims.shp",
+                          Config=TransferConfig(multipart_threshold=8 * MB, multipart_chunksize=8 * MB))
+    objects = list_s3_objects("cboettig", "fire/perims", s3_client)
+    assert objects[0]["ETag"].endswith("-3")
+
+    gets = _count_calls(s3_client, "GetObject")
+    summary = download_s3_objects("cboettig", objects, str(tmp_path), s3_client)
+    assert summary["skipped"] == 1 and gets == []
+
+
+def _part_state(local_fname, obj, part_size, done):
+    import json
+
+    with open(f"{local_fname}.part.json", "w") as f:
+        json.dump({"ETag": obj["ETag"], "Size": obj["Size"], "PartSize": part_size, "Done": done}, f)
+
+
+def test_download_object_resumes_only_missing_ranges(s3_client, tmp_path):
+    from utils.source_coop_utils import _download_object, list_s3_objects
+
+    data = os.urandom(10_000)
+    s3_client.put_object(Bucket="cboettig", Key="fire/usgs-mtbs.parquet", Body=data)
+    (obj,) = list_s3_objects("cboettig", "fire/usgs-mtbs", s3_client)
+    local_fname = str(tmp_path / "usgs-mtbs.parquet")
+
+    # An interrupted download: parts 0 and 2 of 4 are in the .part file
+    partial = bytearray(len(data))
+    partial[0:3000], partial[6000:9000] = data[0:3000], data[6000:9000]
+    (tmp_path / "usgs-mtbs.parquet.part").write_bytes(bytes(partial))
+    _part_state(local_fname, obj, 3000, [0, 2])
+
+    gets = _count_calls(s3_client, "GetObject")
+    nbytes = _download_object("cboettig", obj, local_fname, s3_client, part_size=3000, max_concurrency=2)
+
+    assert nbytes == 4000
+    assert sorted(g["Range"] for g in gets) == ["bytes=3000-5999", "bytes=9000-9999"]
+    assert all(g["IfMatch"] == f'"{obj["ETag"]}"' for g in gets)
+    assert (tmp_path / "usgs-mtbs.parquet").read_bytes() == data
+    assert sorted(os.listdir(tmp_path)) == ["usgs-mtbs.parquet"]
+
+
+def test_download_object_restarts_when_the_object_changed(s3_client, tmp_path):
+    from utils.source_coop_utils import _download_object, list_s3_objects
+
+    s3_client.put_object(Bucket="cboettig", Key="fire/a.bin", Body=b"old" * 1000)
+    (old,) = list_s3_objects("cboettig", "fire/a.bin", s3_client)
+    local_fname = str(tmp_path / "a.bin")
+    (tmp_path / "a.bin.part").write_bytes(b"old" * 1000)
+    _part_state(local_fname, old, 1000, [0, 1])
+
+    s3_client.put_object(Bucket="cboettig", Key="fire/a.bin", Body=b"new" * 1000)
+    (new,) = list_s3_objects("cboettig", "fire/a.bin", s3_client)
+    gets = _count_calls(s3_client, "GetObject")
+
+    assert _download_object("cboettig", new, local_fname, s3_client, part_size=1000) == 3000
+    assert len(gets) == 3
+    assert (tmp_path / "a.bin").read_bytes() == b"new" * 1000
+
+
+def test_download_fails_cleanly_when_the_object_changes_mid_download(s3_client, tmp_path, capsys):
+    from utils.source_coop_utils import download_s3_objects, list_s3_objects, load_manifest
+
+    s3_client.put_object(Bucket="cboettig", Key="fire/a.bin", Body=b"old")
+    objects = list_s3_objects("cboettig", "fire/a.bin", s3_client)
+    s3_client.put_object(Bucket="cboettig", Key="fire/a.bin", Body=b"new")
+
+    summary = download_s3_objects("cboettig", objects, str(tmp_path), s3_client)
+
+    assert summary["failed"] == ["fire/a.bin"]
+    assert "changed during the download" in capsys.readouterr().out
+    assert not (tmp_path / "a.bin").exists() and load_manifest(str(tmp_path)) == {}
+
+
+def test_sync_s3_prefix_uses_the_manifest(s3_client, tmp_path):
+    from utils.source_coop_utils import load_manifest, sync_s3_prefix
+
+    for name in ("a.parquet", "nested/b.parquet", "c.parquet"):
+        s3_client.put_object(Bucket="cboettig", Key=f"fire/{name}", Body=name.encode() * 100)
+    local_path = str(tmp_path / "mirror")
+
+    assert sync_s3_prefix("cboettig", "fire/", local_path, s3_client)["downloaded"] == 3
+    assert set(load_manifest(local_path)) == {"a.parquet", "nested/b.parquet", "c.parquet"}
+
+    # Nothing changed: one listing, no object reads
+    lists, gets = _count_calls(s3_client, "ListObjectsV2"), _count_calls(s3_client, "GetObject")
+    heads = _count_calls(s3_client, "HeadObject")
+    summary = sync_s3_prefix("cboettig", "fire/", local_path, s3_client)
+    assert summary["skipped"] == 3 and len(lists) == 1 and gets == [] and heads == []
+
+    # A changed object, a locally modified file and a removed object
+    s3_client.put_object(Bucket="cboettig", Key="fire/a.parquet", Body=b"changed")
+    with open(os.path.join(local_path, "nested", "b.parquet"), "ab") as f:
+        f.write(b"local edit")
+    s3_client.delete_object(Bucket="cboettig", Key="fire/c.parquet")
+
+    summary = sync_s3_prefix("cboettig", "fire/", local_path, s3_client)
+    assert summary["downloaded"] == 2 and summary["removed"] == ["fire/c.parquet"]
+    assert open(os.path.join(local_path, "a.parquet"), "rb").read() == b"changed"
+    assert open(os.path.join(local_path, "nested", "b.parquet"), "rb").read() == b"nested/b.parquet" * 100
+    assert os.path.exists(os.path.join(local_path, "c.parquet"))
+
+    summary = sync_s3_prefix("cboettig", "fire/", local_path, s3_client, delete=True)
+    assert summary["removed"] == ["fire/c.parquet"] and not os.path.exists(os.path.join(local_path, "c.parquet"))
+    assert "c.parquet" not in load_manifest(local_path)
+
+
+def test_get_mtbs_shp_converts_once_to_partitioned_geoparquet(s3_client, tmp_path, capsys):
+    gpd = pytest.importorskip("geopandas")
+    from shapely.geometry import box
+    from utils.source_coop_utils import convert_shp_to_geoparquet, get_mtbs_shp
+
+    rng = np.random.default_rng(2)
+    n = 400
+    lon, lat = rng.uniform(-125, -67, n), rng.uniform(25, 49, n)
+    gdf = gpd.GeoDataFrame({
+        "Event_ID": [f"{'CA' if x < -114 else 'TX'}{i:019d}" for i, x in enumerate(lon)],
+        "Incid_Type": rng.choice(["Wildfire", "Prescribed Fire"], n),
+        "BurnBndAc": rng.uniform(1000, 50000, n),
+    }, geometry=gpd.points_from_xy(lon, lat).buffer(0.2), crs="EPSG:4326")
+    source = tmp_path / "source"
+    source.mkdir()
+    gdf.to_file(source / "mtbs_perims_DD.shp")
+    for path in source.iterdir():
+        s3_client.upload_file(str(path), "cboettig", f"fire/USGS-MTBS/{path.name}")
+
+    local_path = tmp_path / "local"
+    # A leftover from an interrupted conversion is replaced, not read
+    (local_path / "mtbs_perims_DD.parquet.tmp").mkdir(parents=True)
+    mtbs = get_mtbs_shp("mtbs_perims_DD", s3_client, str(local_path), npartitions=4, optimize_dtypes=False)
+
+    assert "Converting" in capsys.readouterr().out
+    assert (local_path / "mtbs_perims_DD.parquet").is_dir()
+    assert not (local_path / "mtbs_perims_DD.parquet.tmp").exists()
+    assert mtbs.npartitions == 4 and mtbs.spatial_partitions is not None
+    computed = mtbs.compute().set_index("Event_ID").sort_index()
+    expected = gdf.set_index("Event_ID").sort_index()
+    pd.testing.assert_frame_equal(computed.drop(columns="geometry"), expected.drop(columns="geometry"))
+    assert computed.geometry.geom_equals_exact(expected.geometry, 1e-9).all()
+
+    # The partition bounds survive the round trip and prune a bbox query to intersecting rows
+    reopened = get_mtbs_shp("mtbs_perims_DD", s3_client, str(local_path), npartitions=4)
+    assert "Converting" not in capsys.readouterr().out
+    assert reopened.spatial_partitions is not None
+    assert reopened.spatial_partitions.geom_equals(mtbs.spatial_partitions).all()
+    selected = query_bbox(reopened, CALIFORNIA_BBOX)
+    assert selected.npartitions < reopened.npartitions
+    expected_ids = sorted(gdf.loc[gdf.intersects(box(*CALIFORNIA_BBOX)), "Event_ID"])
+    assert expected_ids and sorted(selected.compute()["Event_ID"].astype(str)) == expected_ids
+
+    # A newer shapefile is converted again
+    shp = local_path / "mtbs_perims_DD.shp"
+    later = os.path.getmtime(local_path / "mtbs_perims_DD.parquet") + 10
+    os.utime(shp, (later, later))
+    get_mtbs_shp("mtbs_perims_DD", s3_client, str(local_path), npartitions=4)
+    assert "Converting" in capsys.readouterr().out
+
+    assert convert_shp_to_geoparquet(str(shp), str(tmp_path / "direct.parquet"), npartitions=2) == str(
+        tmp_path / "direct.parquet"
+    )
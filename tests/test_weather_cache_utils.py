@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import weather_cache_utils
+from utils.weather_cache_utils import get_cached_weather_data_batch, snap_to_grid
+
+VARIABLES = ["temperature_2m_max", "precipitation_sum"]
+
+
+def _value(latitude, longitude, day, variable):
+    return round(latitude * 10) + round(longitude * 10) / 1000 + pd.Timestamp(day).dayofyear + VARIABLES.index(variable)
+
+
+@pytest.fixture
+def fake_open_meteo(monkeypatch):
+    """
+    Replace the Open-Meteo batch client with a deterministic one that records the requested days.
+    """
+    requested = []
+
+    def fetch(latitudes, longitudes, start_dates, end_dates, daily_variables, timezone="GMT", location_ids=None,
+              chunk_size=100):
+        frames = []
+        for lat, lon, start, end, location_id in zip(latitudes, longitudes, start_dates, end_dates, location_ids):
+            days = pd.date_range(start, end, freq="D")
+            requested.extend(days)
+            frame = pd.DataFrame({"location_id": location_id, "date": days.tz_localize("UTC")})
+            for variable in daily_variables:
+                frame[variable] = np.float32([_value(lat, lon, day, variable) for day in days])
+            frames.append(frame)
+        return pd.concat(frames, ignore_index=True)
+
+    monkeypatch.setattr(weather_cache_utils, "fetch_weather_data_batch", fetch)
+    return requested
+
+
+@pytest.fixture
+def traced_queries(monkeypatch):
+    """
+    Record every SELECT on daily_weather issued through open_weather_cache connections.
+    """
+    statements = []
+    open_cache = weather_cache_utils.open_weather_cache
+
+    def open_traced(*args, **kwargs):
+        conn = open_cache(*args, **kwargs)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    monkeypatch.setattr(weather_cache_utils, "open_weather_cache", open_traced)
+    return lambda: [s for s in statements if s.lstrip().startswith("SELECT") and "daily_weather" in s]
+
+
+def test_cached_batch_fetches_only_gaps_and_serves_from_cache(fake_open_meteo, tmp_path, capsys):
+    cache_path = str(tmp_path / "weather.sqlite")
+    latitudes, longitudes = [38.51, 38.52, 40.0], [-120.51, -120.52, -121.0]
+
+    first = get_cached_weather_data_batch(latitudes[:2], longitudes[:2], "2020-07-01", "2020-07-10", VARIABLES,
+                                          location_ids=["a", "b"], cache_path=cache_path, verbose=True)
+    assert "Fetching 1 uncached range(s)" in capsys.readouterr().out
+    # Both locations share a grid cell, so the cell's window is fetched once
+    assert len(fake_open_meteo) == 10 and len(first) == 20
+
+    fake_open_meteo.clear()
+    second = get_cached_weather_data_batch(latitudes, longitudes, ["2020-07-05", "2020-07-05", "2020-07-05"],
+                                           ["2020-07-12", "2020-07-08", "2020-07-06"], VARIABLES,
+                                           location_ids=["a", "b", "c"], cache_path=cache_path)
+    assert sorted(d.strftime("%m-%d") for d in fake_open_meteo) == ["07-05", "07-06", "07-11", "07-12"]
+    assert list(second.groupby("location_id", observed=True).size()) == [8, 4, 2]
+
+    for row in second.itertuples(index=False):
+        lat, lon = {"a": (38.51, -120.51), "b": (38.52, -120.52), "c": (40.0, -121.0)}[row.location_id]
+        _, _, cell_lat, cell_lon = snap_to_grid(lat, lon)
+        assert row.temperature_2m_max == pytest.approx(_value(cell_lat, cell_lon, row.date, VARIABLES[0]), rel=1e-6)
+
+
+def test_cache_reads_do_not_scale_with_locations(fake_open_meteo, traced_queries, tmp_path, capsys):
+    cache_path = str(tmp_path / "weather.sqlite")
+    rng = np.random.default_rng(2)
+    latitudes, longitudes = rng.uniform(32, 42, 200), rng.uniform(-124, -114, 200)
+
+    get_cached_weather_data_batch(latitudes, longitudes, "2020-07-01", "2020-07-21", VARIABLES, cache_path=cache_path)
+    assert len(traced_queries()) == 2
+    assert capsys.readouterr().out == ""
+
+    weather = get_cached_weather_data_batch(latitudes, longitudes, "2020-07-01", "2020-07-21", VARIABLES,
+                                            cache_path=cache_path, verbose=True)
+    assert len(traced_queries()) == 4
+    assert len(weather) == 200 * 21 and list(weather["location_id"].unique()) == list(range(200))
+    assert "Fetching" not in capsys.readouterr().out